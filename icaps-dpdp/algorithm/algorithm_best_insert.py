@@ -19,23 +19,25 @@
 # THE SOFTWARE
 
 import copy
+import math
 import random
 
+from src.common.dispatch_result import DispatchResult
 from src.common.factory import Factory
+from src.common.input_info import InputInfo
 from src.common.node import Node
 from src.common.order import OrderItem
 from src.common.vehicle import Vehicle
 from src.conf.configs import Configs
-from src.utils.input_utils import get_factory_info, read_json
-from src.utils.json_tools import convert_nodes_to_json
+from src.utils.input_utils import get_factory_info, get_route_matrices
+from src.utils.json_tools import convert_nodes_to_json, convert_input_info_to_json_data
 from src.utils.json_tools import get_vehicle_instance_dict, get_order_item_dict, __convert_json_to_nodes
 from src.utils.json_tools import read_json_from_file, write_json_to_file
 from src.utils.logging_engine import logger
 
 from algorithm.localsearch_structs import LLNode, LLRoute, LLSolution
 from algorithm.problemdata import ProblemData
-from typing import List, Dict
-
+from typing import Callable, List, Dict
 
 def scheduling():
     # read the input json, you can design your own classes
@@ -119,7 +121,7 @@ def set_partner_nodes(route:LLRoute):
         assert not node.is_pickup, f"pickup node left in stack"
 
 # "best insert" dispatching method: position of P and D nodes of each package are choosen such that resulting solution minimizes current objective value 
-def dispatch_orders_to_vehicles( problem_data:ProblemData ):
+def dispatch_orders_to_vehicles( problem_data:ProblemData, seed:int = None ):
     
     # initializing solution
     solution = LLSolution( problem_data )
@@ -202,8 +204,11 @@ def dispatch_orders_to_vehicles( problem_data:ProblemData ):
             order_id_to_items[item.order_id] = []
         order_id_to_items[item.order_id].append(item)
 
-    # allocate orders to vehicles
-    for items in order_id_to_items.values():
+    # allocate orders to vehicles (in the random order given by the seed, if given)
+    orders:List[List[OrderItem]] = list(order_id_to_items.values())
+    if seed is not None:
+        random.Random(seed).shuffle(orders)
+    for items in orders:
         demand = __calculate_demand(items)
 
         # order exceeds the capacity limit
@@ -258,36 +263,154 @@ def __create_pickup_and_delivery_nodes_of_items(items: list, factory_id_to_int:
     return pickup_node, delivery_node
 
 
-def find_best_insert( pdata:ProblemData, solution:LLSolution, pickup_node:LLNode, delivery_node:LLNode ) -> tuple[float, Vehicle, LLNode, LLNode]:
-    possible_inserts:List[tuple] = []
-    for vehicle in pdata.vehicles:
+def find_best_insert( pdata:ProblemData, solution:LLSolution, pickup_node:LLNode, delivery_node:LLNode,
+                      vehicles:List[Vehicle] = None, required:bool = True ) -> tuple[float, Vehicle, LLNode, LLNode]:
+    """
+    Finds the best insertion of the couple: first from all optimal in the order of the vehicles and the positions.
+    The couple is inserted into the routes of the given vehicles (in the original order), or of all the vehicles.
+    All the vehicles are tried, if the couple does not fit into the given or the nearest vehicles.
+    Returns: score, vehicle, node to insert the pickup node after, node to insert the delivery node after.
+    If no insertion is feasible, None is returned unless the insertion is required.
+    """
+    candidate_vehicles = __get_candidate_vehicles(pdata, pickup_node, vehicles if vehicles is not None else pdata.vehicles)
+
+    # choosing strategy: first from all optimal
+    best_insert = __find_best_insert_into_vehicles(pdata, solution, pickup_node, delivery_node, candidate_vehicles)
+    if not best_insert and len(candidate_vehicles) < len(pdata.vehicles):
+        # the couple does not fit into the filtered vehicles, retry with all the vehicles
+        best_insert = __find_best_insert_into_vehicles(pdata, solution, pickup_node, delivery_node, pdata.vehicles)
+    if not best_insert:
+        assert not required, f"no feasible insertion of the couple"
+        return None
+
+    # convert positions to nodes
+    score, vehicle_no, i, j = best_insert
+    vehicle = pdata.vehicles[vehicle_no]
+    route_nodes:List[LLNode] = list(solution.routes[vehicle_no].nodes_except_end)
+    return score, vehicle, route_nodes[i], route_nodes[j] if j != i else pickup_node
+
+
+def __get_candidate_vehicles( pdata:ProblemData, pickup_node:LLNode, vehicles:List[Vehicle] ) -> List[Vehicle]:
+    """
+    Returns the given vehicles nearest to the pickup factory (all of them if no limit is set), in the original order.
+    """
+    if Configs.INSERT_NEAREST_VEHICLE_NUM is None or len(vehicles) <= Configs.INSERT_NEAREST_VEHICLE_NUM:
+        return vehicles
+    def distance_to_pickup( vehicle:Vehicle ) -> float:
+        factory_id = vehicle.cur_factory_id if vehicle.cur_factory_id else vehicle.destination.id
+        return pdata.distance( pdata.factory_id_to_int[factory_id], pickup_node.factory )
+    nearest_vehicles = sorted( vehicles, key=distance_to_pickup )[:Configs.INSERT_NEAREST_VEHICLE_NUM] # stable sort
+    return sorted( nearest_vehicles, key=lambda vehicle: vehicle.no )
+
+
+def __find_best_insert_into_vehicles( pdata:ProblemData, solution:LLSolution, pickup_node:LLNode, delivery_node:LLNode,
+                                      vehicles:List[Vehicle] ) -> tuple[float, int, int, int]:
+    """
+    Finds the best insertion of the couple into the routes of the given vehicles.
+    Positions are given by the number of factory nodes before them, position 0 is the begin node.
+    Returns: score, vehicle number, position of the pickup and the delivery node in the original route, or None.
+    """
+    # constraints are checked by the route summaries, if the delivery items are the pickup items in reverse order
+    is_couple = [item.id for item in delivery_node.items] == [item.id for item in reversed(pickup_node.items)]
+    # lower bound of the score: routes get longer and the vehicles do not arrive earlier at the factories, which is
+    # the case if inserted nodes do not save travel time and no vehicle waits for a dock (tardiness does not decrease)
+    total_dist, total_tard, congested = solution.evaluate_terms()
+    vehicle_num = len(pdata.vehicles)
+    tard_weight = Configs.LAMDA / 3600
+
+    best_insert:tuple = None
+    for vehicle in vehicles:
         route:LLRoute = solution.routes[vehicle.no]
+        route_summary = solution.route_summary(vehicle) if is_couple else None
+        added_distance = None if congested else __get_added_distance_function(pdata, vehicle, route, pickup_node, delivery_node)
+        if best_insert and added_distance and (total_dist + added_distance.lower_bound) / vehicle_num + tard_weight * total_tard > best_insert[0] + Configs.INSERT_PRUNING_EPSILON:
+            continue # hopeless vehicle
         current_node_1 = route.begin
+        i = 0 # position of *current_node_1*
         while current_node_1 != route.end:
             route.insert_node_after(pickup_node, after=current_node_1)
             current_node_2 = pickup_node
+            j = i # position of *current_node_2* in the route without the pickup node
             while current_node_2 != route.end:
                 route.insert_node_after(delivery_node, after=current_node_2)
-                if solution.check_vehicle_route_constraints(vehicle):
-                    score = solution.evaluate()
-                    possible_inserts.append( (score, vehicle, current_node_1, current_node_2) )
+                if route_summary.check_couple_insertion(pickup_node, delivery_node, i, j) if route_summary else solution.check_vehicle_route_constraints(vehicle):
+                    if not best_insert or not added_distance or (total_dist + added_distance(i, j)) / vehicle_num + tard_weight * total_tard <= best_insert[0] + Configs.INSERT_PRUNING_EPSILON:
+                        score = solution.evaluate()
+                        if not best_insert or score < best_insert[0]: # <= if choosing strategy is last from all optimal
+                            best_insert = (score, vehicle.no, i, j)
                 delivery_node.remove()
                 current_node_2 = current_node_2.succ
+                j += 1
             pickup_node.remove()
             current_node_1 = current_node_1.succ
-
-    # choosing strategy: first from all optimal
-    best_insert:tuple = possible_inserts[0]
-    for ins in possible_inserts:
-        if ins[0] < best_insert[0]: # <= if choosing strategy is last from all optimal
-            best_insert = ins
-
-    # choosing strategy: random from all optimal
-    # best_score = min( [ ins[0] for ins in possible_inserts ] )
-    # optimal_inserts = [ ins for ins in possible_inserts if ins[0] == best_score]
-    # best_insert:tuple = random.choice(optimal_inserts)
-
-    return best_insert[0], best_insert[1], best_insert[2], best_insert[3]
+            i += 1
+
+    return best_insert
+
+
+class AddedDistance:
+    """
+    Added distance of inserting a couple into a route, by the positions of the pickup and the delivery node.
+    Distances are added the same way as in the evaluation of the solution: traveling to the first node is counted only
+    from the current factory, and between the nodes only if the factory changes.
+    """
+    def __init__( self, pdata:ProblemData, vehicle:Vehicle, route:LLRoute, pickup_node:LLNode, delivery_node:LLNode ):
+        self.pdata = pdata
+        self.pickup_factory:int   = pickup_node.factory
+        self.delivery_factory:int = delivery_node.factory
+        # factories of the positions, position 0 is the current factory of the vehicle (None if it is traveling)
+        self.factories:List[int]  = [ pdata.factory_id_to_int[vehicle.cur_factory_id] if vehicle.cur_factory_id else None ]
+        self.factories.extend( node.factory for node in route.factory_nodes )
+        self.factories.append(None) # end of the route
+
+        positions = range(len(self.factories) - 1)
+        self.pickup_detours:List[float]   = [ self.__detour(i, self.pickup_factory) for i in positions ]
+        self.delivery_detours:List[float] = [ self.__detour(j, self.delivery_factory) for j in positions ]
+        min_delivery_detours = self.delivery_detours[:]
+        for j in reversed(positions[:-1]):
+            min_delivery_detours[j] = min( min_delivery_detours[j], min_delivery_detours[j+1] )
+        self.lower_bound:float = min( min( self(i, i) for i in positions ),
+                                      min( [ self.pickup_detours[i] + min_delivery_detours[i+1] for i in positions[:-1] ], default=math.inf ) )
+
+    def __call__( self, i:int, j:int ) -> float:
+        if i < j:
+            return self.pickup_detours[i] + self.delivery_detours[j]
+        return self.__hop(i, self.factories[i], self.pickup_factory) + self.__hop(None, self.pickup_factory, self.delivery_factory) \
+               + self.__hop(None, self.delivery_factory, self.factories[i+1]) - self.__hop(i, self.factories[i], self.factories[i+1])
+
+    def __detour( self, i:int, factory:int ) -> float:
+        # inserting a node of the given factory after position i
+        return self.__hop(i, self.factories[i], factory) + self.__hop(None, factory, self.factories[i+1]) - self.__hop(i, self.factories[i], self.factories[i+1])
+
+    def __hop( self, i:int, from_factory:int, to_factory:int ) -> float:
+        # *i* is the position of *from_factory*, if it may be the begin node
+        if from_factory is None or to_factory is None:
+            return 0
+        if i == 0: # traveling from the current factory is counted even if it is the same factory
+            return self.pdata.distance(from_factory, to_factory)
+        return self.pdata.distance(from_factory, to_factory) if from_factory != to_factory else 0
+
+
+def __get_added_distance_function( pdata:ProblemData, vehicle:Vehicle, route:LLRoute, pickup_node:LLNode, delivery_node:LLNode ) -> AddedDistance:
+    """
+    Returns the added distance function of the route, if inserted nodes do not make the vehicle arrive earlier at the
+    factories of the route, that means nodes at other factories do not save the dock approaching time. Returns None otherwise.
+    """
+    factories:List[int] = [ pdata.factory_id_to_int[vehicle.cur_factory_id] if vehicle.cur_factory_id else None ]
+    factories.extend( node.factory for node in route.factory_nodes )
+    for factory in (pickup_node.factory, delivery_node.factory):
+        for from_factory, to_factory in zip(factories[:-1], factories[1:]):
+            if from_factory is None or factory in (from_factory, to_factory):
+                continue
+            if pdata.time_mtx[from_factory][factory] + pdata.time_mtx[factory][to_factory] + Configs.DOCK_APPROACHING_TIME < pdata.time_mtx[from_factory][to_factory]:
+                return None
+    # pickup node inserted directly before the delivery node
+    for from_factory in factories:
+        if from_factory is None or pickup_node.factory in (from_factory, delivery_node.factory):
+            continue
+        if pdata.time_mtx[from_factory][pickup_node.factory] + pdata.time_mtx[pickup_node.factory][delivery_node.factory] + Configs.DOCK_APPROACHING_TIME < pdata.time_mtx[from_factory][delivery_node.factory]:
+            return None
+    return AddedDistance(pdata, vehicle, route, pickup_node, delivery_node)
 
 
 """
@@ -299,28 +422,12 @@ def __read_input_json():
     id_to_factory = get_factory_info(Configs.factory_info_file_path)
 
     # read route info
-    distance_mtx = read_json(Configs.distance_mtx_file_path)
-    time_mtx = read_json(Configs.time_mtx_file_path)
-    route_info = { 'distance': distance_mtx, 'time': time_mtx }
+    route_info = read_route_info()
 
     # read current input
     unallocated_order_items = read_json_from_file(Configs.algorithm_unallocated_order_items_input_path)
-    id_to_unallocated_order_item = get_order_item_dict(unallocated_order_items, 'OrderItem')
-
     ongoing_order_items = read_json_from_file(Configs.algorithm_ongoing_order_items_input_path)
-    id_to_ongoing_order_item = get_order_item_dict(ongoing_order_items, 'OrderItem')
-
-    id_to_order_item = {**id_to_unallocated_order_item, **id_to_ongoing_order_item}
-
     vehicle_infos = read_json_from_file(Configs.algorithm_vehicle_input_info_path)
-    id_to_vehicle = get_vehicle_instance_dict(vehicle_infos, id_to_order_item, id_to_factory)
-
-    problem_data = ProblemData( id_to_factory, route_info, id_to_unallocated_order_item, id_to_vehicle )
-
-    # read instance number
-    with open(Configs.current_instance_file_path, 'r') as f:
-            curr_instance = f.read()
-    problem_data.current_instance = curr_instance
 
     # read previous planned route of vehicles (only from the second iteration)
     with open(Configs.first_iteration_flag_file_path, 'r') as f:
@@ -328,8 +435,46 @@ def __read_input_json():
     if first_iteration_flag: # toggle flag in the first iteration
         with open(Configs.first_iteration_flag_file_path, 'w') as f:
             f.write('0')
+        vehicle_id_to_planned_route_from_json = None
     else: # read previous planned routes
         vehicle_id_to_planned_route_from_json = read_json_from_file(Configs.algorithm_output_planned_route_path)
+
+    problem_data = create_problem_data( id_to_factory, route_info, unallocated_order_items, ongoing_order_items,
+                                        vehicle_infos, vehicle_id_to_planned_route_from_json )
+
+    # read instance number
+    with open(Configs.current_instance_file_path, 'r') as f:
+            curr_instance = f.read()
+    problem_data.current_instance = curr_instance
+
+    return problem_data
+
+
+def read_route_info() -> Dict[str, list]:
+    """
+    Reads the distance and the transport time matrices from the binary cache of the route matrices.
+    """
+    return get_route_matrices()
+
+
+def create_problem_data( id_to_factory:Dict[str, Factory], route_info:Dict[str, list], unallocated_order_items:list,
+                         ongoing_order_items:list, vehicle_infos:list, vehicle_id_to_planned_route_from_json:dict ) -> ProblemData:
+    """
+    Creates problem data from the json data of the simulator.
+
+    Parameters:
+        - unallocated_order_items, ongoing_order_items, vehicle_infos: content of the input json files
+        - vehicle_id_to_planned_route_from_json: content of the previous output route json, None in the first iteration
+    """
+    id_to_unallocated_order_item = get_order_item_dict(unallocated_order_items, 'OrderItem')
+    id_to_ongoing_order_item = get_order_item_dict(ongoing_order_items, 'OrderItem')
+    id_to_order_item = {**id_to_unallocated_order_item, **id_to_ongoing_order_item}
+
+    id_to_vehicle = get_vehicle_instance_dict(vehicle_infos, id_to_order_item, id_to_factory)
+
+    problem_data = ProblemData( id_to_factory, route_info, id_to_unallocated_order_item, id_to_vehicle )
+
+    if vehicle_id_to_planned_route_from_json is not None: # set previous planned routes
         vehicle_id_to_planned_route = __convert_json_to_nodes(vehicle_id_to_planned_route_from_json, id_to_order_item)
         for vehicle in problem_data.vehicles:
             # set planned route from input (except if there's no destination, which means planned route is already obsolete)
@@ -394,6 +539,53 @@ def __output_json(vehicle_id_to_destination, vehicle_id_to_planned_route):
     write_json_to_file(Configs.algorithm_output_planned_route_path, convert_nodes_to_json(vehicle_id_to_planned_route))
 
 
+class InProcessDispatcher:
+    """
+    In-process counterpart of *main_algorithm.py*, used by the "in_process" and "worker" calling modes of the simulator.
+    The state kept between the decision points (first iteration flag, previous planned routes) is held in memory
+    instead of files, and the factory info and the route matrices are read only once.
+    The problem data is created from the same json data as in the subprocess mode, so the dispatch result is identical.
+    """
+    def __init__( self, solve:Callable[[ProblemData], LLSolution] ) -> None:
+        """
+        Parameters:
+            - solve: the dispatching algorithm, creates a solution from problem data
+        """
+        self.solve = solve
+        self.id_to_factory:Dict[str, Factory] = get_factory_info(Configs.factory_info_file_path)
+        self.route_info:Dict[str, list]       = read_route_info()
+        self.vehicle_id_to_planned_route_from_json:dict = None # previous output route, None in the first iteration
+
+    def __call__( self, input_info:InputInfo ) -> DispatchResult:
+        vehicle_infos, unallocated_order_items, ongoing_order_items = convert_input_info_to_json_data(input_info)
+        vehicle_id_to_destination, vehicle_id_to_planned_route = self.dispatch_from_json_data( vehicle_infos,
+                                                                                              unallocated_order_items,
+                                                                                              ongoing_order_items )
+        return DispatchResult( vehicle_id_to_destination, vehicle_id_to_planned_route )
+
+    def dispatch_from_json_data( self, vehicle_infos:list, unallocated_order_items:list,
+                                 ongoing_order_items:list ) -> tuple[Dict[str, Node], Dict[str, List[Node]]]:
+        """
+        Dispatches orders given the content of the input json files.
+        Returns: destinations and planned routes of the vehicles.
+        """
+        problem_data = create_problem_data( self.id_to_factory, self.route_info, unallocated_order_items,
+                                            ongoing_order_items, vehicle_infos, self.vehicle_id_to_planned_route_from_json )
+
+        solution = self.solve( problem_data )
+
+        vehicle_id_to_destination, vehicle_id_to_planned_route = convert_solution( problem_data, solution )
+        self.vehicle_id_to_planned_route_from_json = convert_nodes_to_json(vehicle_id_to_planned_route)
+        return vehicle_id_to_destination, vehicle_id_to_planned_route
+
+
+def create_dispatcher() -> InProcessDispatcher:
+    """
+    Creates the dispatcher of the in-process calling mode.
+    """
+    return InProcessDispatcher( dispatch_orders_to_vehicles )
+
+
 """
 Auxiliary functions
 """
@@ -25,7 +25,7 @@ from src.common.node import Node
 from src.common.order import OrderItem
 from src.common.vehicle import Vehicle
 from src.conf.configs import Configs
-from src.utils.input_utils import get_factory_info, read_json
+from src.utils.input_utils import get_factory_info, get_route_matrices
 from src.utils.json_tools import convert_nodes_to_json
 from src.utils.json_tools import get_vehicle_instance_dict, get_order_item_dict, __convert_json_to_nodes
 from src.utils.json_tools import read_json_from_file, write_json_to_file
@@ -247,9 +247,7 @@ def __read_input_json():
     id_to_factory = get_factory_info(Configs.factory_info_file_path)
 
     # read route info
-    distance_mtx = read_json(Configs.distance_mtx_file_path)
-    time_mtx = read_json(Configs.time_mtx_file_path)
-    route_info = { 'distance': distance_mtx, 'time': time_mtx }
+    route_info = get_route_matrices()
 
     # read current input
     unallocated_order_items = read_json_from_file(Configs.algorithm_unallocated_order_items_input_path)
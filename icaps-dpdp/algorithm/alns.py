@@ -0,0 +1,255 @@
+from algorithm.problemdata           import ProblemData
+from algorithm.localsearch_structs   import LLNode, LLSolution
+from algorithm.algorithm_best_insert import find_best_insert
+from algorithm.localsearch           import LS_EPSILON, start_factory
+from algorithm.time_budget           import TimeBudget
+from src.common.vehicle              import Vehicle
+from src.conf.configs                import Configs
+from typing                          import Callable, List, Dict
+import itertools
+import math
+import random
+
+ALNS_TIME_SHARE        = 0.5        # share of the remaining time of the solver run spent by ALNS, the descent gets the rest
+ALNS_ITERATION_NUM     = None       # maximal number of iterations of a solver run, None to iterate until its time share is over
+ALNS_MIN_REMOVED_NUM   = 1          # minimal number of couples removed by a destroy operator
+ALNS_MAX_REMOVED_NUM   = 6          # maximal number of couples removed by a destroy operator
+ALNS_SEGMENT_LENGTH    = 10         # iterations between the updates of the operator weights
+ALNS_REACTION_FACTOR   = 0.3        # weight of the last segment in the updated operator weights
+ALNS_SCORES            = (33, 9, 3) # operator scores of a new best, an improving and an accepted worse solution
+ALNS_START_WORSENING   = 0.01       # relative worsening accepted with probability 0.5 at the start of the annealing
+ALNS_COOLING_RATE      = 0.97       # temperature decrease of the annealing in an iteration
+ALNS_RANDOMNESS        = 3          # randomness of the worst and related removals, 1 for uniform random choices
+ALNS_SHAW_TIME_WEIGHT  = 10         # weight of the difference of the committed completion times (km per hour) in relatedness
+
+def improve_by_alns( pdata:ProblemData, solution:LLSolution, budget:TimeBudget, seed:int = None ) -> bool:
+    """
+    Improves the solution by adaptive large neighbourhood search: in each iteration some couples are removed by a destroy
+    operator and reinserted by a repair operator (built on find_best_insert), the new solution is accepted by simulated
+    annealing. The operators are chosen by roulette wheel with weights adapted to their success in the previous segments.
+    The best solution found is kept in the given solution object. The search iterates until the budget (or the running
+    phase of the budget) expires, or until ALNS_ITERATION_NUM iterations.
+    Returns: whether the solution was improved.
+    """
+    rng = random.Random( Configs.RANDOM_SEED if seed is None else seed )
+    destroy_weights:Dict[str, float] = { name:1.0 for name in DESTROY_OPERATORS }
+    repair_weights:Dict[str, float]  = { name:1.0 for name in REPAIR_OPERATORS }
+    destroy_scores:Dict[str, list]   = { name:[0, 0] for name in DESTROY_OPERATORS } # sum of the scores and number of uses in the segment
+    repair_scores:Dict[str, list]    = { name:[0, 0] for name in REPAIR_OPERATORS }
+
+    initial_value = solution.evaluate()
+    current_value, current_routes = initial_value, snapshot_routes( solution )
+    best_value, best_routes       = initial_value, current_routes
+    temperature = ALNS_START_WORSENING * initial_value / math.log(2)
+
+    for iteration in itertools.count():
+        if budget.expired() or iteration == ALNS_ITERATION_NUM:
+            break
+
+        # destroy and repair
+        destroy = roulette_wheel( rng, destroy_weights )
+        repair  = roulette_wheel( rng, repair_weights )
+        removed_couples = DESTROY_OPERATORS[destroy]( pdata, solution, rng, rng.randint(ALNS_MIN_REMOVED_NUM, ALNS_MAX_REMOVED_NUM) )
+        if not removed_couples:
+            continue
+        repaired = REPAIR_OPERATORS[repair]( pdata, solution, rng, removed_couples )
+
+        # acceptance, a solution missing couples which could not be reinserted is rejected
+        value = solution.evaluate() if repaired else math.inf
+        score = 0
+        if value + LS_EPSILON < best_value:
+            score = ALNS_SCORES[0]
+            best_value, best_routes = value, snapshot_routes( solution )
+        elif value + LS_EPSILON < current_value:
+            score = ALNS_SCORES[1]
+        elif temperature > 0 and rng.random() < math.exp( -(value - current_value) / temperature ):
+            score = ALNS_SCORES[2]
+        if score > 0:
+            current_value, current_routes = value, snapshot_routes( solution )
+        else:
+            restore_routes( solution, current_routes )
+        temperature *= ALNS_COOLING_RATE
+
+        # adaptive weights
+        for scores, name in [ (destroy_scores, destroy), (repair_scores, repair) ]:
+            scores[name][0] += score
+            scores[name][1] += 1
+        if (iteration + 1) % ALNS_SEGMENT_LENGTH == 0:
+            for weights, scores in [ (destroy_weights, destroy_scores), (repair_weights, repair_scores) ]:
+                for name in weights:
+                    score_sum, use_num = scores[name]
+                    if use_num > 0:
+                        weights[name] = (1 - ALNS_REACTION_FACTOR) * weights[name] + ALNS_REACTION_FACTOR * score_sum / use_num
+                    scores[name] = [0, 0]
+
+    restore_routes( solution, best_routes )
+    return best_value + LS_EPSILON < initial_value
+
+
+'''
+Destroy operators: remove the given number of couples (or fewer) keeping the routes feasible.
+Returns: the removed couples as (pickup node, delivery node) pairs.
+'''
+
+def random_removal( pdata:ProblemData, solution:LLSolution, rng:random.Random, couple_num:int ) -> List[tuple[LLNode, LLNode]]:
+    """
+    Removes random couples.
+    """
+    couples = removable_couples( pdata, solution )
+    rng.shuffle( couples )
+    return remove_couples( pdata, solution, couples, couple_num )
+
+def worst_tardiness_removal( pdata:ProblemData, solution:LLSolution, rng:random.Random, couple_num:int ) -> List[tuple[LLNode, LLNode]]:
+    """
+    Removes the couples with the largest tardiness of their orders, ties are broken by the largest detour.
+    """
+    order_id_to_tardiness = solution.calculate_tardiness_dict()
+    def cost( couple:tuple[Vehicle, LLNode, LLNode] ) -> tuple:
+        vehicle, pickup_node, delivery_node = couple
+        tardiness = order_id_to_tardiness.get( delivery_node.items[0].order_id, 0 )
+        return ( tardiness, detour(pdata, vehicle, pickup_node) + detour(pdata, vehicle, delivery_node) )
+    couples = sorted( removable_couples( pdata, solution ), key=cost, reverse=True )
+    return remove_couples( pdata, solution, randomized_order(rng, couples), couple_num )
+
+def related_removal( pdata:ProblemData, solution:LLSolution, rng:random.Random, couple_num:int ) -> List[tuple[LLNode, LLNode]]:
+    """
+    Removes a random couple and the couples most related to it (Shaw removal): near pickup and delivery factories and
+    similar committed completion times.
+    """
+    couples = removable_couples( pdata, solution )
+    if not couples:
+        return []
+    seed_couple = couples.pop( rng.randrange(len(couples)) )
+    _, seed_pickup, seed_delivery = seed_couple
+    def relatedness( couple:tuple[Vehicle, LLNode, LLNode] ) -> float:
+        _, pickup_node, delivery_node = couple
+        time_difference = abs( pickup_node.items[0].committed_completion_time - seed_pickup.items[0].committed_completion_time )
+        return ( pdata.distance(seed_pickup.factory, pickup_node.factory) + pdata.distance(seed_delivery.factory, delivery_node.factory)
+                 + ALNS_SHAW_TIME_WEIGHT * time_difference / 3600 )
+    couples.sort( key=relatedness )
+    return remove_couples( pdata, solution, [seed_couple] + randomized_order(rng, couples), couple_num )
+
+DESTROY_OPERATORS:Dict[str, Callable] = { 'random':  random_removal,
+                                          'worst':   worst_tardiness_removal,
+                                          'related': related_removal }
+
+
+'''
+Repair operators: insert the removed couples at their best positions given by find_best_insert.
+Returns: whether all the couples were inserted.
+'''
+
+def random_order_insertion( pdata:ProblemData, solution:LLSolution, rng:random.Random, couples:List[tuple[LLNode, LLNode]] ) -> bool:
+    """
+    Inserts the couples in random order.
+    """
+    couples = list(couples)
+    rng.shuffle( couples )
+    return insert_couples( pdata, solution, couples )
+
+def earliest_due_insertion( pdata:ProblemData, solution:LLSolution, rng:random.Random, couples:List[tuple[LLNode, LLNode]] ) -> bool:
+    """
+    Inserts the couples in the order of their committed completion times.
+    """
+    couples = sorted( couples, key=lambda couple: couple[0].items[0].committed_completion_time )
+    return insert_couples( pdata, solution, couples )
+
+REPAIR_OPERATORS:Dict[str, Callable] = { 'random_order': random_order_insertion,
+                                         'earliest_due': earliest_due_insertion }
+
+
+'''
+Aux functions
+'''
+
+def removable_couples( pdata:ProblemData, solution:LLSolution ) -> List[tuple[Vehicle, LLNode, LLNode]]:
+    """
+    Returns the couples of the solution with their vehicles, in the order of the routes.
+    """
+    return [ (vehicle, node, node.partner) for vehicle in pdata.vehicles for node in solution.routes[vehicle.no].factory_nodes
+             if node.nodetype == 'p' and node.partner ]
+
+def remove_couples( pdata:ProblemData, solution:LLSolution, couples:List[tuple[Vehicle, LLNode, LLNode]], couple_num:int ) -> List[tuple[LLNode, LLNode]]:
+    """
+    Removes the first given number of couples in the given order, whose removal keeps the route of their vehicle feasible.
+    Returns: the removed couples.
+    """
+    removed_couples = []
+    for vehicle, pickup_node, delivery_node in couples:
+        if len(removed_couples) == couple_num:
+            break
+        orig_pred_pickup = pickup_node.pred
+        orig_pred_delivery = delivery_node.pred
+        pickup_node.remove()
+        delivery_node.remove()
+        if not solution.check_vehicle_route_constraints(vehicle):
+            # undo
+            pickup_node.insert_after(orig_pred_pickup)
+            delivery_node.insert_after(orig_pred_delivery)
+            continue
+        removed_couples.append( (pickup_node, delivery_node) )
+    return removed_couples
+
+def insert_couples( pdata:ProblemData, solution:LLSolution, couples:List[tuple[LLNode, LLNode]] ) -> bool:
+    """
+    Inserts the couples one after the other at their best positions.
+    Returns: whether all the couples were inserted, the insertion stops at the first couple without a feasible position
+    (e.g. the routes of the other couples no longer leave capacity for it). The routes are restored by the caller then.
+    """
+    for pickup_node, delivery_node in couples:
+        best_insert = find_best_insert( pdata, solution, pickup_node, delivery_node, required=False )
+        if not best_insert:
+            return False
+        score, vehicle, p_node_after, d_node_after = best_insert
+        solution.routes[vehicle.no].insert_node_after( pickup_node, after=p_node_after )
+        solution.routes[vehicle.no].insert_node_after( delivery_node, after=d_node_after )
+    return True
+
+def randomized_order( rng:random.Random, sorted_list:list ) -> list:
+    """
+    Returns the elements of the sorted list in randomized order: the elements are drawn one after the other, the
+    position of the next one is given by len * r^ALNS_RANDOMNESS for a uniform random r, so the first ones are preferred.
+    """
+    remaining = list(sorted_list)
+    randomized = []
+    while remaining:
+        randomized.append( remaining.pop( int( len(remaining) * rng.random() ** ALNS_RANDOMNESS ) ) )
+    return randomized
+
+def roulette_wheel( rng:random.Random, weights:Dict[str, float] ) -> str:
+    """
+    Returns an operator chosen with probability proportional to its weight.
+    """
+    names = list(weights)
+    return rng.choices( names, weights=[ max(weights[name], LS_EPSILON) for name in names ] )[0]
+
+def detour( pdata:ProblemData, vehicle:Vehicle, node:LLNode ) -> float:
+    """
+    Returns the distance saved by removing the node from its route.
+    """
+    pred_factory = node.pred.factory if node.pred.is_factory else start_factory( pdata, vehicle )
+    succ_factory = node.succ.factory if node.succ.is_factory else None
+    saved = 0
+    if pred_factory is not None:
+        saved += pdata.distance( pred_factory, node.factory )
+    if succ_factory is not None:
+        saved += pdata.distance( node.factory, succ_factory )
+    if pred_factory is not None and succ_factory is not None:
+        saved -= pdata.distance( pred_factory, succ_factory )
+    return saved
+
+def snapshot_routes( solution:LLSolution ) -> List[List[LLNode]]:
+    """
+    Returns the node sequences of the routes.
+    """
+    return [ list(route.factory_nodes) for route in solution.routes ]
+
+def restore_routes( solution:LLSolution, routes:List[List[LLNode]] ) -> None:
+    """
+    Relinks the nodes of the solution according to the given node sequences.
+    """
+    for route in solution.routes:
+        route.clear()
+    for route, nodes in zip( solution.routes, routes ):
+        for node in nodes:
+            route.insert_node_back( node )
@@ -0,0 +1,53 @@
+from bisect import bisect_left, insort
+from typing import Any
+
+
+class DockingQueue():
+    """
+    Release times of the docks of a factory occupied by vehicles, kept in ascending order.
+    Each vehicle occupies at most one dock of the factory at a time, pushing a vehicle again replaces its release time.
+    Push and remove take O(n) time for n vehicles in the queue (list insertion and deletion), the k-th earliest release
+    time O(1). A heap would not give the k-th earliest release time, and n is at most the number of vehicles at the factory.
+    """
+    def __init__(self):
+        self.release_times:list = []       # sorted release times
+        self.vehicle_to_release_time = {}  # release time of each vehicle in the queue
+    def push(self, release_time, vehicle:Any):
+        self.remove(vehicle)
+        insort(self.release_times, release_time)
+        self.vehicle_to_release_time[vehicle] = release_time
+    def remove(self, vehicle:Any):
+        # vehicles not in the queue (e.g. parked without service) are ignored
+        release_time = self.vehicle_to_release_time.pop(vehicle, None)
+        if release_time is not None:
+            del self.release_times[bisect_left(self.release_times, release_time)]
+    def kth_earliest_release_time(self, k:int):
+        return self.release_times[k-1]
+    def waiting_time(self, arrival_time, dock_num:int):
+        # waiting until the number of vehicles in the queue gets less than the number of docks
+        queue_size = len(self.release_times)
+        if dock_num > queue_size:
+            return 0
+        return self.kth_earliest_release_time(queue_size-dock_num+1) - arrival_time
+    def __len__(self):
+        return len(self.release_times)
+
+
+# test
+if __name__ == "__main__":
+    my_queue = DockingQueue()
+
+    my_queue.push(30, 'v1')
+    my_queue.push(10, 'v2')
+    my_queue.push(20, 'v3')
+    print(my_queue.waiting_time(5, 2), my_queue.waiting_time(5, 3))
+    my_queue.remove('v2')
+    my_queue.remove('v4')
+    print(my_queue.waiting_time(15, 1), my_queue.waiting_time(15, 2))
+    my_queue.push(40, 'v3')
+    print(my_queue.waiting_time(15, 1), len(my_queue))
+
+    # expected result
+    """     15 5
+            15 5
+            25 2                                                                """
@@ -1,152 +1,321 @@
 from algorithm.problemdata           import ProblemData
-from algorithm.localsearch_structs   import LLNode, LLRoute, LLSolution
+from algorithm.localsearch_structs   import LLNode, LLRoute, LLSolution, swap_nodes
 from algorithm.algorithm_best_insert import find_best_insert
+from algorithm.time_budget           import TimeBudget
 from src.common.vehicle              import Vehicle
-import time
+from src.conf.configs                import Configs
+from typing                          import Iterator, List, Dict, Set
+import random
 
 LS_EPSILON = 0.000001
 
-def improve_by_couple_exchange( pdata:ProblemData, solution:LLSolution ) -> bool:
+# search strategy of the operators (the defaults give the best improvement over the full neighbourhoods)
+LS_FIRST_IMPROVEMENT    = False     # apply the first improving move instead of the best one
+LS_NEIGHBORHOOD_ORDER   = 'natural' # order of the couples (blocks) to move: 'natural' (order of the routes) or 'random'
+LS_GRANULAR_FACTORY_NUM = None      # move couples (blocks) only next to the nearest factories of their factories, None for no limit
+LS_DONT_LOOK_BITS       = False     # skip the couples (blocks) which could not be improved since their route changed
+
+class SearchStrategy:
+    """
+    Search strategy of the local search operators, keeps the don't look bits and the random generator of a search.
+    """
+    def __init__( self, first_improvement:bool = None, neighborhood_order:str = None, granular_factory_num:int = None,
+                  dont_look_bits:bool = None, seed:int = None ):
+        self.first_improvement:bool  = LS_FIRST_IMPROVEMENT if first_improvement is None else first_improvement
+        self.neighborhood_order:str  = LS_NEIGHBORHOOD_ORDER if neighborhood_order is None else neighborhood_order
+        self.granular_factory_num:int = LS_GRANULAR_FACTORY_NUM if granular_factory_num is None else granular_factory_num
+        self.dont_look_bits:bool     = LS_DONT_LOOK_BITS if dont_look_bits is None else dont_look_bits
+        assert self.neighborhood_order in {'natural', 'random'}, f'"{self.neighborhood_order}" is not a valid neighborhood order'
+
+        self.__random = random.Random( Configs.RANDOM_SEED if seed is None else seed )
+        self.__operator_to_dont_look:Dict[str, Set[LLNode]] = {}
+        self.__factory_to_nearest_factories:Dict[int, Set[int]] = {}
+        self.__operator_to_resume_node:Dict[str, LLNode] = {} # couple (block) the scan of the operator is at or resumes at
+
+        # routes and don't look bits of the previous decision point (warm start), given by the keys of the nodes
+        self.__vehicle_id_to_node_keys:Dict[str, List[tuple]] = None
+        self.__operator_to_dont_look_keys:Dict[str, Set[tuple]] = {}
+
+    def pickup_nodes( self, pdata:ProblemData, solution:LLSolution, operator:str ) -> Iterator[tuple[Vehicle, LLNode]]:
+        """
+        Yields the pickup nodes of the couples (blocks) to move by the operator with their vehicles, in the order of the strategy.
+        The nodes are listed before the first one is yielded. The scan starts at the couple (block) an interrupted scan of
+        the operator stopped at, if it is still listed.
+        """
+        dont_look = self.__operator_to_dont_look.get(operator, set())
+        pickup_nodes = [ (vehicle, node) for vehicle in pdata.vehicles for node in solution.routes[vehicle.no].factory_nodes
+                         if node.nodetype == 'p' and node not in dont_look ]
+        if self.neighborhood_order == 'random':
+            self.__random.shuffle(pickup_nodes)
+        resume_node = self.__operator_to_resume_node.get(operator)
+        position = next( (k for k, (vehicle, node) in enumerate(pickup_nodes) if node is resume_node), 0 )
+        for vehicle, node in pickup_nodes[position:] + pickup_nodes[:position]:
+            self.__operator_to_resume_node[operator] = node
+            yield vehicle, node
+
+    def scan_completed( self, operator:str ) -> None:
+        """
+        Forgets the position of the scan of the operator, which was not interrupted: the next scan starts from the beginning.
+        """
+        self.__operator_to_resume_node.pop(operator, None)
+
+    def dont_look( self, operator:str, pickup_node:LLNode ) -> None:
+        """
+        Sets the don't look bit of the couple (block) for the operator.
+        """
+        if self.dont_look_bits:
+            self.__operator_to_dont_look.setdefault(operator, set()).add(pickup_node)
+
+    def look( self, operator:str, pickup_node:LLNode ) -> None:
+        """
+        Clears the don't look bit of the couple (block) for the operator.
+        """
+        self.__operator_to_dont_look.get(operator, set()).discard(pickup_node)
+
+    def routes_changed( self, solution:LLSolution, vehicles:List[Vehicle] ) -> None:
+        """
+        Clears the don't look bits of all the couples (blocks) in the routes of the vehicles.
+        """
+        for vehicle in vehicles:
+            for node in solution.routes[vehicle.no].factory_nodes:
+                for dont_look in self.__operator_to_dont_look.values():
+                    dont_look.discard(node)
+
+    def remember_routes( self, pdata:ProblemData, solution:LLSolution ) -> None:
+        """
+        Remembers the routes and the don't look bits of the solution for the warm start at the next decision point.
+        """
+        self.__vehicle_id_to_node_keys = { vehicle.id:[ node_key(node) for node in solution.routes[vehicle.no].factory_nodes ]
+                                           for vehicle in pdata.vehicles }
+        self.__operator_to_dont_look_keys = { operator:{ node_key(node) for node in dont_look }
+                                              for operator, dont_look in self.__operator_to_dont_look.items() }
+
+    def warm_start( self, pdata:ProblemData, solution:LLSolution ) -> None:
+        """
+        Carries the don't look bits of the previous decision point over to the nodes of the solution.
+        The bits are kept in the routes which only lost their completed nodes since then, the other routes changed.
+        """
+        self.__operator_to_dont_look = {}
+        if self.__vehicle_id_to_node_keys is None:
+            return
+        for vehicle in pdata.vehicles:
+            nodes = list( solution.routes[vehicle.no].factory_nodes )
+            keys = [ node_key(node) for node in nodes ]
+            previous_keys = self.__vehicle_id_to_node_keys.get( vehicle.id, [] )
+            if len(previous_keys) < len(keys) or previous_keys[len(previous_keys)-len(keys):] != keys:
+                continue
+            for operator, dont_look_keys in self.__operator_to_dont_look_keys.items():
+                dont_look = self.__operator_to_dont_look.setdefault( operator, set() )
+                dont_look.update( node for node, key in zip(nodes, keys) if key in dont_look_keys )
+
+    def stops( self, best_move ) -> bool:
+        """
+        Returns whether the scan of the neighbourhood stops, which is the case if a move was found in first improvement.
+        """
+        return self.first_improvement and best_move is not None
+
+    def are_near( self, pdata:ProblemData, factory:int, other_factory:int ) -> bool:
+        """
+        Returns whether the other factory is one of the nearest factories of the factory (always true without limit).
+        """
+        if self.granular_factory_num is None:
+            return True
+        nearest_factories = self.__factory_to_nearest_factories.get(factory)
+        if nearest_factories is None:
+            # the factory is the nearest to itself, ties are broken by the factory number
+            sorted_factories = sorted( range(len(pdata.factories)), key=lambda other: (other != factory, pdata.distance(factory, other)) )
+            nearest_factories = set( sorted_factories[:self.granular_factory_num] )
+            self.__factory_to_nearest_factories[factory] = nearest_factories
+        return other_factory in nearest_factories
+
+    def position_is_near( self, pdata:ProblemData, vehicle:Vehicle, first_node:LLNode, last_node:LLNode, after:LLNode ) -> bool:
+        """
+        Returns whether a string inserted after the given node would be next to the nearest factories of its first or last node.
+        """
+        if self.granular_factory_num is None:
+            return True
+        pred_factory = after.factory if after.is_factory else start_factory(pdata, vehicle)
+        succ_factory = after.succ.factory if after.succ.is_factory else None
+        return ( (pred_factory is not None and self.are_near(pdata, first_node.factory, pred_factory))
+                 or (succ_factory is not None and self.are_near(pdata, last_node.factory, succ_factory)) )
+
+    def near_vehicles( self, pdata:ProblemData, solution:LLSolution, vehicle:Vehicle, pickup_node:LLNode ) -> List[Vehicle]:
+        """
+        Returns the vehicles starting or visiting a factory next to the nearest factories of the couple, and the vehicle of the couple.
+        """
+        if self.granular_factory_num is None:
+            return pdata.vehicles
+        delivery_node = pickup_node.partner
+        def is_near( other_vehicle:Vehicle ) -> bool:
+            if other_vehicle == vehicle:
+                return True
+            factories = [ start_factory(pdata, other_vehicle) ] + [ node.factory for node in solution.routes[other_vehicle.no].factory_nodes ]
+            return any( self.are_near(pdata, pickup_node.factory, factory) or self.are_near(pdata, delivery_node.factory, factory)
+                        for factory in factories if factory is not None )
+        return [ other_vehicle for other_vehicle in pdata.vehicles if is_near(other_vehicle) ]
+
+def improve_by_couple_exchange( pdata:ProblemData, solution:LLSolution, strategy:SearchStrategy = None, budget:TimeBudget = None ) -> bool:
     '''
     Finds the best couple exchange, that means swapping the position of two pickup-delivery pairs (couples) in any two (or in a single) route.
     '''
+    strategy = strategy or SearchStrategy()
+    budget = budget or TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT )
     initial_value = solution.evaluate()
 
     best_value:float     = initial_value
     best_pickup_1:LLNode = None
     best_pickup_2:LLNode = None
-
-    for vehicle_1 in pdata.vehicles:
-        route_1:LLRoute = solution.routes[vehicle_1.no]
-        for pickup_node_1 in route_1.factory_nodes:
-            
-            if pickup_node_1.nodetype != 'p':
-                continue
-            assert pickup_node_1.partner, f"pickup node without a partner node"
-
-            # check if couple 1 is removable
-            if not couple_is_removeable( solution, vehicle_1, pickup_node_1):
-                continue
-
-            following_vehicles = (f_vehicle for f_vehicle in pdata.vehicles if vehicle_1.no <= f_vehicle.no)
-            for vehicle_2 in following_vehicles:
-                route_2:LLRoute = solution.routes[vehicle_2.no]
-                # search for a second couple
-                # if in the same route, then search among the following nodes only
-                gen_for_pickup_node_2 = route_2.factory_nodes if vehicle_1 != vehicle_2 else pickup_node_1.following_factory_nodes
-                for pickup_node_2 in gen_for_pickup_node_2:
-                    if pickup_node_2.nodetype != 'p':
-                        continue
-                    assert pickup_node_2.partner, f"pickup node without a partner node"
-
-                    # check if couple 2 is removable
-                    if not couple_is_removeable( solution, vehicle_2, pickup_node_2):
-                        continue
-
-                    # swap couple 1 and couple 2
-                    temp1, temp2 = pickup_node_1.partner, pickup_node_2.partner
-                    swap_nodes( pickup_node_1, pickup_node_2 )
-                    swap_nodes( temp1, temp2 )
-                    if not solution.check_vehicle_route_constraints(vehicle_1) or not solution.check_vehicle_route_constraints(vehicle_2):
-                        # undo swapping (swap again)
-                        temp1, temp2 = pickup_node_1.partner, pickup_node_2.partner
-                        swap_nodes( pickup_node_1, pickup_node_2 )
-                        swap_nodes( temp1, temp2 )
-                        continue
-
-                    # check score of new solution
-                    curr_value = solution.evaluate()
-                    if curr_value + LS_EPSILON < best_value:
-                        best_value    = curr_value
-                        best_pickup_1 = pickup_node_1
-                        best_pickup_2 = pickup_node_2
-
+    best_vehicles:List[Vehicle] = None
+
+    for vehicle_1, pickup_node_1 in strategy.pickup_nodes( pdata, solution, 'couple_exchange' ):
+        assert pickup_node_1.partner, f"pickup node without a partner node"
+        strategy.dont_look( 'couple_exchange', pickup_node_1 )
+
+        # check if couple 1 is removable
+        if not couple_is_removeable( solution, vehicle_1, pickup_node_1):
+            continue
+
+        following_vehicles = (f_vehicle for f_vehicle in pdata.vehicles if vehicle_1.no <= f_vehicle.no)
+        for vehicle_2 in following_vehicles:
+            route_2:LLRoute = solution.routes[vehicle_2.no]
+            # search for a second couple
+            # if in the same route, then search among the following nodes only
+            gen_for_pickup_node_2 = route_2.factory_nodes if vehicle_1 != vehicle_2 else pickup_node_1.following_factory_nodes
+            for pickup_node_2 in gen_for_pickup_node_2:
+                if pickup_node_2.nodetype != 'p':
+                    continue
+                assert pickup_node_2.partner, f"pickup node without a partner node"
+                if not strategy.are_near( pdata, pickup_node_1.factory, pickup_node_2.factory ):
+                    continue
+
+                # check if couple 2 is removable
+                if not couple_is_removeable( solution, vehicle_2, pickup_node_2):
+                    continue
+
+                # swap couple 1 and couple 2
+                temp1, temp2 = pickup_node_1.partner, pickup_node_2.partner
+                swap_nodes( pickup_node_1, pickup_node_2 )
+                swap_nodes( temp1, temp2 )
+                if not solution.check_vehicle_route_constraints(vehicle_1) or not solution.check_vehicle_route_constraints(vehicle_2):
                     # undo swapping (swap again)
                     temp1, temp2 = pickup_node_1.partner, pickup_node_2.partner
                     swap_nodes( pickup_node_1, pickup_node_2 )
                     swap_nodes( temp1, temp2 )
+                    continue
+
+                # check score of new solution
+                curr_value = solution.evaluate()
+                if curr_value + LS_EPSILON < initial_value:
+                    strategy.look( 'couple_exchange', pickup_node_1 )
+                if curr_value + LS_EPSILON < best_value:
+                    best_value    = curr_value
+                    best_pickup_1 = pickup_node_1
+                    best_pickup_2 = pickup_node_2
+                    best_vehicles = [vehicle_1, vehicle_2]
+
+                # undo swapping (swap again)
+                temp1, temp2 = pickup_node_1.partner, pickup_node_2.partner
+                swap_nodes( pickup_node_1, pickup_node_2 )
+                swap_nodes( temp1, temp2 )
+                if strategy.stops(best_pickup_1) or budget.expired():
+                    break
+            if strategy.stops(best_pickup_1) or budget.expired():
+                break
+        if strategy.stops(best_pickup_1) or budget.expired():
+            break
     # apply best exchange
     if best_pickup_1 != None:
         assert best_pickup_2, f"couple exchange without second couple"
         temp1, temp2 = best_pickup_1.partner, best_pickup_2.partner
         swap_nodes( best_pickup_1, best_pickup_2 )
         swap_nodes( temp1, temp2 )
+        strategy.routes_changed( solution, best_vehicles )
         # print( f'{initial_value:.2f} -> {best_value:.2f}' )
         return True
     
     # print( f'{initial_value:.2f} -> no further improvement' )
     return False
 
-def improve_by_block_exchange( pdata:ProblemData, solution:LLSolution ) -> bool:
+def improve_by_block_exchange( pdata:ProblemData, solution:LLSolution, strategy:SearchStrategy = None, budget:TimeBudget = None ) -> bool:
     '''
     Finds the best block exchange, that means swapping the position of two strings (blocks) in any two (or in a single) route.
     '''
+    strategy = strategy or SearchStrategy()
+    budget = budget or TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT )
     initial_value = solution.evaluate()
     best_value:float         = initial_value
     best_first_node_1:LLNode = None
     best_first_node_2:LLNode = None
+    best_vehicles:List[Vehicle] = None
 
-    for vehicle in pdata.vehicles:
-        route:LLRoute = solution.routes[vehicle.no]
-        for node in route.factory_nodes:
-            
-            if node.nodetype != 'p':
-                continue
-            assert node.partner, f"pickup node without a partner node"
-
-            # remove block 1
-            original_pred_1 = node.pred
-            solution.remove_string( node, node.partner )
-            if not solution.check_destination_constraint(vehicle):
-                # undo removal of block 1
-                solution.insert_string_after( node, node.partner, after=original_pred_1 )
-                continue
-            # find best exchange
-            following_vehicles = (f_vehicle for f_vehicle in pdata.vehicles if vehicle.no <= f_vehicle.no)
-            for other_vehicle in following_vehicles:
-                other_route:LLRoute = solution.routes[other_vehicle.no]
-                # search for a second block
-                # if in the same route, then search among the following nodes only
-                # it is necessary, otherwise exchange could be erroneous in case of neighboring blocks
-                gen_for_other_node  = other_route.factory_nodes if vehicle != other_vehicle else original_pred_1.following_factory_nodes
-                for other_node in gen_for_other_node:
-                    if other_node.nodetype != 'p':
-                        continue
-                    assert other_node.partner, f"pickup node without a partner node"
-                    # remove block 2
-                    original_pred_2 = other_node.pred
-                    solution.remove_string( other_node, other_node.partner )
-                    if not solution.check_destination_constraint(other_vehicle):
-                        # undo removal of block 2
-                        solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
-                        continue
-                    # try exchange
-                    solution.insert_string_after( node, node.partner, after=original_pred_2 )
-                    if not solution.check_vehicle_route_constraints(other_vehicle):
-                        # undo insertion of block 1 and removal of block 2
-                        solution.remove_string( node, node.partner )
-                        solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
-                        continue
-                    solution.insert_string_after( other_node, other_node.partner, after=original_pred_1 )
-                    if not solution.check_vehicle_route_constraints(vehicle):
-                        # undo insertion of block 2 and block 1 and removal of block 2
-                        solution.remove_string( other_node, other_node.partner )
-                        solution.remove_string( node, node.partner )
-                        solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
-                        continue
-                    curr_value = solution.evaluate()
-                    if curr_value + LS_EPSILON < best_value:
-                        best_value = curr_value
-                        best_first_node_1 = node
-                        best_first_node_2 = other_node
+    for vehicle, node in strategy.pickup_nodes( pdata, solution, 'block_exchange' ):
+        assert node.partner, f"pickup node without a partner node"
+        strategy.dont_look( 'block_exchange', node )
 
+        # remove block 1
+        original_pred_1 = node.pred
+        solution.remove_string( node, node.partner )
+        if not solution.check_destination_constraint(vehicle):
+            # undo removal of block 1
+            solution.insert_string_after( node, node.partner, after=original_pred_1 )
+            continue
+        # find best exchange
+        following_vehicles = (f_vehicle for f_vehicle in pdata.vehicles if vehicle.no <= f_vehicle.no)
+        for other_vehicle in following_vehicles:
+            other_route:LLRoute = solution.routes[other_vehicle.no]
+            # search for a second block
+            # if in the same route, then search among the following nodes only
+            # it is necessary, otherwise exchange could be erroneous in case of neighboring blocks
+            gen_for_other_node  = other_route.factory_nodes if vehicle != other_vehicle else original_pred_1.following_factory_nodes
+            for other_node in gen_for_other_node:
+                if other_node.nodetype != 'p':
+                    continue
+                assert other_node.partner, f"pickup node without a partner node"
+                if not strategy.are_near( pdata, node.factory, other_node.factory ):
+                    continue
+                # remove block 2
+                original_pred_2 = other_node.pred
+                solution.remove_string( other_node, other_node.partner )
+                if not solution.check_destination_constraint(other_vehicle):
+                    # undo removal of block 2
+                    solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
+                    continue
+                # try exchange
+                solution.insert_string_after( node, node.partner, after=original_pred_2 )
+                if not solution.check_vehicle_route_constraints(other_vehicle):
+                    # undo insertion of block 1 and removal of block 2
+                    solution.remove_string( node, node.partner )
+                    solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
+                    continue
+                solution.insert_string_after( other_node, other_node.partner, after=original_pred_1 )
+                if not solution.check_vehicle_route_constraints(vehicle):
                     # undo insertion of block 2 and block 1 and removal of block 2
                     solution.remove_string( other_node, other_node.partner )
                     solution.remove_string( node, node.partner )
                     solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
-
-            # undo removal
-            solution.insert_string_after( node, node.partner, after=original_pred_1 )
+                    continue
+                curr_value = solution.evaluate()
+                if curr_value + LS_EPSILON < initial_value:
+                    strategy.look( 'block_exchange', node )
+                if curr_value + LS_EPSILON < best_value:
+                    best_value = curr_value
+                    best_first_node_1 = node
+                    best_first_node_2 = other_node
+                    best_vehicles = [vehicle, other_vehicle]
+
+                # undo insertion of block 2 and block 1 and removal of block 2
+                solution.remove_string( other_node, other_node.partner )
+                solution.remove_string( node, node.partner )
+                solution.insert_string_after( other_node, other_node.partner, after=original_pred_2 )
+                if strategy.stops(best_first_node_1) or budget.expired():
+                    break
+            if strategy.stops(best_first_node_1) or budget.expired():
+                break
+
+        # undo removal
+        solution.insert_string_after( node, node.partner, after=original_pred_1 )
+        if strategy.stops(best_first_node_1) or budget.expired():
+            break
 
     # apply best exchange
     if best_first_node_1 != None:
@@ -157,55 +326,63 @@ def improve_by_block_exchange( pdata:ProblemData, solution:LLSolution ) -> bool:
         solution.remove_string( best_first_node_2, best_first_node_2.partner )
         solution.insert_string_after( best_first_node_1, best_first_node_1.partner, after=best_first_2_pred )
         solution.insert_string_after( best_first_node_2, best_first_node_2.partner, after=best_first_1_pred )
+        strategy.routes_changed( solution, best_vehicles )
         # print( f'{initial_value:.2f} -> {best_value:.2f}' )
         return True
     
     # print( f'{initial_value:.2f} -> no further improvement' )
     return False
 
-def improve_by_couple_relocation( pdata:ProblemData, solution:LLSolution ) -> bool:
+def improve_by_couple_relocation( pdata:ProblemData, solution:LLSolution, strategy:SearchStrategy = None, budget:TimeBudget = None ) -> bool:
     '''
     Finds the best couple relocation, that means removing a pickup-delivery pair (couple) from a route and inserting it to an other position in any route.
     '''
+    strategy = strategy or SearchStrategy()
+    budget = budget or TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT )
     initial_value = solution.evaluate()
 
     best_value:float          = initial_value
     best_pickup_node:LLNode   = None
     best_pred_pickup:LLNode   = None
     best_pred_delivery:LLNode = None
+    best_vehicles:List[Vehicle] = None
 
-    for vehicle in pdata.vehicles:
-        route:LLRoute = solution.routes[vehicle.no]
-        for pickup_node in route.factory_nodes:
-            
-            if pickup_node.nodetype != 'p':
-                continue
-            assert pickup_node.partner, f"pickup node without a partner node"
-
-            # remove couple
-            delivery_node = pickup_node.partner
-            orig_pred_pickup = pickup_node.pred
-            orig_pred_delivery = delivery_node.pred
-            pickup_node.remove()
-            delivery_node.remove()
-            
-            if not solution.check_vehicle_route_constraints(vehicle):
-                # undo
-                pickup_node.insert_after(orig_pred_pickup)
-                delivery_node.insert_after(orig_pred_delivery)
-                continue
+    for vehicle, pickup_node in strategy.pickup_nodes( pdata, solution, 'couple_relocation' ):
+        assert pickup_node.partner, f"pickup node without a partner node"
+        strategy.dont_look( 'couple_relocation', pickup_node )
 
-            # find best insertion
-            score, other_vehicle, new_pred_pickup, new_pred_delivery = find_best_insert(pdata, solution, pickup_node, delivery_node)
-            if score + LS_EPSILON < best_value:
-                best_value         = score
-                best_pickup_node   = pickup_node
-                best_pred_pickup   = new_pred_pickup
-                best_pred_delivery = new_pred_delivery
+        # the vehicles are selected before the removal, since the couple itself is near to its route
+        vehicles = strategy.near_vehicles( pdata, solution, vehicle, pickup_node )
 
-            # undo removal
+        # remove couple
+        delivery_node = pickup_node.partner
+        orig_pred_pickup = pickup_node.pred
+        orig_pred_delivery = delivery_node.pred
+        pickup_node.remove()
+        delivery_node.remove()
+        
+        if not solution.check_vehicle_route_constraints(vehicle):
+            # undo
             pickup_node.insert_after(orig_pred_pickup)
             delivery_node.insert_after(orig_pred_delivery)
+            continue
+
+        # find best insertion
+        score, other_vehicle, new_pred_pickup, new_pred_delivery = find_best_insert(pdata, solution, pickup_node, delivery_node, vehicles)
+        if score + LS_EPSILON < initial_value:
+            strategy.look( 'couple_relocation', pickup_node )
+        if score + LS_EPSILON < best_value:
+            best_value         = score
+            best_pickup_node   = pickup_node
+            best_pred_pickup   = new_pred_pickup
+            best_pred_delivery = new_pred_delivery
+            best_vehicles      = [vehicle, other_vehicle]
+
+        # undo removal
+        pickup_node.insert_after(orig_pred_pickup)
+        delivery_node.insert_after(orig_pred_delivery)
+        if strategy.stops(best_pickup_node) or budget.expired():
+            break
 
     # apply best relocation
     if best_pickup_node != None:
@@ -213,113 +390,130 @@ def improve_by_couple_relocation( pdata:ProblemData, solution:LLSolution ) -> bo
         best_pickup_node.partner.remove()
         best_pickup_node.insert_after(best_pred_pickup)
         best_pickup_node.partner.insert_after(best_pred_delivery)
+        strategy.routes_changed( solution, best_vehicles )
         # print( f'{initial_value:.2f} -> {best_value:.2f}' )
         return True
     
     # print( f'{initial_value:.2f} -> no further improvement' )
     return False
 
-def improve_by_block_relocation( pdata:ProblemData, solution:LLSolution ) -> bool:
+def improve_by_block_relocation( pdata:ProblemData, solution:LLSolution, strategy:SearchStrategy = None, budget:TimeBudget = None ) -> bool:
     '''
     Finds the best block relocation, that means removing a string (block) from a route and inserting it to an other position in any route.
     '''
+    strategy = strategy or SearchStrategy()
+    budget = budget or TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT )
     initial_value = solution.evaluate()
 
     best_value:float       = initial_value
     best_first_node:LLNode = None
     best_after:LLNode      = None
+    best_vehicles:List[Vehicle] = None
 
-    for vehicle in pdata.vehicles:
-        route:LLRoute = solution.routes[vehicle.no]
-        for node in route.factory_nodes:
-            
-            if node.nodetype != 'p':
-                continue
-            assert node.partner, f"pickup node without a partner node"
-
-            # remove block
-            original_pred = node.pred
-            solution.remove_string( node, node.partner )
-            if not solution.check_vehicle_route_constraints(vehicle):
-                # undo
-                solution.insert_string_after( node, node.partner, after=original_pred )
-                continue
+    for vehicle, node in strategy.pickup_nodes( pdata, solution, 'block_relocation' ):
+        assert node.partner, f"pickup node without a partner node"
+        strategy.dont_look( 'block_relocation', node )
 
-            # find best insertion
-            for other_vehicle in pdata.vehicles:
-                other_route:LLRoute = solution.routes[other_vehicle.no]
-                for after in other_route.nodes_except_end:
-                    solution.insert_string_after( node, node.partner, after=after )
-                    if not solution.check_vehicle_route_constraints(other_vehicle):
-                        # undo insertion
-                        solution.remove_string( node, node.partner )
-                        continue
-                    curr_value = solution.evaluate()
-                    if curr_value + LS_EPSILON < best_value:
-                        best_value = curr_value
-                        best_first_node = node
-                        best_after = after
+        # remove block
+        original_pred = node.pred
+        solution.remove_string( node, node.partner )
+        if not solution.check_vehicle_route_constraints(vehicle):
+            # undo
+            solution.insert_string_after( node, node.partner, after=original_pred )
+            continue
+
+        # find best insertion
+        for other_vehicle in pdata.vehicles:
+            other_route:LLRoute = solution.routes[other_vehicle.no]
+            for after in other_route.nodes_except_end:
+                if not strategy.position_is_near( pdata, other_vehicle, node, node.partner, after ):
+                    continue
+                solution.insert_string_after( node, node.partner, after=after )
+                if not solution.check_vehicle_route_constraints(other_vehicle):
                     # undo insertion
                     solution.remove_string( node, node.partner )
-
-            # undo removal
-            solution.insert_string_after( node, node.partner, after=original_pred )
+                    continue
+                curr_value = solution.evaluate()
+                if curr_value + LS_EPSILON < initial_value:
+                    strategy.look( 'block_relocation', node )
+                if curr_value + LS_EPSILON < best_value:
+                    best_value = curr_value
+                    best_first_node = node
+                    best_after = after
+                    best_vehicles = [vehicle, other_vehicle]
+                # undo insertion
+                solution.remove_string( node, node.partner )
+                if strategy.stops(best_first_node) or budget.expired():
+                    break
+            if strategy.stops(best_first_node) or budget.expired():
+                break
+
+        # undo removal
+        solution.insert_string_after( node, node.partner, after=original_pred )
+        if strategy.stops(best_first_node) or budget.expired():
+            break
 
     # apply best relocation
     if best_first_node != None:
         solution.remove_string( best_first_node, best_first_node.partner )
         solution.insert_string_after( best_first_node, best_first_node.partner, after=best_after )
+        strategy.routes_changed( solution, best_vehicles )
         # print( f'{initial_value:.2f} -> {best_value:.2f}' )
         return True
     
     # print( f'{initial_value:.2f} -> no further improvement' )
     return False
 
-def improve( pdata:ProblemData, solution:LLSolution ) -> None:
-    if time.time() - pdata.creation_time > 9.5 * 60:
-        return False
-    if improve_by_block_relocation( pdata, solution ):
-        return True
-    if time.time() - pdata.creation_time > 9.5 * 60:
-        return False
-    if improve_by_couple_relocation( pdata, solution):
-        return True
-    if time.time() - pdata.creation_time > 9.5 * 60:
-        return False
-    if improve_by_block_exchange( pdata, solution):
-        return True
-    if time.time() - pdata.creation_time > 9.5 * 60:
-        return False
-    if improve_by_couple_exchange( pdata, solution):
-        return True
-    return False
+def improve( pdata:ProblemData, solution:LLSolution, strategy:SearchStrategy = None, budget:TimeBudget = None ) -> bool:
+    '''
+    Applies the first operator (in the order of LS_OPERATORS) improving the solution, within the time budget.
+    Each operator may take its share of the remaining time, interrupted operators apply the best move found so far and
+    resume their scan at the next call.
+    Returns whether the descent goes on: an operator improved the solution or was interrupted before the end of its scan.
+    The descent ends at the deadline of the budget, or if all the operators scanned their neighbourhoods without a move.
+    '''
+    strategy = strategy or SearchStrategy()
+    budget = budget or TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT )
+    phases = [ name for name, operator in LS_OPERATORS ]
+    interrupted = False
+    for name, operator in LS_OPERATORS:
+        if budget.expired():
+            return False
+        initial_value = solution.evaluate()
+        budget.begin( name, phases )
+        improved = operator( pdata, solution, strategy, budget )
+        if budget.expired():
+            interrupted = True
+        else:
+            strategy.scan_completed( name )
+        budget.end( name, initial_value - solution.evaluate() )
+        if improved:
+            return True
+    return interrupted and not budget.expired()
+
+# improvement operators in the order they are tried
+LS_OPERATORS = [ ('block_relocation',  improve_by_block_relocation),
+                 ('couple_relocation', improve_by_couple_relocation),
+                 ('block_exchange',    improve_by_block_exchange),
+                 ('couple_exchange',   improve_by_couple_exchange) ]
 
 
 '''
 Aux functions
 '''
 
-def swap_nodes( n1:LLNode, n2:LLNode) -> None:
-    assert n1.pred and n1.succ, f"could not swap node without succ and/or pred"
-    assert n2.pred and n2.succ, f"could not swap node without succ and/or pred"
-    # nothing to do if n1 and n2 are the same
-    if n1 == n2:
-        return
-    # dealing with the case of neighboring nodes
-    if n1.succ == n2:
-        n1.remove()
-        n1.insert_after(n2)
-        return
-    if n2.succ == n1:
-        n2.remove()
-        n2.insert_after(n1)
-        return
-    # general case
-    n1_pred = n1.pred
-    n1.remove()
-    n1.insert_after(n2)
-    n2.remove()
-    n2.insert_after(n1_pred)
+def start_factory( pdata:ProblemData, vehicle:Vehicle ) -> int:
+    """
+    Returns the factory the route of the vehicle starts from (the current factory or the destination), or None.
+    """
+    factory_id = vehicle.cur_factory_id if vehicle.cur_factory_id else ( vehicle.destination.id if vehicle.destination else None )
+    return pdata.factory_id_to_int[factory_id] if factory_id else None
+
+def node_key( node:LLNode ) -> tuple:
+    """
+    Returns the key of the factory node, which identifies it across the decision points: its type and its items.
+    """
+    return ( node.nodetype, tuple( item.id for item in node.items ) )
 
 def remove_couple( pickup_node:LLNode ) -> None:
     assert pickup_node.nodetype == 'p', f"could not remove couple with incorrect pickup node"
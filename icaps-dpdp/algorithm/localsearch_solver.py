@@ -1,8 +1,45 @@
 from algorithm.problemdata              import ProblemData
-from algorithm.localsearch_structs      import LLSolution
+from algorithm.localsearch_structs      import LLNode, LLSolution
 from algorithm.algorithm_best_insert    import __read_input_json, __output_json
 from algorithm.algorithm_best_insert    import dispatch_orders_to_vehicles, convert_solution
-from algorithm.localsearch              import improve
+from algorithm.algorithm_best_insert    import InProcessDispatcher
+from algorithm.localsearch              import improve, SearchStrategy, LS_EPSILON
+from algorithm.time_budget              import TimeBudget
+from algorithm.alns                     import improve_by_alns
+from src.conf.configs                   import Configs
+from src.common.order                   import OrderItem
+from src.utils.logging_engine           import logger
+from typing                             import List, Dict
+import algorithm.alns
+import functools
+import multiprocessing
+import os
+
+# keep the solver state across the decision points in the in-process and worker calling modes: only the don't look
+# bits of the unchanged routes and the measured yields of the time budget are kept, the problem data, the routes and
+# their evaluations are still rebuilt at every decision point (no delta update of the previous solution)
+WARM_START = False
+# improvement of the initial solution: 'descent' (local search operators until no further improvement) or
+# 'alns' (adaptive large neighbourhood search, then the descent)
+IMPROVEMENT_METHOD = 'descent'
+# number of independent descents (multi-start), the first one is the deterministic descent of the single start
+MULTI_START_NUM:int = 1
+# number of worker processes running the other descents in parallel to the first one, None for the number of CPUs
+MULTI_START_PROCESS_NUM:int = None
+
+# problem data of the multi-start worker processes (inherited by fork)
+__multi_start_pdata:ProblemData = None
+
+
+class SolverState:
+    """
+    State of the solver kept across the decision points (warm start): the search strategy with the don't look bits of
+    the routes, the nearest factories and the random generator, and the time budget with the measured yields.
+    The previous solution itself is not kept, the routes are rebuilt from the input of the decision point.
+    """
+    def __init__( self ) -> None:
+        self.strategy:SearchStrategy = SearchStrategy()
+        self.budget:TimeBudget       = None
 
 
 def scheduling() -> None:
@@ -10,11 +47,125 @@ def scheduling() -> None:
     Dispatches orders.
     """
     pdata = __init_problemdata()
-    solution = __create_initial_solution( pdata )
-    __improve_solution( pdata, solution )
+    solution = __solve( pdata )
     __output_solution( pdata, solution )
 
 
+def create_dispatcher() -> InProcessDispatcher:
+    """
+    Creates the dispatcher of the in-process calling mode.
+    """
+    if WARM_START:
+        return InProcessDispatcher( functools.partial(__solve, state=SolverState()) )
+    return InProcessDispatcher( __solve )
+
+
+def __solve( pdata:ProblemData, state:SolverState = None ) -> LLSolution:
+    """
+    Creates an initial solution and improves it within the time budget, by one or more independent descents.
+    The state of the previous decision point is used and updated, if given.
+    Returns: solution.
+    """
+    strategy = state.strategy if state else SearchStrategy()
+    budget = TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT, state.budget if state else None )
+    multi_start_available = 'fork' in multiprocessing.get_all_start_methods() and not multiprocessing.current_process().daemon
+    if MULTI_START_NUM > 1 and multi_start_available:
+        solution = __solve_multi_start( pdata, strategy, budget )
+    else:
+        if MULTI_START_NUM > 1:
+            # daemonic processes (e.g. the workers of the parallel benchmark) are not allowed to have children
+            logger.warning( "Multi-start is not available in this process, running a single descent" )
+        solution = __descend( pdata, strategy, budget )
+    if state:
+        strategy.remember_routes( pdata, solution )
+        state.budget = budget
+    return solution
+
+
+def __descend( pdata:ProblemData, strategy:SearchStrategy, budget:TimeBudget, seed:int = None ) -> LLSolution:
+    """
+    Creates an initial solution and improves it within the time budget.
+    The orders are inserted in the random order given by the seed, if given.
+    Returns: solution.
+    """
+    # the construction is always completed, the improvement gets the remaining time
+    budget.begin( 'construction' )
+    solution = __create_initial_solution( pdata, seed )
+    budget.end( 'construction', 0 )
+    # only the routes which changed since the previous decision point are searched from scratch
+    strategy.warm_start( pdata, solution )
+    __improve_solution( pdata, solution, budget, strategy, seed )
+    return solution
+
+
+def __solve_multi_start( pdata:ProblemData, strategy:SearchStrategy, budget:TimeBudget ) -> LLSolution:
+    """
+    Runs MULTI_START_NUM independent descents: the first one in this process, the others in worker processes with
+    the insertion orders and the neighborhood orders given by the seeds Configs.RANDOM_SEED + 1, 2, ...
+    Returns: the best solution, the first one of them in case of ties.
+    """
+    global __multi_start_pdata
+    __multi_start_pdata = pdata
+    process_num = min( MULTI_START_NUM - 1, MULTI_START_PROCESS_NUM or os.cpu_count() or 1 )
+    with multiprocessing.get_context('fork').Pool(process_num) as pool:
+        async_results = pool.map_async( __descend_in_worker, range(1, MULTI_START_NUM) )
+        best_solution = __descend( pdata, strategy, budget )
+        encoded_solutions = async_results.get()
+    __multi_start_pdata = None
+
+    # the solutions of the workers are rebuilt with the items of this process
+    id_to_item = { item.id:item for route in best_solution.routes for node in route.factory_nodes for item in node.items }
+    best_value = best_solution.evaluate()
+    for encoded_solution in encoded_solutions:
+        solution = __decode_solution( pdata, encoded_solution, id_to_item )
+        value = solution.evaluate()
+        if value + LS_EPSILON < best_value:
+            best_value    = value
+            best_solution = solution
+    return best_solution
+
+
+def __descend_in_worker( start:int ) -> List[list]:
+    """
+    Runs the descent of the given start in a worker process.
+    Returns: the encoded solution.
+    """
+    pdata = __multi_start_pdata
+    seed = Configs.RANDOM_SEED + start
+    strategy = SearchStrategy( neighborhood_order='random', seed=seed )
+    budget = TimeBudget( pdata.creation_time, Configs.ALGORITHM_TIME_LIMIT )
+    solution = __descend( pdata, strategy, budget, seed )
+    return __encode_solution( solution )
+
+
+def __encode_solution( solution:LLSolution ) -> List[list]:
+    """
+    Encodes the routes of the solution as lists of (node type, factory, item ids, position of the partner node).
+    """
+    encoded_routes = []
+    for route in solution.routes:
+        nodes = list( route.factory_nodes )
+        node_to_position = { node:position for position, node in enumerate(nodes) }
+        encoded_routes.append( [ (node.nodetype, node.factory, [ item.id for item in node.items ], node_to_position.get(node.partner))
+                                 for node in nodes ] )
+    return encoded_routes
+
+
+def __decode_solution( pdata:ProblemData, encoded_routes:List[list], id_to_item:Dict[str, OrderItem] ) -> LLSolution:
+    """
+    Creates the solution of the encoded routes with the given items.
+    """
+    solution = LLSolution( pdata )
+    for route, encoded_route in zip( solution.routes, encoded_routes ):
+        nodes = [ LLNode( nodetype, factory, [ id_to_item[item_id] for item_id in item_ids ] )
+                  for nodetype, factory, item_ids, partner_position in encoded_route ]
+        for node, (nodetype, factory, item_ids, partner_position) in zip( nodes, encoded_route ):
+            if partner_position is not None:
+                node.partner = nodes[partner_position]
+            route.insert_node_back( node )
+    return solution
+
+
 def __init_problemdata() -> ProblemData:
     """
     Creates and initializes problem data.
@@ -24,20 +175,28 @@ def __init_problemdata() -> ProblemData:
     return pdata
 
 
-def __create_initial_solution( pdata:ProblemData ) -> LLSolution:
+def __create_initial_solution( pdata:ProblemData, seed:int = None ) -> LLSolution:
     """
-    Creates initial solution.
+    Creates initial solution, inserting the orders in the random order given by the seed, if given.
     Returns: initial solution.
     """
-    solution = dispatch_orders_to_vehicles( pdata )
+    solution = dispatch_orders_to_vehicles( pdata, seed )
     return solution
 
 
-def __improve_solution( pdata:ProblemData, solution:LLSolution ) -> None:
+def __improve_solution( pdata:ProblemData, solution:LLSolution, budget:TimeBudget, strategy:SearchStrategy,
+                        seed:int = None ) -> None:
     """
-    Improves the given solution.
+    Improves the given solution until no operator improves it or the time budget is over.
+    The random choices of the large neighbourhood search are given by the seed, if given.
     """
-    while improve(pdata, solution):
+    if IMPROVEMENT_METHOD == 'alns':
+        initial_value = solution.evaluate()
+        budget.begin( 'alns', share=algorithm.alns.ALNS_TIME_SHARE ) # read at run time, for the parameter sweep
+        if improve_by_alns( pdata, solution, budget, seed ):
+            strategy.routes_changed( solution, pdata.vehicles )
+        budget.end( 'alns', initial_value - solution.evaluate() )
+    while improve(pdata, solution, strategy, budget):
         continue
 
 
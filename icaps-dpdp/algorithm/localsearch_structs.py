@@ -1,7 +1,8 @@
 from __future__ import annotations
-from typing import Generator, List, Dict
+from typing import Generator, List, Dict, Set
 
-import sys, os
+import sys, os, math, bisect
+from collections import defaultdict
 sys.path.append( os.path.dirname( os.path.dirname( os.path.realpath(__file__) ) ) )
 
 from src.conf.configs import Configs
@@ -9,11 +10,14 @@ from src.common.order import OrderItem
 from src.common.vehicle import Vehicle
 from algorithm.problemdata import ProblemData
 from algorithm.priority_queue import PriorityQueue
+from algorithm.docking_queue import DockingQueue
 
 class LLNode:
     """
     Simple class for nodes.
     """
+    __slots__ = ( 'nodetype', 'factory', 'pred', 'succ', 'items', 'arrival_time', 'departure_time', 'partner', 'route' )
+
     def __init__( self, nodetype:str, factory:int = None, items:List[OrderItem] = None, partner:LLNode = None ):
         assert nodetype in {'begin', 'end', 'p', 'd'}, f'"{nodetype}" is not a valid node type'
         if nodetype in {'begin', 'end'}:
@@ -31,6 +35,7 @@ class LLNode:
         self.arrival_time:int   = None
         self.departure_time:int = None
         self.partner = partner
+        self.route:LLRoute = None           # route the node is linked into, None if it is not in a route
         
     def __str__( self ) -> str:
         if self.nodetype in {'p', 'd'}:
@@ -49,6 +54,9 @@ class LLNode:
         self.succ.pred = self.pred
         self.pred = None
         self.succ = None
+        if self.route is not None:
+            self.route.version += 1
+            self.route = None
 
     def insert_after( self, after:LLNode ) -> None:
         """
@@ -65,6 +73,9 @@ class LLNode:
         self.pred = after
         after.succ.pred = self
         after.succ = self
+        self.route = after.route
+        if self.route is not None:
+            self.route.version += 1
 
     @property
     def is_pickup( self ) -> bool:
@@ -144,9 +155,24 @@ class LLRoute:
     def __init__( self ):
         self.begin = LLNode( "begin" ) # tail
         self.end   = LLNode( "end" )   # head
+        self.version:int = 0           # incremented by every insertion and removal of nodes
 
         self.begin.succ = self.end
         self.end.pred = self.begin
+        self.begin.route = self
+        self.end.route = self
+
+    def clear( self ) -> None:
+        """
+        Unlinks all the inner nodes of the route.
+        """
+        for node in list(self.factory_nodes):
+            node.pred = None
+            node.succ = None
+            node.route = None
+        self.begin.succ = self.end
+        self.end.pred = self.begin
+        self.version += 1
 
     def insert_string_after( self, str_first:LLNode, str_last:LLNode, after:LLNode ) -> None:
         """
@@ -165,6 +191,9 @@ class LLRoute:
         after.succ.pred = str_last
         str_first.pred = after
         after.succ = str_first
+        set_route_of_string( str_first, str_last, after.route )
+        if after.route is not None:
+            after.route.version += 1
 
     def insert_node_after( self, node_to_insert:LLNode, after:LLNode ) -> None:
         """
@@ -208,6 +237,9 @@ class LLRoute:
         assert str_first.pred != None, 'could not remove string from route'
         assert str_last.succ != None, 'could not remove string from route'
 
+        if str_first.route is not None:
+            str_first.route.version += 1
+            set_route_of_string( str_first, str_last, None )
         str_first.pred.succ = str_last.succ
         str_last.succ.pred = str_first.pred
         str_first.pred = None
@@ -306,6 +338,111 @@ class LLRoute:
         return ret_node
 
 
+IN_SERVICE_START = float('-inf') # start of the dock interval of a vehicle, whose service is in progress at the beginning
+
+class LLRouteEvaluation:
+    """
+    Simple class for the contribution of a route to the objective, assuming that the vehicle never waits for a dock.
+    """
+    def __init__( self, route:LLRoute, distance:float, order_id_to_tardiness:Dict[str, int], dock_intervals:List[tuple] ):
+        self.nodes:List[LLNode] = list(route.factory_nodes)      # factory nodes of the route at the time of evaluation
+        self.distance:float     = distance                       # distance traveled
+        self.order_id_to_tardiness:Dict[str, int] = order_id_to_tardiness # tardiness of the orders delivered by the vehicle
+        self.dock_intervals:List[tuple] = dock_intervals         # (factory, start, end) tuples of dock occupation
+        self.route:LLRoute = route                               # route and its version at the last match
+        self.version:int   = route.version
+
+    def matches( self, route:LLRoute ) -> bool:
+        """
+        Returns whether the route still consists of the evaluated nodes or not.
+        The nodes are compared only if the route was modified since the last match, e.g. by a move and its undo.
+        """
+        if self.route is route and self.version == route.version:
+            return True
+        if not route_consists_of( route, self.nodes ):
+            return False
+        self.route, self.version = route, route.version
+        return True
+
+
+class LLRouteSummary:
+    """
+    Simple class for the prefix loads and the LIFO stack heights of a route, used to check the insertion of a couple
+    (a pickup node and its delivery node) in constant time, like in the classic PDPTW insertion feasibility checks.
+    Positions are given by the number of factory nodes before them, position 0 is the begin node.
+    """
+    def __init__( self, vehicle:Vehicle, route:LLRoute, destination_factory:int ):
+        self.nodes:List[LLNode] = list(route.factory_nodes)  # factory nodes of the route at the time of creation
+        self.route:LLRoute = route                            # route and its version at the last match
+        self.version:int   = route.version
+        self.destination_factory:int = destination_factory    # factory of the destination, None if there is none
+        self.capacity:float = vehicle.board_capacity
+
+        # load and LIFO stack after the nodes, index 0 belongs to the begin node
+        weight = sum( [item.demand for item in vehicle.carrying_items.bottom_up()] )
+        stack:List[str] = [ item.id for item in vehicle.carrying_items.bottom_up() ]
+        loads:List[float] = [weight]
+        heights:List[int] = [len(stack)]
+        self.capacity_feasible:bool = True # same as check_capacity_constraint
+        self.LIFO_feasible:bool     = True # same as check_LIFO_constraint
+        for node in self.nodes:
+            if node.is_pickup:
+                weight += sum( [item.demand for item in node.items] )
+                stack.extend( item.id for item in node.items )
+            if node.is_delivery:
+                weight -= sum( [item.demand for item in node.items] )
+                for item in node.items:
+                    if not stack or item.id != stack.pop():
+                        self.LIFO_feasible = False
+            if weight > self.capacity:
+                self.capacity_feasible = False
+            loads.append(weight)
+            heights.append(len(stack))
+        if self.LIFO_feasible:
+            assert not stack, f'LIFO list is not empty at the end of route for vehicle {vehicle.no}'
+        self.max_loads   = SparseTable(loads, max)
+        self.min_heights = SparseTable(heights, min)
+        self.heights:List[int] = heights
+
+    def matches( self, route:LLRoute ) -> bool:
+        """
+        Returns whether the route still consists of the summarized nodes or not.
+        The nodes are compared only if the route was modified since the last match, e.g. by a move and its undo.
+        """
+        if self.route is route and self.version == route.version:
+            return True
+        if not route_consists_of( route, self.nodes ):
+            return False
+        self.route, self.version = route, route.version
+        return True
+
+    def check_couple_insertion( self, pickup_node:LLNode, delivery_node:LLNode, i:int, j:int ) -> bool:
+        """
+        Returns whether the route satisfies the constraints after inserting the pickup node after position i and
+        the delivery node after position j (i <= j, directly after the pickup node if i == j).
+        The delivery items have to be the pickup items in reverse order, which are on board of no vehicle.
+        """
+        assert 0 <= i <= j <= len(self.nodes), f'invalid insertion positions ({i}, {j})'
+        # destination constraint: the first node has to be at the destination
+        if self.destination_factory is not None:
+            first_factory = pickup_node.factory if i == 0 else self.nodes[0].factory
+            if first_factory != self.destination_factory:
+                return False
+        # capacity constraint: loads from position i to position j increase by the demand of the couple
+        if not self.capacity_feasible:
+            return False
+        demand = sum( [item.demand for item in pickup_node.items] )
+        if self.max_loads.query(i, j) + demand > self.capacity:
+            return False
+        # LIFO constraint: nodes between the couple must not touch the items on board at the pickup,
+        # and the stack has to be the same at the delivery
+        if not self.LIFO_feasible:
+            return False
+        if self.heights[j] != self.heights[i] or self.min_heights.query(i, j) < self.heights[i]:
+            return False
+        return True
+
+
 class LLSolution:
     """
     Simple class for solutions: list of routes.
@@ -315,6 +452,17 @@ class LLSolution:
         self.__pdata:ProblemData  = pdata
         self.routes:List[LLRoute] = [ LLRoute() for vehicle in self.__pdata.vehicles] # list of routes
 
+        # cache of the incremental evaluation
+        self.__route_evaluations:List[LLRouteEvaluation]          = [ None for vehicle in self.__pdata.vehicles ]
+        self.__previous_route_evaluations:List[LLRouteEvaluation] = [ None for vehicle in self.__pdata.vehicles ]
+        self.__order_id_to_vehicle_tardiness:Dict[str, Dict[int, int]] = {}
+        self.__total_tardiness:int = 0
+        self.__factory_to_vehicle_intervals:Dict[int, Dict[int, list]] = {}
+        self.__congested_factories:Set[int] = set()
+
+        # cache of the route summaries for the insertion checks
+        self.__route_summaries:List[LLRouteSummary] = [ None for vehicle in self.__pdata.vehicles ]
+
     def remove_string( self, str_first:LLNode, str_last:LLNode ) -> None:
         """
         Removes the given string from its current position.
@@ -325,6 +473,9 @@ class LLSolution:
         assert str_first.pred != None, 'could not remove string: first node has no predecessor'
         assert str_last.succ != None, 'could not remove string: last node has no successor'
 
+        if str_first.route is not None:
+            str_first.route.version += 1
+            set_route_of_string( str_first, str_last, None )
         str_first.pred.succ = str_last.succ
         str_last.succ.pred = str_first.pred
         str_first.pred = None
@@ -346,6 +497,9 @@ class LLSolution:
         after.succ.pred = str_last
         str_first.pred = after
         after.succ = str_first
+        set_route_of_string( str_first, str_last, after.route )
+        if after.route is not None:
+            after.route.version += 1
 
     def calculate_vehicle_arrival_departure( self, vehicle:Vehicle):
         route:LLRoute = self.routes[vehicle.no]
@@ -376,7 +530,7 @@ class LLSolution:
 
     def check_capacity_constraint( self, vehicle:Vehicle) -> bool:
         route:LLRoute = self.routes[vehicle.no]
-        weight = sum( [item.demand for item in vehicle.carrying_items.items] )
+        weight = sum( [item.demand for item in vehicle.carrying_items.bottom_up()] )
         for node in route.factory_nodes:
             if node.is_pickup:
                 weight += sum( [item.demand for item in node.items] )
@@ -388,7 +542,7 @@ class LLSolution:
     
     def check_LIFO_constraint( self, vehicle:Vehicle) -> bool:
         route:LLRoute = self.routes[vehicle.no]
-        stack:List[OrderItem] = vehicle.carrying_items.items[:]
+        stack:List[OrderItem] = list( vehicle.carrying_items.bottom_up() )
         for node in route.factory_nodes:
             if node.is_pickup:
                 stack.extend( node.items )
@@ -408,6 +562,18 @@ class LLSolution:
             return 0
         return 1
     
+    def route_summary( self, vehicle:Vehicle ) -> LLRouteSummary:
+        """
+        Returns the summary of the route of the vehicle for the insertion checks.
+        The summary is created again, if the route was modified since its creation.
+        """
+        route_summary = self.__route_summaries[vehicle.no]
+        if not route_summary or not route_summary.matches(self.routes[vehicle.no]):
+            destination_factory = self.__pdata.factory_id_to_int[vehicle.destination.id] if vehicle.destination else None
+            route_summary = LLRouteSummary(vehicle, self.routes[vehicle.no], destination_factory)
+            self.__route_summaries[vehicle.no] = route_summary
+        return route_summary
+
     def check_all_route_constraints( self ) -> bool:
         for vehicle in self.__pdata.vehicles:
             if not self.check_vehicle_route_constraints( vehicle ):
@@ -456,12 +622,12 @@ class LLSolution:
         total_tardiness = sum( order_id_to_tardiness.values() )
         return total_tardiness
     
-    def decorator_eval2(func):
+    def decorator_eval_incremental(func):
         def wrapper(self:LLSolution):
-            return self.eval2()
+            return self.eval_incremental()
         return wrapper
     
-    @decorator_eval2
+    @decorator_eval_incremental
     def evaluate( self ) -> float:
         total_distance = self.total_distance()
         vehicle_num = len(self.__pdata.vehicles)
@@ -479,16 +645,14 @@ class LLSolution:
         ARR = 'arrival'
         DEP = 'departure'
         eventq = PriorityQueue()
-        factory_id_to_dockingq = { f.id:[] for f in self.__pdata.factories }
+        factory_id_to_dockingq:Dict[str, DockingQueue] = defaultdict(DockingQueue) # created on first use
 
         for vehicle in self.__pdata.vehicles:
             if vehicle.cur_factory_id: # vehicle is at a factory
                 dep_time = vehicle.leave_time_at_current_factory
                 factory_id = vehicle.cur_factory_id
                 if dep_time > vehicle.gps_update_time: # vehicle's service is in progress (waiting, docking, loading, unloading) -> add vehicle to the docking queue
-                    dockingq = factory_id_to_dockingq[factory_id]
-                    dockingq.append((dep_time, vehicle))
-                    dockingq.sort(key=lambda tup: tup[0])
+                    factory_id_to_dockingq[factory_id].push(dep_time, vehicle)
                 eventq.push(dep_time, (DEP, factory_id, vehicle, self.routes[vehicle.no].begin)) # creating departure event
             else: # vehicle is traveling
                 arr_time = vehicle.destination.arrive_time
@@ -506,11 +670,7 @@ class LLSolution:
             node:LLNode = event.item[3]
             
             if event_type == DEP: # departure event
-                dockingq = factory_id_to_dockingq[factory_id]
-                for tup in dockingq: # find vehicle in docking queue and remove
-                    if tup[1] == vehicle:
-                        dockingq.remove(tup)
-                        break
+                factory_id_to_dockingq[factory_id].remove(vehicle) # remove vehicle from the docking queue
                 if node.succ.is_factory: # vehicle has a next factory to visit
                     fact_from:int = node.factory if node.nodetype != 'begin' else self.__pdata.factory_id_to_int[vehicle.cur_factory_id]
                     fact_to:int = node.succ.factory
@@ -547,11 +707,7 @@ class LLSolution:
                 factory = self.__pdata.factories[node.factory]
                 dock_num = factory.dock_num
                 dockingq = factory_id_to_dockingq[factory_id]
-                queue_size = len(dockingq)
-                if dock_num > queue_size:
-                    waiting_time = 0
-                if dock_num <= queue_size:
-                    waiting_time = dockingq[queue_size-dock_num][0] - event_time
+                waiting_time = dockingq.waiting_time(event_time, dock_num) # until the (queue_size-dock_num+1)-th earliest release
                 docking_time = Configs.DOCK_APPROACHING_TIME
                 overall_loading_unloading_time = 0
                 while True: # loop to handle case of multiple nodes at the same lociation
@@ -562,8 +718,7 @@ class LLSolution:
                         break # at this point *node* is the last node of this location
                 dep_time = event_time + waiting_time + docking_time + overall_loading_unloading_time
                 # insert vehicle into docking queue
-                dockingq.append((dep_time, vehicle))
-                dockingq.sort(key=lambda tup: tup[0])
+                dockingq.push(dep_time, vehicle)
                 # create departure event
                 eventq.push(dep_time, (DEP, factory_id, vehicle, node)) # creating departure event
 
@@ -572,4 +727,304 @@ class LLSolution:
         tard_weight = Configs.LAMDA / 3600
         total_tard = sum(order_id_to_tardiness.values())
         score = total_dist / vehicle_num + tard_weight * total_tard
-        return score
\ No newline at end of file
+        return score
+
+    def eval_incremental( self ) -> float:
+        """
+        Same objective as eval2, but only the routes modified since the previous evaluation are evaluated again.
+        Routes are evaluated separately assuming that vehicles never wait for a dock, which is exact as long as
+        the number of other vehicles occupying a dock at the arrival of a vehicle is less than the number of docks.
+        Otherwise the vehicles of the congested factories are simulated together the same way as in eval2.
+        """
+        total_dist, total_tard, _ = self.evaluate_terms()
+        vehicle_num = len(self.__pdata.vehicles)
+        tard_weight = Configs.LAMDA / 3600
+        score = total_dist / vehicle_num + tard_weight * total_tard
+        return score
+
+    def evaluate_terms( self ) -> tuple[float, int, bool]:
+        """
+        Evaluates the modified routes the same way as eval_incremental.
+        Returns: total distance, total tardiness and whether vehicles may wait for docks.
+        """
+        for vehicle in self.__pdata.vehicles:
+            route_evaluation = self.__route_evaluations[vehicle.no]
+            if route_evaluation and route_evaluation.matches(self.routes[vehicle.no]):
+                continue
+            # restore the previous evaluation in case of an undone move, otherwise evaluate the route
+            previous_route_evaluation = self.__previous_route_evaluations[vehicle.no]
+            if not previous_route_evaluation or not previous_route_evaluation.matches(self.routes[vehicle.no]):
+                previous_route_evaluation = self.__evaluate_route(vehicle)
+            self.__previous_route_evaluations[vehicle.no] = route_evaluation
+            self.__set_route_evaluation(vehicle, previous_route_evaluation)
+
+        total_dist = math.fsum( route_evaluation.distance for route_evaluation in self.__route_evaluations )
+        if not self.__congested_factories:
+            return total_dist, self.__total_tardiness, False
+        return total_dist, self.__total_tardiness_with_waiting(), True
+
+    def __evaluate_route( self, vehicle:Vehicle ) -> LLRouteEvaluation:
+        """
+        Evaluates the route of the vehicle the same way as eval2 does without waiting for docks.
+        """
+        route:LLRoute = self.routes[vehicle.no]
+        distance = 0
+        order_id_to_tardiness:Dict[str, int] = {}
+        dock_intervals:List[tuple] = []
+
+        if vehicle.cur_factory_id: # vehicle is at a factory
+            cur_factory:int = self.__pdata.factory_id_to_int[vehicle.cur_factory_id]
+            dep_time = vehicle.leave_time_at_current_factory
+            if dep_time > vehicle.gps_update_time: # vehicle's service is in progress
+                dock_intervals.append((cur_factory, IN_SERVICE_START, dep_time))
+            if not route.empty:
+                arr_time = dep_time + self.__pdata.time_mtx[cur_factory][route.first.factory]
+                distance += self.__pdata.distance(cur_factory, route.first.factory)
+        elif not route.empty: # vehicle is traveling
+            arr_time = vehicle.destination.arrive_time
+
+        node = route.first
+        while node:
+            if node != route.first:
+                distance += self.__pdata.distance(node.pred.factory, node.factory)
+            factory:int = node.factory
+            overall_loading_unloading_time = 0
+            while True: # loop to handle case of multiple nodes at the same location
+                if node.is_delivery:
+                    for item_to_deliver in node.items:
+                        order_id = item_to_deliver.order_id
+                        item_tardiness = max(0, arr_time - item_to_deliver.committed_completion_time)
+                        order_id_to_tardiness[order_id] = max( item_tardiness, order_id_to_tardiness.get(order_id, 0) )
+                overall_loading_unloading_time += node.loading_time if node.is_pickup else node.unloading_time
+                if node.succ.factory == factory:
+                    node = node.succ
+                else:
+                    break # at this point *node* is the last node of this location
+            dep_time = arr_time + Configs.DOCK_APPROACHING_TIME + overall_loading_unloading_time
+            dock_intervals.append((factory, arr_time, dep_time))
+            node = node.succ if node.succ.is_factory else None
+            if node:
+                arr_time = dep_time + self.__pdata.time_mtx[factory][node.factory]
+
+        return LLRouteEvaluation(route, distance, order_id_to_tardiness, dock_intervals)
+
+    def __set_route_evaluation( self, vehicle:Vehicle, route_evaluation:LLRouteEvaluation ) -> None:
+        """
+        Replaces the evaluation of the route of the vehicle and updates the tardiness and the dock occupation.
+        """
+        touched_factories:Set[int] = set()
+        old_route_evaluation = self.__route_evaluations[vehicle.no]
+        if old_route_evaluation:
+            for order_id in old_route_evaluation.order_id_to_tardiness:
+                vehicle_to_tardiness = self.__order_id_to_vehicle_tardiness[order_id]
+                self.__total_tardiness -= max( vehicle_to_tardiness.values() )
+                del vehicle_to_tardiness[vehicle.no]
+                if vehicle_to_tardiness:
+                    self.__total_tardiness += max( vehicle_to_tardiness.values() )
+                else:
+                    del self.__order_id_to_vehicle_tardiness[order_id]
+            for factory, start, end in old_route_evaluation.dock_intervals:
+                self.__factory_to_vehicle_intervals[factory].pop(vehicle.no, None)
+                touched_factories.add(factory)
+
+        self.__route_evaluations[vehicle.no] = route_evaluation
+        for order_id, tardiness in route_evaluation.order_id_to_tardiness.items():
+            vehicle_to_tardiness = self.__order_id_to_vehicle_tardiness.setdefault(order_id, {})
+            if vehicle_to_tardiness:
+                self.__total_tardiness -= max( vehicle_to_tardiness.values() )
+            vehicle_to_tardiness[vehicle.no] = tardiness
+            self.__total_tardiness += max( vehicle_to_tardiness.values() )
+        for factory, start, end in route_evaluation.dock_intervals:
+            vehicle_to_intervals = self.__factory_to_vehicle_intervals.setdefault(factory, {})
+            vehicle_to_intervals.setdefault(vehicle.no, []).append((start, end))
+            touched_factories.add(factory)
+
+        for factory in touched_factories:
+            intervals = [ interval for intervals in self.__factory_to_vehicle_intervals[factory].values() for interval in intervals ]
+            if is_congested( intervals, self.__pdata.factories[factory].dock_num ):
+                self.__congested_factories.add(factory)
+            else:
+                self.__congested_factories.discard(factory)
+
+    def __total_tardiness_with_waiting( self ) -> int:
+        """
+        Total tardiness in case of congested factories. Vehicles of congested factories are simulated together,
+        until the rest of the vehicles do not share a congested factory with them.
+        """
+        vehicle_no_to_intervals:Dict[int, List[tuple]] = { vehicle.no:self.__route_evaluations[vehicle.no].dock_intervals for vehicle in self.__pdata.vehicles }
+        vehicle_no_to_tardiness:Dict[int, Dict[str, int]] = { vehicle.no:self.__route_evaluations[vehicle.no].order_id_to_tardiness for vehicle in self.__pdata.vehicles }
+        simulated_vehicle_nos:Set[int] = set()
+        vehicle_nos_to_simulate:Set[int] = { vehicle_no for factory in self.__congested_factories for vehicle_no in self.__factory_to_vehicle_intervals[factory] }
+        while vehicle_nos_to_simulate:
+            simulated_vehicle_nos.update(vehicle_nos_to_simulate)
+            simulated_vehicles = [ vehicle for vehicle in self.__pdata.vehicles if vehicle.no in simulated_vehicle_nos ]
+            simulated_intervals, simulated_tardiness = self.__simulate_vehicles(simulated_vehicles)
+            vehicle_no_to_intervals.update(simulated_intervals)
+            vehicle_no_to_tardiness.update(simulated_tardiness)
+            # vehicles not simulated yet, but sharing a congested factory with simulated ones
+            factory_to_intervals:Dict[int, List[tuple]] = {}
+            factory_to_vehicle_nos:Dict[int, Set[int]] = {}
+            for vehicle_no, intervals in vehicle_no_to_intervals.items():
+                for factory, start, end in intervals:
+                    factory_to_intervals.setdefault(factory, []).append((start, end))
+                    factory_to_vehicle_nos.setdefault(factory, set()).add(vehicle_no)
+            vehicle_nos_to_simulate = set()
+            for factory, intervals in factory_to_intervals.items():
+                free_flow_vehicle_nos = factory_to_vehicle_nos[factory] - simulated_vehicle_nos
+                if free_flow_vehicle_nos and is_congested( intervals, self.__pdata.factories[factory].dock_num ):
+                    vehicle_nos_to_simulate.update(free_flow_vehicle_nos)
+
+        order_id_to_tardiness:Dict[str, int] = {}
+        for tardiness_dict in vehicle_no_to_tardiness.values():
+            for order_id, tardiness in tardiness_dict.items():
+                order_id_to_tardiness[order_id] = max( tardiness, order_id_to_tardiness.get(order_id, 0) )
+        return sum(order_id_to_tardiness.values())
+
+    def __simulate_vehicles( self, vehicles:List[Vehicle] ) -> tuple[Dict[int, List[tuple]], Dict[int, Dict[str, int]]]:
+        """
+        Simulates the routes of the given vehicles the same way as eval2 does.
+        Returns: dock intervals and tardiness of the orders by vehicle number.
+        """
+        vehicle_no_to_intervals:Dict[int, List[tuple]] = { vehicle.no:[] for vehicle in vehicles }
+        vehicle_no_to_tardiness:Dict[int, Dict[str, int]] = { vehicle.no:{} for vehicle in vehicles }
+        ARR = 'arrival'
+        DEP = 'departure'
+        eventq = PriorityQueue()
+        factory_id_to_dockingq:Dict[str, DockingQueue] = defaultdict(DockingQueue) # created on first use
+
+        for vehicle in vehicles:
+            if vehicle.cur_factory_id: # vehicle is at a factory
+                dep_time = vehicle.leave_time_at_current_factory
+                factory_id = vehicle.cur_factory_id
+                if dep_time > vehicle.gps_update_time: # vehicle's service is in progress
+                    factory_id_to_dockingq[factory_id].push(dep_time, vehicle)
+                    vehicle_no_to_intervals[vehicle.no].append((self.__pdata.factory_id_to_int[factory_id], IN_SERVICE_START, dep_time))
+                eventq.push(dep_time, (DEP, factory_id, vehicle, self.routes[vehicle.no].begin))
+            elif not self.routes[vehicle.no].empty: # vehicle is traveling
+                arr_time = vehicle.destination.arrive_time
+                factory_id = vehicle.destination.id
+                eventq.push(arr_time, (ARR, factory_id, vehicle, self.routes[vehicle.no].first))
+
+        while not eventq.is_empty():
+
+            event = eventq.pop()
+            event_time = event.priority
+            event_type, factory_id, vehicle, node = event.item
+
+            if event_type == DEP: # departure event
+                factory_id_to_dockingq[factory_id].remove(vehicle) # remove vehicle from the docking queue
+                if node.succ.is_factory: # vehicle has a next factory to visit
+                    fact_from:int = node.factory if node.nodetype != 'begin' else self.__pdata.factory_id_to_int[vehicle.cur_factory_id]
+                    fact_to:int = node.succ.factory
+                    arr_time = event_time + self.__pdata.time_mtx[fact_from][fact_to]
+                    eventq.push(arr_time, (ARR, self.__pdata.factories[fact_to].id, vehicle, node.succ))
+
+            if event_type == ARR: # arrival event
+                order_id_to_tardiness = vehicle_no_to_tardiness[vehicle.no]
+                factory = self.__pdata.factories[node.factory]
+                dockingq = factory_id_to_dockingq[factory_id]
+                waiting_time = dockingq.waiting_time(event_time, factory.dock_num)
+                overall_loading_unloading_time = 0
+                while True: # loop to handle case of multiple nodes at the same location
+                    if node.is_delivery:
+                        for item_to_deliver in node.items:
+                            order_id = item_to_deliver.order_id
+                            item_tardiness = max(0, event_time - item_to_deliver.committed_completion_time)
+                            order_id_to_tardiness[order_id] = max( item_tardiness, order_id_to_tardiness.get(order_id, 0) )
+                    overall_loading_unloading_time += node.loading_time if node.is_pickup else node.unloading_time
+                    if node.succ.factory == node.factory:
+                        node = node.succ
+                    else:
+                        break # at this point *node* is the last node of this location
+                dep_time = event_time + waiting_time + Configs.DOCK_APPROACHING_TIME + overall_loading_unloading_time
+                dockingq.push(dep_time, vehicle)
+                vehicle_no_to_intervals[vehicle.no].append((factory.no, event_time, dep_time))
+                eventq.push(dep_time, (DEP, factory_id, vehicle, node))
+
+        return vehicle_no_to_intervals, vehicle_no_to_tardiness
+
+
+'''
+Aux functions
+'''
+
+def swap_nodes( n1:LLNode, n2:LLNode) -> None:
+    assert n1.pred and n1.succ, f"could not swap node without succ and/or pred"
+    assert n2.pred and n2.succ, f"could not swap node without succ and/or pred"
+    # nothing to do if n1 and n2 are the same
+    if n1 == n2:
+        return
+    # dealing with the case of neighboring nodes
+    if n1.succ == n2:
+        n1.remove()
+        n1.insert_after(n2)
+        return
+    if n2.succ == n1:
+        n2.remove()
+        n2.insert_after(n1)
+        return
+    # general case
+    n1_pred = n1.pred
+    n1.remove()
+    n1.insert_after(n2)
+    n2.remove()
+    n2.insert_after(n1_pred)
+
+def set_route_of_string( str_first:LLNode, str_last:LLNode, route:LLRoute ) -> None:
+    """
+    Sets the route of the nodes of the string.
+    """
+    node = str_first
+    while node is not str_last:
+        node.route = route
+        node = node.succ
+    str_last.route = route
+
+def route_consists_of( route:LLRoute, nodes:List[LLNode] ) -> bool:
+    """
+    Returns whether the factory nodes of the route are the given nodes.
+    """
+    node = route.begin.succ
+    for other_node in nodes:
+        if node is not other_node:
+            return False
+        node = node.succ
+    return node is route.end
+
+def is_congested( intervals:List[tuple], dock_num:int ) -> bool:
+    """
+    Returns whether a vehicle may wait for a dock, that means at the arrival of a vehicle the number of other
+    (start, end) intervals containing the arrival time (end points included) is at least the number of docks.
+    """
+    if len(intervals) <= dock_num:
+        return False
+    start_times = sorted( interval[0] for interval in intervals )
+    end_times = sorted( interval[1] for interval in intervals )
+    for start_time, _ in intervals:
+        if start_time == IN_SERVICE_START: # not an arrival
+            continue
+        occupied_num = bisect.bisect_right(start_times, start_time) - bisect.bisect_left(end_times, start_time)
+        if occupied_num - 1 >= dock_num: # excluding the interval itself
+            return True
+    return False
+
+class SparseTable:
+    """
+    Answers range queries of an idempotent function (e.g. min, max) over a fixed list in constant time.
+    """
+    def __init__( self, values:list, func ):
+        self.func = func
+        self.levels:List[list] = [ list(values) ]
+        width = 1
+        while 2 * width <= len(values):
+            prev = self.levels[-1]
+            self.levels.append( [ func(prev[k], prev[k+width]) for k in range(len(prev) - width) ] )
+            width *= 2
+
+    def query( self, first:int, last:int ):
+        """
+        Returns the function of the values from index *first* to index *last* (both included).
+        """
+        level = (last - first + 1).bit_length() - 1
+        values = self.levels[level]
+        return self.func( values[first], values[last - (1 << level) + 1] )
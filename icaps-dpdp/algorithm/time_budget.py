@@ -0,0 +1,98 @@
+from typing import Dict, List
+import time
+
+MIN_PHASE_SHARE = 0.1 # minimal share of the remaining time of a phase, so that no phase starves
+
+class TimeBudget:
+    """
+    Anytime time budget of a solver run: the solver returns before the deadline, and the phases competing for the
+    remaining time (e.g. the improvement operators) get shares of it in proportion to their measured yield.
+    """
+    def __init__( self, start_time:float, seconds:float, previous:'TimeBudget' = None ) -> None:
+        """
+        Parameters:
+            - previous: budget of the previous solver run, whose measured yields are kept (warm start)
+        """
+        self.start_time:float = start_time
+        self.deadline:float   = start_time + seconds
+        self.__phase_deadline:float = None           # deadline of the running phase
+        self.__phase_start_time:float = None         # start of the running phase
+        self.__phase_to_seconds:Dict[str, float] = {} # time spent in the phases
+        self.__phase_to_gain:Dict[str, float]    = {} # decrease of the score in the phases
+        if previous is not None:
+            self.__phase_to_seconds.update( previous.__phase_to_seconds )
+            self.__phase_to_gain.update( previous.__phase_to_gain )
+
+    def remaining( self ) -> float:
+        """
+        Returns the remaining time until the deadline.
+        """
+        return self.deadline - time.time()
+
+    def expired( self ) -> bool:
+        """
+        Returns whether the deadline or the deadline of the running phase is over.
+        Checked inside the loops of the phases, which stop and keep the best solution found so far.
+        """
+        now = time.time()
+        return now > self.deadline or ( self.__phase_deadline is not None and now > self.__phase_deadline )
+
+    def begin( self, phase:str, phases:List[str] = None, share:float = None ) -> None:
+        """
+        Starts measuring the phase. If the competing phases are given, the phase may take its share of the remaining time.
+        If the share is given, the phase may take this fixed share of the remaining time instead.
+        """
+        self.__phase_start_time = time.time()
+        self.__phase_deadline = None
+        if share is None and phases:
+            share = self.share(phase, phases)
+        if share is not None:
+            self.__phase_deadline = self.__phase_start_time + max( self.remaining(), 0 ) * share
+
+    def end( self, phase:str, gain:float ) -> None:
+        """
+        Stops measuring the phase, which decreased the score by the given gain.
+        """
+        self.__phase_to_seconds[phase] = self.__phase_to_seconds.get(phase, 0) + time.time() - self.__phase_start_time
+        self.__phase_to_gain[phase]    = self.__phase_to_gain.get(phase, 0) + max( gain, 0 )
+        self.__phase_deadline   = None
+        self.__phase_start_time = None
+
+    def share( self, phase:str, phases:List[str] ) -> float:
+        """
+        Returns the share of the remaining time of the phase among the competing phases: in proportion to their yield
+        (gain per second), phases not measured yet get the best yield, but at least MIN_PHASE_SHARE.
+        """
+        phase_to_yield = { p:self.__phase_to_gain[p] / self.__phase_to_seconds[p]
+                           for p in phases if self.__phase_to_seconds.get(p, 0) > 0 }
+        best_yield = max( phase_to_yield.values(), default=0 )
+        yields = [ phase_to_yield.get(p, best_yield) for p in phases ]
+        if sum(yields) <= 0:
+            return 1 / len(phases)
+        return max( yields[phases.index(phase)] / sum(yields), MIN_PHASE_SHARE )
+
+    def seconds( self, phase:str ) -> float:
+        """
+        Returns the time spent in the phase.
+        """
+        return self.__phase_to_seconds.get(phase, 0)
+
+    def gain( self, phase:str ) -> float:
+        """
+        Returns the decrease of the score in the phase.
+        """
+        return self.__phase_to_gain.get(phase, 0)
+
+
+# test
+if __name__ == "__main__":
+    budget = TimeBudget( time.time(), 10 )
+    budget.begin( 'construction' )
+    budget.end( 'construction', 0 )
+    budget.begin( 'relocation', ['relocation', 'exchange'] )
+    time.sleep(0.01)
+    budget.end( 'relocation', 1 )
+    budget.begin( 'exchange', ['relocation', 'exchange'] )
+    time.sleep(0.01)
+    budget.end( 'exchange', 0 )
+    print( round(budget.share('relocation', ['relocation', 'exchange']), 2), budget.share('exchange', ['relocation', 'exchange']), budget.expired() )
@@ -0,0 +1,99 @@
+"""
+Benchmark of the slotted OrderItem, Node, LLNode and Vehicle classes against dict-backed copies of the same classes
+(the representation before __slots__ was introduced), on the order items of the largest instance.
+
+Usage: python benchmark/benchmark_compact_objects.py [instance number]
+"""
+import os
+import pathlib
+import sys
+import time
+import tracemalloc
+import types
+
+# change current working directory for convenience
+os.chdir(pathlib.Path(__file__).parent)
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from src.common.node import Node
+from src.common.order import OrderItem
+from src.common.vehicle import Vehicle
+from src.conf.configs import Configs
+from src.utils.input_utils import get_order_info, get_item_list
+from algorithm.localsearch_structs import LLNode
+
+REPEAT_NUM = 20
+
+
+def dict_backed(cls):
+    """Copy of the class without __slots__, whose instances keep their attributes in a __dict__"""
+    namespace = {key: value for key, value in vars(cls).items()
+                 if key not in ("__slots__", "__dict__", "__weakref__")
+                 and not isinstance(value, types.MemberDescriptorType)}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+def largest_instance():
+    """number of the instance with the most orders"""
+    def order_num(instance):
+        folder = f"instance_{instance}"
+        order_file = next(file for file in os.listdir(folder) if not file.startswith("vehicle_info"))
+        with open(os.path.join(folder, order_file)) as f:
+            return sum(1 for _ in f)
+    return max(Configs.all_test_instances, key=order_num)
+
+
+def order_items(instance):
+    folder = f"instance_{instance}"
+    order_file = next(file for file in os.listdir(folder) if not file.startswith("vehicle_info"))
+    id_to_order = get_order_info(os.path.join(folder, order_file), 0)
+    return [item for order in id_to_order.values() for item in get_item_list(order)]
+
+
+def create_objects(item_class, node_class, llnode_class, vehicle_class, items):
+    """the objects the simulator and the algorithm create for the items: items, nodes, linked list nodes and vehicles"""
+    new_items = [item_class(item.id, item.type, item.order_id, item.demand, item.pickup_factory_id,
+                            item.delivery_factory_id, item.creation_time, item.committed_completion_time,
+                            item.load_time, item.unload_time) for item in items]
+    nodes = [node_class(item.pickup_factory_id, 0, 0, [item], []) for item in new_items]
+    llnodes = [llnode_class('p', index % 100, [item]) for index, item in enumerate(new_items)]
+    vehicles = [vehicle_class(f"V_{index}", 15, "", 24) for index in range(len(new_items) // 20)]
+    return new_items, nodes, llnodes, vehicles
+
+
+def measure(name, item_class, node_class, llnode_class, vehicle_class, items):
+    tracemalloc.start()
+    objects = create_objects(item_class, node_class, llnode_class, vehicle_class, items)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    for _ in range(REPEAT_NUM):
+        create_objects(item_class, node_class, llnode_class, vehicle_class, items)
+    creation_time = (time.perf_counter() - start_time) / REPEAT_NUM
+
+    # attribute access of the hot loops: demands and service times of the items, links of the linked list nodes
+    new_items, nodes, llnodes, vehicles = objects
+    start_time = time.perf_counter()
+    for _ in range(REPEAT_NUM):
+        total = 0
+        for item in new_items:
+            total += item.demand + item.load_time + item.unload_time + item.committed_completion_time
+        for node in nodes:
+            total += node.service_time
+        for llnode in llnodes:
+            llnode.arrival_time = llnode.factory
+            total += llnode.arrival_time + (llnode.partner is None)
+    access_time = (time.perf_counter() - start_time) / REPEAT_NUM
+
+    print(f"{name:12s} objects: {sum(len(objects_of_class) for objects_of_class in objects):7d}, "
+          f"memory: {memory / 2 ** 20:7.2f} MB, creation: {creation_time:6.3f} s, attribute access: {access_time:6.3f} s")
+
+
+if __name__ == "__main__":
+    instance = int(sys.argv[1]) if len(sys.argv) > 1 else largest_instance()
+    items = order_items(instance)
+    print(f"instance_{instance}: {len(items)} order items")
+
+    measure("__dict__", dict_backed(OrderItem), dict_backed(Node), dict_backed(LLNode), dict_backed(Vehicle), items)
+    measure("__slots__", OrderItem, Node, LLNode, Vehicle, items)
@@ -0,0 +1,109 @@
+"""
+Benchmark of the columnar History and the vectorized scoring of the Evaluator against the former format (lists of dicts
+per vehicle and per item, as returned by History.get_vehicle_position_history and get_order_item_status_history) and the
+former scoring loops, on a synthetic history of the size of the largest instance.
+
+Usage: python benchmark/benchmark_history.py [instance number]
+"""
+import os
+import pathlib
+import random
+import sys
+import time
+import tracemalloc
+
+# change current working directory for convenience
+os.chdir(pathlib.Path(__file__).parent)
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from src.common.route import Map
+from src.conf.configs import Configs
+from src.simulator.history import History
+from src.utils.evaluator import Evaluator
+from src.utils.input_utils import get_route_map
+from src.utils.logging_engine import logger
+from benchmark_compact_objects import largest_instance, order_items
+
+VEHICLE_NUM = 100
+REPEAT_NUM = 5
+
+
+def create_history(items, factory_ids):
+    """one vehicle visit per pickup and per delivery, and the status changes of the items"""
+    rng = random.Random(Configs.RANDOM_SEED)
+    history = History()
+    for index in range(VEHICLE_NUM):
+        history.add_vehicle_position_history(f"V_{index}", 0, rng.choice(factory_ids))
+    for item in items:
+        history.add_order_item_status_history(item.id, Configs.ORDER_STATUS_TO_CODE.get("GENERATED"),
+                                              item.creation_time, item.committed_completion_time, item.order_id)
+    for item in items:
+        vehicle_id = f"V_{rng.randrange(VEHICLE_NUM)}"
+        pickup_time = item.creation_time + rng.randrange(3600)
+        delivery_time = pickup_time + rng.randrange(3 * 3600)
+        history.add_vehicle_position_history(vehicle_id, pickup_time, item.pickup_factory_id)
+        history.add_order_item_status_history(item.id, Configs.ORDER_STATUS_TO_CODE.get("ONGOING"), pickup_time,
+                                              item.committed_completion_time, item.order_id)
+        history.add_vehicle_position_history(vehicle_id, delivery_time, item.delivery_factory_id)
+        history.add_order_item_status_history(item.id, Configs.ORDER_STATUS_TO_CODE.get("COMPLETED"), delivery_time,
+                                              item.committed_completion_time, item.order_id)
+    return history
+
+
+def former_total_score(vehicle_id_to_node_list, item_id_to_status_list, route_map):
+    """the scoring loops of the former format"""
+    total_distance = 0
+    for nodes in vehicle_id_to_node_list.values():
+        factory_ids = [node["factory_id"] for node in nodes]
+        total_distance += sum(route_map.calculate_distance_between_factories(factory_ids[i], factory_ids[i + 1])
+                              for i in range(len(factory_ids) - 1))
+
+    order_id_to_complete_time = {}
+    order_id_to_committed_completion_time = {}
+    for status_info_list in item_id_to_status_list.values():
+        completed = [info for info in status_info_list
+                     if info["state"] == Configs.ORDER_STATUS_TO_CODE.get("COMPLETED")]
+        completed.sort(key=lambda x: x["update_time"])
+        order_id = completed[0]["order_id"]
+        order_id_to_complete_time[order_id] = max(order_id_to_complete_time.get(order_id, -1),
+                                                  completed[0]["update_time"])
+        order_id_to_committed_completion_time.setdefault(order_id, completed[0]["committed_completion_time"])
+    total_over_time = sum(max(complete_time - order_id_to_committed_completion_time[order_id], 0)
+                          for order_id, complete_time in order_id_to_complete_time.items())
+    return total_distance / VEHICLE_NUM + total_over_time * Configs.LAMDA / 3600
+
+
+def measure_memory(function):
+    tracemalloc.start()
+    result = function()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory
+
+
+def measure_time(function):
+    start_time = time.perf_counter()
+    for _ in range(REPEAT_NUM):
+        result = function()
+    return result, (time.perf_counter() - start_time) / REPEAT_NUM
+
+
+if __name__ == "__main__":
+    instance = int(sys.argv[1]) if len(sys.argv) > 1 else largest_instance()
+    items = order_items(instance)
+    route_map = Map(get_route_map("route_info.csv"))
+    factory_ids = list(route_map.factory_id_to_index)
+
+    history, columnar_memory = measure_memory(lambda: create_history(items, factory_ids))
+    (vehicle_history, item_history), dict_memory = measure_memory(
+        lambda: (history.get_vehicle_position_history(), history.get_order_item_status_history()))
+    event_num = len(history.vehicle_indexes) + len(history.item_indexes)
+    print(f"instance_{instance}: {len(items)} order items, {event_num} events")
+    print(f"memory per event: lists of dicts {dict_memory / event_num:6.1f} B, "
+          f"columnar {columnar_memory / event_num:6.1f} B")
+
+    logger.logger.disabled = True
+    former_score, former_time = measure_time(lambda: former_total_score(vehicle_history, item_history, route_map))
+    score, columnar_time = measure_time(lambda: Evaluator.calculate_total_score(history, route_map, VEHICLE_NUM))
+    print(f"total score: lists of dicts {former_score:.3f} in {former_time:.4f} s, "
+          f"columnar {score:.3f} in {columnar_time:.4f} s")
@@ -0,0 +1,121 @@
+"""
+Comparison of the vehicle simulator configurations against the original one (simpy.rt.RealtimeEnvironment without
+incremental simulation). Each instance is run once with the configured engine; at every decision epoch the same
+vehicles are also simulated with the original engine, and the arrival and departure times of all the vehicles are
+compared. The dispatcher runs in process: "naive" appends each order to the earliest available vehicle, which is fast
+and queues many vehicles at the docks, "best_insert" gives realistic routes but is slow on the instances with 2000 orders
+and more.
+
+Usage: python benchmark/compare_simulation_engines.py [naive|best_insert] [instance numbers, default: all]
+"""
+import argparse
+import copy
+import os
+import pathlib
+import sys
+import time
+
+# change current working directory for convenience
+os.chdir(pathlib.Path(__file__).parent)
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from src.conf.configs import Configs
+from src.simulator.simulate_api import simulate
+from src.simulator.vehicle_simulator import VehicleSimulator
+from src.utils.logging_engine import logger
+from algorithm import algorithm_best_insert, algorithm_naive
+
+DISPATCHER_NAME_TO_SOLVE = {'naive': algorithm_naive.dispatch_orders_to_vehicles,
+                            'best_insert': algorithm_best_insert.dispatch_orders_to_vehicles}
+REFERENCE_ENGINE = 'simpy'
+REFERENCE_INCREMENTAL_SIMULATION = False
+
+
+def get_timelines(id_to_vehicle: dict):
+    """arrival and departure times of the current factory, the destination and the planned route of each vehicle"""
+    timelines = {}
+    for vehicle_id, vehicle in id_to_vehicle.items():
+        destination_times = None
+        if vehicle.destination is not None:
+            destination_times = (vehicle.destination.arrive_time, vehicle.destination.leave_time)
+        timelines[vehicle_id] = (vehicle.leave_time_at_current_factory, destination_times,
+                                 [(node.arrive_time, node.leave_time) for node in vehicle.planned_route])
+    return timelines
+
+
+class EngineComparison:
+    """runs the reference simulation next to each VehicleSimulator.run and counts the differences"""
+
+    def __init__(self):
+        self.run = VehicleSimulator.run
+        self.reference_simulator = None
+        self.epoch_num = 0
+        self.mismatch_num = 0
+        self.engine_time = 0
+        self.reference_time = 0
+
+    def reset(self):
+        self.reference_simulator = None
+        self.epoch_num = 0
+        self.mismatch_num = 0
+        self.engine_time = 0
+        self.reference_time = 0
+
+    def compare(self, simulator, id_to_vehicle: dict, from_time: int):
+        if self.reference_simulator is None:
+            self.reference_simulator = VehicleSimulator(simulator.route_map, simulator.id_to_factory)
+        reference_vehicles = copy.deepcopy(id_to_vehicle)
+
+        start_time = time.perf_counter()
+        self.run(simulator, id_to_vehicle, from_time)
+        self.engine_time += time.perf_counter() - start_time
+
+        engine, incremental_simulation = Configs.SIMULATION_ENGINE, Configs.INCREMENTAL_SIMULATION
+        Configs.SIMULATION_ENGINE = REFERENCE_ENGINE
+        Configs.INCREMENTAL_SIMULATION = REFERENCE_INCREMENTAL_SIMULATION
+        try:
+            start_time = time.perf_counter()
+            self.run(self.reference_simulator, reference_vehicles, from_time)
+            self.reference_time += time.perf_counter() - start_time
+        finally:
+            Configs.SIMULATION_ENGINE, Configs.INCREMENTAL_SIMULATION = engine, incremental_simulation
+
+        self.epoch_num += 1
+        timelines = get_timelines(id_to_vehicle)
+        reference_timelines = get_timelines(reference_vehicles)
+        for vehicle_id, timeline in timelines.items():
+            if timeline != reference_timelines[vehicle_id]:
+                self.mismatch_num += 1
+                print(f"Different timelines of {vehicle_id} from {from_time}: "
+                      f"{timeline} != {reference_timelines[vehicle_id]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dispatcher", nargs="?", default="naive", choices=DISPATCHER_NAME_TO_SOLVE)
+    parser.add_argument("instances", nargs="*", type=int, default=Configs.all_test_instances)
+    args = parser.parse_args()
+    logger.logger.disabled = True
+
+    comparison = EngineComparison()
+    VehicleSimulator.run = lambda simulator, id_to_vehicle, from_time: comparison.compare(simulator, id_to_vehicle,
+                                                                                           from_time)
+    print(f"dispatcher {args.dispatcher}, engine {Configs.SIMULATION_ENGINE}, incremental "
+          f"{Configs.INCREMENTAL_SIMULATION} against {REFERENCE_ENGINE}, incremental {REFERENCE_INCREMENTAL_SIMULATION}")
+    total_epoch_num = 0
+    total_mismatch_num = 0
+    total_engine_time = 0
+    total_reference_time = 0
+    for idx in args.instances:
+        comparison.reset()
+        dispatcher = algorithm_best_insert.InProcessDispatcher(DISPATCHER_NAME_TO_SOLVE[args.dispatcher])
+        score = simulate(Configs.factory_info_file, Configs.route_info_file, f"instance_{idx}", dispatcher)
+        total_epoch_num += comparison.epoch_num
+        total_mismatch_num += comparison.mismatch_num
+        total_engine_time += comparison.engine_time
+        total_reference_time += comparison.reference_time
+        print(f"instance_{idx}: score {score:.3f}, {comparison.epoch_num} epochs, "
+              f"{comparison.mismatch_num} different timelines, simulation {comparison.engine_time:.2f} s, "
+              f"reference {comparison.reference_time:.2f} s", flush=True)
+    print(f"{len(args.instances)} instances, {total_epoch_num} epochs, {total_mismatch_num} different timelines, "
+          f"simulation {total_engine_time:.2f} s, reference {total_reference_time:.2f} s")
@@ -1,49 +1,39 @@
 import os
 import pathlib
+import sys
 import pandas as pd
 import json
 
 # change current working directory for convenience
 os.chdir(pathlib.Path(__file__).parent)
 
-# read factory info
-factory_info_df   = pd.read_csv('factory_info.csv')
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from src.utils.input_utils import create_route_matrices, get_factory_indexes_of_route_matrices, \
+    get_hash_of_route_files, get_route_matrices, save_route_matrix_cache
 
-# create list of factories and inverse dict
-# factories are sorted alphabetically
-factory_list      = list( factory_info_df['factory_id'] )
-factory_list.sort()
-factory_to_int    = { factory_list[i]:i for i in range(len(factory_list)) }
-
-# read route info
-route_info_df     = pd.read_csv('route_info.csv')
-
-# get distance mtx and save as list of lists
-route_distance_df = route_info_df.pivot_table( index='start_factory_id', columns='end_factory_id', values='distance', fill_value=0 )
-route_distance_df = route_distance_df.rename( index=factory_to_int, columns=factory_to_int )
-
-n = len(route_distance_df.index)
-distance_mtx = [ [ route_distance_df[i][j] for j in range(n) ] for i in range(n) ]
+# get distance and time mtx (pivot tables of route_info.csv) and save as list of lists
+distance_np_mtx, time_np_mtx = create_route_matrices('route_info.csv', 'factory_info.csv')
 
+distance_mtx = distance_np_mtx.tolist()
 with open('distance_mtx.json', 'w') as f:
     json.dump(distance_mtx, f, indent=2) 
 
-# get time mtx and save as list of lists
-route_time_df     = route_info_df.pivot_table( index='start_factory_id', columns='end_factory_id', values='time', fill_value=0 )
-route_time_df     = route_time_df.rename( index=factory_to_int, columns=factory_to_int )
-
-n = len(route_time_df.index)
-time_mtx = [ [ route_time_df[i][j] for j in range(n) ] for i in range(n) ]
+time_mtx = time_np_mtx.tolist()
 with open('time_mtx.json', 'w') as f:
     json.dump(time_mtx, f, indent=2) 
 
+# save the binary cache (distance_mtx.npy, time_mtx.npy) loaded by the algorithms with memory mapping,
+# together with the hash of route_info.csv and factory_info.csv used to invalidate it
+save_route_matrix_cache(distance_np_mtx, time_np_mtx, get_hash_of_route_files())
+
 
 '''
 Test if saved matrices are correct
 '''
 
-# original data
+# original data, factories are sorted alphabetically
 orig_df = pd.read_csv('route_info.csv')
+factory_to_int = get_factory_indexes_of_route_matrices('factory_info.csv')
 
 # saved data
 with open("distance_mtx.json", 'r') as f:
@@ -66,5 +56,8 @@ for i in range(len(dist_saved)):
 for i in range(len(time_saved)):
     assert time_saved[i][i] == 0, f'time from "{i}" to "{i}" should be 0'
 
+# check if the binary cache is the same as the json files
+assert get_route_matrices() == { 'distance': dist_saved, 'time': time_saved }, 'binary cache mismatch'
+
 # happy end
 print('SUCCESS')
\ No newline at end of file
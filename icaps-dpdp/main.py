@@ -18,15 +18,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE
 
-import traceback
-import datetime
 import numpy as np
-import sys
 
 from src.conf.configs import Configs
-from src.simulator.simulate_api import simulate
-from src.utils.log_utils import ini_logger, remove_file_handler_of_logging
-from src.utils.logging_engine import logger
+from src.simulator.benchmark_runner import run_instances
 # from naie.metrics import report
 
 if __name__ == "__main__":
@@ -38,32 +33,8 @@ if __name__ == "__main__":
     else:
         test_instances = Configs.all_test_instances
 
-    score_list = []
-    for idx in test_instances:
-        # Initial the log
-        log_file_name = f"dpdp_{datetime.datetime.now().strftime('%y%m%d%H%M%S')}.log"
-        ini_logger(log_file_name)
-
-        instance = "instance_%d" % idx
-        logger.info(f"Start to run {instance}")
-
-        with open(Configs.current_instance_file_path, 'w') as f:
-            f.write(str(idx))
-
-        with open(Configs.first_iteration_flag_file_path, 'w') as f:
-            f.write('1')
-
-        try:
-            score = simulate(Configs.factory_info_file, Configs.route_info_file, instance)
-            score_list.append(score)
-            logger.info(f"Score of {instance}: {score}")
-        except Exception as e:
-            logger.error("Failed to run simulator")
-            logger.error(f"Error: {e}, {traceback.format_exc()}")
-            score_list.append(sys.maxsize)
-
-        # 删除日志句柄
-        remove_file_handler_of_logging(log_file_name)
+    # 多进程并行运行算例, set Configs.BENCHMARK_PROCESS_NUM > 1 to run the instances in a process pool
+    score_list = run_instances(test_instances, Configs.BENCHMARK_PROCESS_NUM)
 
     avg_score = np.mean(score_list)
     # with report(True) as logs:
@@ -18,12 +18,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE
 
+import sys
 import traceback
 
+from src.conf.configs import Configs
+from src.utils.json_tools import run_algorithm_worker
 from src.utils.logging_engine import logger
-from algorithm.localsearch_solver import scheduling
+from algorithm.localsearch_solver import scheduling, create_dispatcher
 
 if __name__ == '__main__':
+    # long-lived worker, see the "worker" calling mode of the simulator
+    if Configs.ALGORITHM_WORKER_ARG in sys.argv:
+        run_algorithm_worker(create_dispatcher())
+        sys.exit(0)
+
     try:
         scheduling()
         print("SUCCESS")
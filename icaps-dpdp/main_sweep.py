@@ -0,0 +1,19 @@
+import json
+import sys
+
+from src.conf.configs import Configs
+from src.simulator.benchmark_sweep import run_sweep
+
+if __name__ == "__main__":
+    # 参数配置文件, json list of configurations, e.g. [{}, {"algorithm.localsearch.LS_FIRST_IMPROVEMENT": true}]
+    # the first configuration is the baseline
+    with open(sys.argv[1]) as f:
+        configurations = json.load(f)
+
+    test_instances = Configs.selected_instances if Configs.selected_instances else Configs.all_test_instances
+    results = run_sweep(configurations, test_instances)
+
+    for result in results:
+        print(result)
+    completed_results = [result for result in results if not result["aborted"]]
+    print("Best configuration:", min(completed_results, key=lambda result: result["avg_score"])["configuration"])
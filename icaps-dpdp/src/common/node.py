@@ -20,6 +20,10 @@
 
 
 class Node(object):
+    # 固定的属性列表, 私有属性名会被改写为_Node__id等, fixed attributes, the private names are mangled to _Node__id etc.
+    __slots__ = ("__id", "__lng", "__lat", "__delivery_items", "__unloading_time", "__pickup_items", "__loading_time",
+                 "__service_time", "arrive_time", "leave_time")
+
     def __init__(self, factory_id: str, lng: float, lat: float, pickup_item_list: list, delivery_item_list: list,
                  arrive_time=0, leave_time=0):
         """
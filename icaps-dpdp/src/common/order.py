@@ -69,6 +69,10 @@ class Order(object):
 
 
 class OrderItem(object):
+    # 固定的属性列表, 节省内存并加快属性访问, fixed attributes, less memory and faster attribute access than a __dict__
+    __slots__ = ("id", "type", "order_id", "demand", "pickup_factory_id", "delivery_factory_id", "creation_time",
+                 "committed_completion_time", "load_time", "unload_time", "delivery_state")
+
     def __init__(self, item_id: str, item_type: str, order_id: str, demand: float,
                  pickup_factory_id: str, delivery_factory_id: str, creation_time: int, committed_completion_time: int,
                  loading_time: int, unloading_time: int, delivery_state=0):
@@ -97,3 +101,17 @@ class OrderItem(object):
         self.load_time = loading_time
         self.unload_time = unloading_time
         self.delivery_state = delivery_state
+
+    @classmethod
+    def from_dict(cls, _dict: dict):
+        """
+        由属性字典创建物料, 字典的键为属性名 (与to_dict相同), create the item from the dict of its attributes
+        """
+        item = cls.__new__(cls)
+        for key, value in _dict.items():
+            setattr(item, key, value)
+        return item
+
+    def to_dict(self):
+        """属性字典, 键的顺序与__slots__相同, dict of the attributes in the order of __slots__"""
+        return {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)}
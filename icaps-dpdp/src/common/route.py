@@ -20,6 +20,8 @@
 
 import sys
 
+import numpy as np
+
 from src.utils.logging_engine import logger
 
 
@@ -42,37 +44,119 @@ class RouteInfo(object):
 class Map(object):
     def __init__(self, code_to_route):
         self.__code_to_route = code_to_route
-        # distance between factories, unit is km
-        self.__factory_id_pair_to_distance = self.__get_distance_matrix_between_factories()
-        # time between factories, unit is second
-        self.__factory_id_pair_to_time = self.__get_time_matrix_between_factories()
-
-    def __get_distance_matrix_between_factories(self):
-        if len(self.__code_to_route) == 0:
-            return
-
-        dist_mat = {}
-        for route_code, route in self.__code_to_route.items():
-            if (route.start_factory_id, route.end_factory_id) not in dist_mat:
-                dist_mat[(route.start_factory_id, route.end_factory_id)] = route.distance
-        return dist_mat
-
-    def __get_time_matrix_between_factories(self):
-        if len(self.__code_to_route) == 0:
-            return
-
-        time_mat = {}
-        for route_code, route in self.__code_to_route.items():
-            if (route.start_factory_id, route.end_factory_id) not in time_mat:
-                time_mat[(route.start_factory_id, route.end_factory_id)] = route.time
-        return time_mat
+
+        # 工厂编号到矩阵下标的映射, 未知工厂使用最后一个下标(与任何工厂之间都没有路线)
+        # factory id -> integer index of the matrices, unknown factories share the last index (no route at all)
+        self.factory_id_to_index = self.__get_factory_id_to_index()
+        self.unknown_factory_index = len(self.factory_id_to_index)
+
+        # distance between factories, unit is km, np.ndarray of float indexed by the factory indexes
+        self.distance_matrix = None
+        # time between factories, unit is second, np.ndarray of int indexed by the factory indexes
+        self.time_matrix = None
+        # 两个工厂之间是否有路线, whether there is a route between two factories
+        self.route_mask = None
+        self.__ini_matrices_between_factories()
+
+        # 兼容按工厂编号逐个查询的接口, 矩阵各行转为python列表(没有路线为None), 返回python数值
+        # rows of the matrices as python lists (None if there is no route) for the lookups by factory ids
+        self.__distance_rows = self.__get_rows_of_matrix(self.distance_matrix)
+        self.__time_rows = self.__get_rows_of_matrix(self.time_matrix)
+
+    def __get_factory_id_to_index(self):
+        factory_id_to_index = {}
+        for route in self.__code_to_route.values():
+            for factory_id in (route.start_factory_id, route.end_factory_id):
+                if factory_id not in factory_id_to_index:
+                    factory_id_to_index[factory_id] = len(factory_id_to_index)
+        return factory_id_to_index
+
+    def __ini_matrices_between_factories(self):
+        factory_num = len(self.factory_id_to_index) + 1
+        self.distance_matrix = np.zeros((factory_num, factory_num), dtype=float)
+        self.time_matrix = np.zeros((factory_num, factory_num), dtype=np.int64)
+        self.route_mask = np.zeros((factory_num, factory_num), dtype=bool)
+
+        routes = list(self.__code_to_route.values())
+        if len(routes) > 0:
+            start_indexes = np.array([self.factory_id_to_index.get(route.start_factory_id) for route in routes])
+            end_indexes = np.array([self.factory_id_to_index.get(route.end_factory_id) for route in routes])
+            # 同一对工厂有多条路线时取第一条, the first route is used for each pair of factories
+            _, first_indexes = np.unique(start_indexes * factory_num + end_indexes, return_index=True)
+            start_indexes = start_indexes[first_indexes]
+            end_indexes = end_indexes[first_indexes]
+            self.distance_matrix[start_indexes, end_indexes] = [routes[i].distance for i in first_indexes]
+            self.time_matrix[start_indexes, end_indexes] = [routes[i].time for i in first_indexes]
+            self.route_mask[start_indexes, end_indexes] = True
+
+        # 同一工厂之间的距离和时间为0, zero between the same factory
+        known_indexes = np.arange(factory_num - 1)
+        self.distance_matrix[known_indexes, known_indexes] = 0
+        self.time_matrix[known_indexes, known_indexes] = 0
+        self.route_mask[known_indexes, known_indexes] = True
+
+    def __get_rows_of_matrix(self, matrix):
+        rows = matrix.tolist()
+        for src_index, dest_index in zip(*np.nonzero(~self.route_mask)):
+            rows[src_index][dest_index] = None
+        return rows
+
+    def get_factory_indexes(self, factory_id_list):
+        """
+        :param factory_id_list: 工厂编号列表, list of factory ids
+        :return: np.ndarray of the factory indexes
+        """
+        return np.array([self.factory_id_to_index.get(factory_id, self.unknown_factory_index)
+                         for factory_id in factory_id_list], dtype=np.int64)
+
+    def calculate_distances_of_route(self, factory_indexes):
+        """
+        批量计算路线上相邻工厂之间的距离, distances of all hops of a route in one call
+        :param factory_indexes: 路线途经工厂的下标数组, array of the factory indexes along the route
+        :return: np.ndarray of float, length is len(factory_indexes) - 1, sys.maxsize for a missing route
+        """
+        factory_indexes = np.asarray(factory_indexes, dtype=np.int64)
+        return self.__get_hop_values(self.distance_matrix, factory_indexes[:-1], factory_indexes[1:], "distance")
+
+    def calculate_distances_between(self, src_indexes, dest_indexes):
+        """
+        批量计算多对工厂之间的距离, distances of many pairs of factories in one call
+        :param src_indexes: 起始工厂的下标数组, array of the indexes of the start factories
+        :param dest_indexes: 结束工厂的下标数组, array of the indexes of the end factories
+        :return: np.ndarray of float, sys.maxsize for a missing route
+        """
+        return self.__get_hop_values(self.distance_matrix, np.asarray(src_indexes, dtype=np.int64),
+                                     np.asarray(dest_indexes, dtype=np.int64), "distance")
+
+    def calculate_transport_times_of_route(self, factory_indexes):
+        """
+        批量计算路线上相邻工厂之间的运输时间, transport times of all hops of a route in one call
+        :param factory_indexes: 路线途经工厂的下标数组, array of the factory indexes along the route
+        :return: np.ndarray of int, length is len(factory_indexes) - 1, sys.maxsize for a missing route
+        """
+        factory_indexes = np.asarray(factory_indexes, dtype=np.int64)
+        return self.__get_hop_values(self.time_matrix, factory_indexes[:-1], factory_indexes[1:], "time")
+
+    def __get_hop_values(self, matrix, src_indexes, dest_indexes, matrix_name: str):
+        values = matrix[src_indexes, dest_indexes]
+
+        missing_hops = np.nonzero(~self.route_mask[src_indexes, dest_indexes])[0]
+        if len(missing_hops) > 0:
+            index_to_factory_id = {index: factory_id for factory_id, index in self.factory_id_to_index.items()}
+            for hop in missing_hops:
+                logger.error(f"({index_to_factory_id.get(src_indexes[hop])}, "
+                             f"{index_to_factory_id.get(dest_indexes[hop])}) is not in {matrix_name} matrix")
+            values[missing_hops] = sys.maxsize
+        return values
 
     def calculate_distance_between_factories(self, src_factory_id, dest_factory_id):
         if src_factory_id == dest_factory_id:
             return 0
 
-        if (src_factory_id, dest_factory_id) in self.__factory_id_pair_to_distance:
-            return self.__factory_id_pair_to_distance.get((src_factory_id, dest_factory_id))
+        distance = self.__distance_rows[self.factory_id_to_index.get(src_factory_id, self.unknown_factory_index)][
+            self.factory_id_to_index.get(dest_factory_id, self.unknown_factory_index)]
+        if distance is not None:
+            return distance
         else:
             logger.error(f"({src_factory_id}, {dest_factory_id}) is not in distance matrix")
             return sys.maxsize
@@ -80,8 +164,10 @@ class Map(object):
     def calculate_transport_time_between_factories(self, src_factory_id, dest_factory_id):
         if src_factory_id == dest_factory_id:
             return 0
-        if (src_factory_id, dest_factory_id) in self.__factory_id_pair_to_time:
-            return self.__factory_id_pair_to_time.get((src_factory_id, dest_factory_id))
+        transport_time = self.__time_rows[self.factory_id_to_index.get(src_factory_id, self.unknown_factory_index)][
+            self.factory_id_to_index.get(dest_factory_id, self.unknown_factory_index)]
+        if transport_time is not None:
+            return transport_time
         else:
             logger.error(f"({src_factory_id}, {dest_factory_id}) is not in time matrix")
             return sys.maxsize
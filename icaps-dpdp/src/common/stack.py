@@ -38,3 +38,17 @@ class Stack(object):
     def size(self):
         return len(self.items)
 
+    # 只读访问, 不复制货物, read-only access without copying the items
+    # the stack must not be modified while iterating over a view
+    def top_down(self):
+        """从栈顶到栈底的只读迭代器, read-only iterator from the top (the next item to unload) to the bottom"""
+        return reversed(self.items)
+
+    def bottom_up(self):
+        """从栈底到栈顶的只读迭代器, read-only iterator from the bottom (the first loaded item) to the top"""
+        return iter(self.items)
+
+    def snapshot(self):
+        """不可变快照, immutable snapshot from the bottom to the top, the items are shared with the stack"""
+        return tuple(self.items)
+
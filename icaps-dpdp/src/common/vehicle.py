@@ -20,13 +20,16 @@
 
 from __future__ import annotations
 
-import copy
-
 from src.common.stack import Stack
 from src.common.node import Node
 
 
 class Vehicle(object):
+    # 固定的属性列表, fixed attributes, less memory and faster attribute access than a __dict__
+    __slots__ = ("id", "no", "operation_time", "board_capacity", "gps_id", "__carrying_items", "gps_update_time",
+                 "cur_factory_id", "arrive_time_at_current_factory", "leave_time_at_current_factory", "destination",
+                 "planned_route")
+
     def __init__(self, car_num: str, capacity: int, gps_id: str, operation_time: int, carrying_items=None):
         """
         :param car_num: 车牌号, id of the vehicle
@@ -95,19 +98,10 @@ class Vehicle(object):
         return self.__carrying_items.pop()
 
     def get_unloading_sequence(self):
-        unloading_sequence = []
-        copy_carrying_items = copy.deepcopy(self.__carrying_items)
-        while not copy_carrying_items.is_empty():
-            unloading_sequence.append(copy_carrying_items.pop())
-        return unloading_sequence
+        return list(self.__carrying_items.top_down())
 
     def get_loading_sequence(self):
-        unloading_sequence = self.get_unloading_sequence()
-        loading_sequence = []
-        for i in range(len(unloading_sequence)):
-            index = len(unloading_sequence) - 1 - i
-            loading_sequence.append(unloading_sequence[index])
-        return loading_sequence
+        return list(self.__carrying_items.bottom_up())
 
     def set_cur_position_info(self, cur_factory_id, update_time: int, arrive_time_at_current_factory=0, leave_time_at_current_factory=0):
         self.cur_factory_id = cur_factory_id
@@ -123,4 +117,4 @@ class Vehicle(object):
         return "[{}:{}]".format(self.__class__.__name__, self.gather_attrs())
 
     def gather_attrs(self):
-        return ",".join("{}={}".format(k, getattr(self, k)) for k in self.__dict__.keys())
+        return ",".join("{}={}".format(k, getattr(self, k)) for k in self.__slots__ if "__" not in k)
@@ -47,6 +47,14 @@ class Configs(object):
     # 靠台时间
     DOCK_APPROACHING_TIME = 30 * 60  # unit: second
 
+    # 车辆仿真引擎, engine of the vehicle simulator
+    # "event_queue": 基于事件堆和货口计数的离散事件引擎, "simpy": simpy.rt.RealtimeEnvironment
+    SIMULATION_ENGINE = 'event_queue'
+    # 增量仿真: 不等待货口的时间线按车辆输入签名在相邻两次仿真间复用, 只有途经拥堵货口的车辆才重新仿真
+    # incremental simulation, the free-flow timelines (without waiting for docks) are reused by the input signature of
+    # each vehicle, only the vehicles at congested docks are simulated again
+    INCREMENTAL_SIMULATION = True
+
     # 文件路径
     root_folder_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     benchmark_folder_path = os.path.join(root_folder_path, "benchmark")
@@ -66,10 +74,21 @@ class Configs(object):
     factory_info_file_path = os.path.join(benchmark_folder_path, factory_info_file)
     distance_mtx_file_path = os.path.join(benchmark_folder_path, distance_mtx_file)
     time_mtx_file_path = os.path.join(benchmark_folder_path, time_mtx_file)
-    current_instance_file_path = os.path.join(root_folder_path, current_instance_file)
-    first_iteration_flag_file_path = os.path.join(root_folder_path, first_iteration_flag_file)
+    # 距离和时间矩阵的二进制缓存, 及生成缓存时路网文件的哈希值
+    # binary cache of the route matrices and the hash of the route files it was built from
+    distance_mtx_cache_file_path = os.path.join(benchmark_folder_path, "distance_mtx.npy")
+    time_mtx_cache_file_path = os.path.join(benchmark_folder_path, "time_mtx.npy")
+    route_mtx_hash_file_path = os.path.join(benchmark_folder_path, "route_mtx.sha256")
+
+    # 独立工作目录, 设置后算例标志文件和算法交互文件都放在该目录下, 用于并行运行多个算例
+    # isolated work folder (inherited by the algorithm process through the environment variable)
+    WORK_FOLDER_ENV_NAME = "DPDP_WORK_FOLDER"
+    work_folder_path = os.environ.get(WORK_FOLDER_ENV_NAME, "")
+
+    current_instance_file_path = os.path.join(work_folder_path or root_folder_path, current_instance_file)
+    first_iteration_flag_file_path = os.path.join(work_folder_path or root_folder_path, first_iteration_flag_file)
 
-    algorithm_data_interaction_folder_path = os.path.join(algorithm_folder_path, "data_interaction")
+    algorithm_data_interaction_folder_path = os.path.join(work_folder_path or algorithm_folder_path, "data_interaction")
     if not os.path.exists(algorithm_data_interaction_folder_path):
         os.makedirs(algorithm_data_interaction_folder_path)
     algorithm_vehicle_input_info_path = os.path.join(algorithm_data_interaction_folder_path, "vehicle_info.json")
@@ -84,6 +103,22 @@ class Configs(object):
     # 算法入口文件名，不含扩展名
     ALGORITHM_ENTRY_FILE_NAME = 'main_algorithm'
 
+    # 算法调用方式, calling mode of the algorithm
+    # "subprocess": 每次派单启动算法进程, 通过json文件交互 (sandboxed)
+    # "in_process": 在模拟器进程内直接调用算法, 不经过文件和子进程
+    # "worker": 每个算例只启动一次算法进程, 通过管道逐次交换派单请求和结果
+    ALGORITHM_CALLING_MODE = 'subprocess'
+    # worker模式下传给算法入口的参数
+    ALGORITHM_WORKER_ARG = '--worker'
+    # worker模式下派单请求的格式, "compact": 紧凑的差量格式, "json": 与json文件内容相同的完整状态
+    # format of the dispatch requests of the worker mode, "compact": delta-encoded, "json": full state as the json files
+    ALGORITHM_WORKER_EXCHANGE_FORMAT = 'compact'
+    # 交互json文件的缩进, 4为原有的便于阅读的格式, None为不缩进(序列化更快)
+    # indent of the exchanged json files, 4 keeps the original human-readable files, None writes them compactly (faster)
+    EXCHANGE_JSON_INDENT = 4
+    # in_process模式下的算法模块, 需提供create_dispatcher()
+    IN_PROCESS_ALGORITHM_MODULE = 'algorithm.localsearch_solver'
+
     # 算法语言映射表
     ALGORITHM_LANGUAGE_MAP = {'py': 'python',
                               'class': 'java',
@@ -96,6 +131,16 @@ class Configs(object):
 
     # 算法运行超时时间
     MAX_RUNTIME_OF_ALGORITHM = 600
+    # 算法的时间预算(秒), 算法在此时间内返回当前最好的解, 应小于超时时间
+    # time budget of the algorithm (seconds), it returns the best solution found within it, less than the timeout
+    ALGORITHM_TIME_LIMIT = 9.5 * 60
+    # 插入订单时只考虑离取货工厂最近的车辆数, None为全部车辆; 最近的车辆都放不下时再尝试全部车辆
+    # number of vehicles nearest to the pickup factory considered for an insertion, None for all the vehicles;
+    # all the vehicles are tried if the couple does not fit into the nearest ones
+    INSERT_NEAREST_VEHICLE_NUM = None
+    # 插入位置按下界剪枝时的舍入误差容限
+    # tolerance of rounding errors when insertions are skipped by their lower bounds
+    INSERT_PRUNING_EPSILON = 0.000001
 
     # 算法成功标识
     ALGORITHM_SUCCESS_FLAG = 'SUCCESS'
@@ -109,3 +154,36 @@ class Configs(object):
     # 数据集选项，列表为空则选择所有数据集，如[]，[1], [1, 2, 3], [64]
     selected_instances = [1]
     all_test_instances = range(1, 65)
+
+    # 并行运行算例的进程数, 1表示串行运行, number of processes running the instances in parallel
+    BENCHMARK_PROCESS_NUM = 1
+
+    # 参数扫描中单个算例的终止比例, 分数下界超过最优配置在该算例上分数的该倍数时放弃当前配置, None表示只在总分必然更差时放弃
+    # parameter sweeps: a configuration is dropped once the lower bound of its score on an instance exceeds this ratio
+    # times the score of the incumbent configuration on the instance, None drops it only once its total is surely worse
+    SWEEP_INSTANCE_ABORT_RATIO = None
+
+    @classmethod
+    def set_work_folder(cls, work_folder_path: str):
+        """
+        切换到独立的工作目录, 当前进程及其启动的算法进程都使用该目录下的标志文件和交互文件
+        Switch to an isolated work folder, used by the current process and the algorithm processes started by it
+        """
+        os.environ[cls.WORK_FOLDER_ENV_NAME] = work_folder_path
+        cls.work_folder_path = work_folder_path
+        cls.current_instance_file_path = os.path.join(work_folder_path, cls.current_instance_file)
+        cls.first_iteration_flag_file_path = os.path.join(work_folder_path, cls.first_iteration_flag_file)
+
+        cls.algorithm_data_interaction_folder_path = os.path.join(work_folder_path, "data_interaction")
+        if not os.path.exists(cls.algorithm_data_interaction_folder_path):
+            os.makedirs(cls.algorithm_data_interaction_folder_path)
+        cls.algorithm_vehicle_input_info_path = os.path.join(cls.algorithm_data_interaction_folder_path,
+                                                             "vehicle_info.json")
+        cls.algorithm_unallocated_order_items_input_path = os.path.join(cls.algorithm_data_interaction_folder_path,
+                                                                        "unallocated_order_items.json")
+        cls.algorithm_ongoing_order_items_input_path = os.path.join(cls.algorithm_data_interaction_folder_path,
+                                                                    "ongoing_order_items.json")
+        cls.algorithm_output_destination_path = os.path.join(cls.algorithm_data_interaction_folder_path,
+                                                             'output_destination.json')
+        cls.algorithm_output_planned_route_path = os.path.join(cls.algorithm_data_interaction_folder_path,
+                                                               'output_route.json')
@@ -0,0 +1,90 @@
+# Copyright (C) 2021. Huawei Technologies Co., Ltd. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE
+
+
+import datetime
+import multiprocessing
+import os
+import sys
+import traceback
+
+from src.conf.configs import Configs
+from src.simulator.simulate_api import simulate
+from src.utils.log_utils import ini_logger, remove_file_handler_of_logging
+from src.utils.logging_engine import logger
+
+
+def run_instances(test_instances, process_num: int = 1):
+    """
+    运行多个算例, run the instances serially or in a process pool
+    :param test_instances: 算例编号列表, e.g. [1, 2, 3]
+    :param process_num: 并行进程数, 1表示串行运行
+    :return: score_list, 与test_instances顺序一致
+    """
+    if process_num <= 1:
+        return [run_instance(idx) for idx in test_instances]
+
+    with multiprocessing.Pool(processes=process_num) as pool:
+        return pool.map(run_isolated_instance, test_instances, chunksize=1)
+
+
+def run_isolated_instance(idx: int):
+    """
+    在独立的工作目录下运行算例, 避免并行的算例共用标志文件和算法交互文件
+    Run the instance with its own work folder, so that instances running in parallel do not share files
+    """
+    work_folder_path = os.path.join(Configs.output_folder, "work", f"instance_{idx}")
+    if not os.path.exists(work_folder_path):
+        os.makedirs(work_folder_path)
+    Configs.set_work_folder(work_folder_path)
+    return run_instance(idx)
+
+
+def run_instance(idx: int, abort_score=None):
+    """
+    :param idx: 算例编号
+    :param abort_score: 提前终止的分数, the simulation stops once the lower bound of the score exceeds it
+    :return: score of the instance (its lower bound if aborted), sys.maxsize if the simulation fails
+    """
+    # Initial the log
+    log_file_name = f"dpdp_{datetime.datetime.now().strftime('%y%m%d%H%M%S')}_instance_{idx}.log"
+    ini_logger(log_file_name)
+
+    instance = "instance_%d" % idx
+    logger.info(f"Start to run {instance}")
+
+    with open(Configs.current_instance_file_path, 'w') as f:
+        f.write(str(idx))
+
+    with open(Configs.first_iteration_flag_file_path, 'w') as f:
+        f.write('1')
+
+    try:
+        score = simulate(Configs.factory_info_file, Configs.route_info_file, instance, abort_score=abort_score)
+        logger.info(f"Score of {instance}: {score}")
+    # the simulator calls sys.exit() on fatal errors, which must not kill the worker of the process pool
+    except (Exception, SystemExit) as e:
+        logger.error("Failed to run simulator")
+        logger.error(f"Error: {e}, {traceback.format_exc()}")
+        score = sys.maxsize
+
+    # 删除日志句柄
+    remove_file_handler_of_logging(log_file_name)
+    return score
@@ -0,0 +1,101 @@
+# Copyright (C) 2021. Huawei Technologies Co., Ltd. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE
+
+
+import importlib
+
+from src.conf.configs import Configs
+from src.simulator.benchmark_runner import run_instance
+from src.utils.logging_engine import logger
+
+
+def run_sweep(configurations: list, test_instances, instance_abort_ratio=None):
+    """
+    参数扫描, 提前放弃必然更差的配置
+    Run the configurations one after the other on the instances. The first configuration is the baseline, the best
+    configuration so far is the incumbent. The simulation of an instance stops as soon as the lower bound of its score
+    exceeds the score the configuration may still spend to beat the incumbent, i.e. the total score of the incumbent
+    minus the scores of the configuration on the previous instances; the configuration is dropped then, without running
+    its remaining instances.
+    :param configurations: 参数配置列表, list of dicts parameter name -> value, see apply_configuration
+    :param test_instances: 算例编号列表, e.g. [1, 2, 3]
+    :param instance_abort_ratio: 单个算例的终止比例, the configuration is also dropped once the lower bound of its score
+                                 on an instance exceeds this ratio times the score of the incumbent on the instance,
+                                 None means Configs.SWEEP_INSTANCE_ABORT_RATIO
+    :return: list of dicts, one per configuration: "configuration", "score_list" (the lower bound of the score of the
+             aborted instance, no score for the instances not run), "aborted", "avg_score" (None if aborted)
+    """
+    if instance_abort_ratio is None:
+        instance_abort_ratio = Configs.SWEEP_INSTANCE_ABORT_RATIO
+    test_instances = list(test_instances)
+
+    results = []
+    incumbent = None
+    for configuration in configurations:
+        logger.info(f"Start to run the configuration {configuration}")
+        score_list = []
+        aborted = False
+        original_values = apply_configuration(configuration)
+        try:
+            for index, idx in enumerate(test_instances):
+                abort_score = None
+                if incumbent is not None:
+                    abort_score = sum(incumbent["score_list"]) - sum(score_list)
+                    if instance_abort_ratio is not None:
+                        abort_score = min(abort_score, instance_abort_ratio * incumbent["score_list"][index])
+
+                score = run_instance(idx, abort_score)
+                score_list.append(score)
+                if abort_score is not None and score > abort_score:
+                    logger.info(f"Score of instance_{idx} {score: .3f} exceeds {abort_score: .3f}, "
+                                f"the configuration {configuration} is dropped")
+                    aborted = True
+                    break
+        finally:
+            apply_configuration(original_values)
+
+        result = {"configuration": configuration,
+                  "score_list": score_list,
+                  "aborted": aborted,
+                  "avg_score": None if aborted else sum(score_list) / len(score_list)}
+        results.append(result)
+        if not aborted and (incumbent is None or sum(score_list) < sum(incumbent["score_list"])):
+            incumbent = result
+            logger.info(f"New incumbent configuration {configuration}, average score: {result['avg_score']: .3f}")
+    return results
+
+
+def apply_configuration(configuration: dict):
+    """
+    设置参数, set the parameters of the configuration in the current process
+    Parameter names are "Configs.NAME" for the configs of the simulator or "module.NAME" for the module-level constants
+    of the algorithm, e.g. "algorithm.localsearch.LS_FIRST_IMPROVEMENT". They take effect for the algorithm running in
+    the current process (ALGORITHM_CALLING_MODE "in_process") and for constants read through their module at run time.
+    :return: 原参数值, the former values of the parameters, to restore them
+    """
+    original_values = {}
+    for name, value in configuration.items():
+        owner_name, attribute = name.rsplit(".", 1)
+        owner = Configs if owner_name == "Configs" else importlib.import_module(owner_name)
+        if not hasattr(owner, attribute):
+            raise AttributeError(f"Unknown parameter {name}")
+        original_values[name] = getattr(owner, attribute)
+        setattr(owner, attribute, value)
+    return original_values
@@ -0,0 +1,142 @@
+# Copyright (C) 2021. Huawei Technologies Co., Ltd. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE
+
+
+"""
+离散事件仿真引擎, a lightweight discrete-event engine replacing simpy in VehicleSimulator
+
+Events are kept in a heap ordered by (time, priority, event id), and each factory has a dock counter with a FIFO
+queue of waiting requests. The scheduling order of events, the priorities and the dock granting rules follow simpy,
+so the visiting processes of VehicleSimulator.work produce exactly the same arrival and leave times. Unlike
+simpy.rt.RealtimeEnvironment, no wall-clock time is involved.
+"""
+
+from collections import deque
+from heapq import heappush, heappop
+
+URGENT = 0
+NORMAL = 1
+
+
+class EventQueueEnvironment(object):
+    def __init__(self, initial_time=0):
+        self.now = initial_time
+        self.__queue = []
+        self.__eid = 0
+
+    def schedule(self, callback, priority=NORMAL, delay=0):
+        heappush(self.__queue, (self.now + delay, priority, self.__eid, callback))
+        self.__eid += 1
+
+    def timeout(self, delay):
+        return Timeout(self, delay)
+
+    def process(self, generator):
+        return Process(self, generator)
+
+    def run(self):
+        while self.__queue:
+            self.now, _, _, callback = heappop(self.__queue)
+            callback()
+
+
+class Event(object):
+    def __init__(self, env):
+        self.env = env
+        # None after the event has been processed
+        self.callbacks = []
+
+    def succeed(self):
+        self.env.schedule(self.process)
+
+    def process(self):
+        callbacks, self.callbacks = self.callbacks, None
+        for callback in callbacks:
+            callback()
+
+
+class Timeout(Event):
+    def __init__(self, env, delay):
+        super().__init__(env)
+        env.schedule(self.process, delay=delay)
+
+
+class Process(object):
+    """Drives a generator which yields events, e.g. timeouts and dock requests"""
+
+    def __init__(self, env, generator):
+        self.__generator = generator
+        env.schedule(self.__resume, priority=URGENT)
+
+    def __resume(self):
+        while True:
+            try:
+                event = next(self.__generator)
+            except StopIteration:
+                return
+            if event.callbacks is not None:
+                event.callbacks.append(self.__resume)
+                return
+
+
+class DockResource(object):
+    """货口资源, docks of a factory: number of occupied docks and the FIFO queue of waiting requests"""
+
+    def __init__(self, env, capacity: int):
+        self.env = env
+        self.capacity = capacity
+        self.users = 0
+        self.queue = deque()
+
+    def request(self):
+        return DockRequest(self)
+
+    def release(self, request):
+        if request.granted:
+            self.users -= 1
+        elif request in self.queue:
+            self.queue.remove(request)
+        self.env.schedule(self.trigger)
+
+    def trigger(self):
+        # as in simpy, only the head of the queue is checked
+        if self.queue and self.users < self.capacity:
+            request = self.queue.popleft()
+            self.users += 1
+            request.granted = True
+            request.succeed()
+
+
+class DockRequest(Event):
+    def __init__(self, dock: DockResource):
+        super().__init__(dock.env)
+        self.dock = dock
+        self.granted = False
+        dock.queue.append(self)
+        dock.trigger()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # do not release the dock on generator cleanups
+        if exc_type is not GeneratorExit:
+            self.dock.release(self)
+        return None
@@ -19,38 +19,111 @@
 # THE SOFTWARE
 
 import sys
+from array import array
+
+import numpy as np
 
 from src.conf.configs import Configs
 
 
 class History(object):
+    """
+    按列追加存储的历史记录, 每个事件只占若干个定长整数, 编号通过下标表示
+    Append-only columnar history: each event is stored as a few fixed-size integers in growable typed arrays,
+    the ids of vehicles, factories, items and orders are replaced by their indexes (in the order of first appearance).
+    """
+
     def __init__(self):
-        # 车辆为单位, history of vehicles
-        self.__vehicle_id_to_node_list = {}
-        # 订单为单位, history of order items
-        self.__item_id_to_status_list = {}
+        # 编号与下标, ids of the indexes
+        self.vehicle_ids = []
+        self.factory_ids = []
+        self.item_ids = []
+        self.order_ids = []
+        self.__vehicle_id_to_index = {}
+        self.__factory_id_to_index = {}
+        self.__item_id_to_index = {}
+        self.__order_id_to_index = {}
+        # 时间均为unix时间戳(秒), 以float64存储(整数秒精确表示), times are unix timestamps stored as float64
+        # 订单承诺完成时间, committed completion time of the orders, indexed by the order index
+        self.order_committed_completion_times = array('d')
+
+        # 车辆为单位, history of vehicles: one event per visited factory
+        self.vehicle_indexes = array('i')
+        self.vehicle_factory_indexes = array('i')
+        self.vehicle_update_times = array('d')
+
+        # 订单为单位, history of order items: one event per status change
+        self.item_indexes = array('i')
+        self.item_states = array('b')
+        self.item_update_times = array('d')
+        self.item_order_indexes = array('i')
+
+    @staticmethod
+    def __get_index(id_to_index: dict, ids: list, id_):
+        index = id_to_index.get(id_)
+        if index is None:
+            index = id_to_index[id_] = len(ids)
+            ids.append(id_)
+        return index
 
     def add_vehicle_position_history(self, vehicle_id, update_time, cur_factory_id):
-        if vehicle_id not in self.__vehicle_id_to_node_list:
-            self.__vehicle_id_to_node_list[vehicle_id] = []
+        vehicle_index = self.__get_index(self.__vehicle_id_to_index, self.vehicle_ids, vehicle_id)
 
         if len(cur_factory_id) > 0:
-            self.__vehicle_id_to_node_list[vehicle_id].append({"factory_id": cur_factory_id,
-                                                               "update_time": update_time})
+            self.vehicle_indexes.append(vehicle_index)
+            self.vehicle_factory_indexes.append(
+                self.__get_index(self.__factory_id_to_index, self.factory_ids, cur_factory_id))
+            self.vehicle_update_times.append(update_time)
 
     def add_order_item_status_history(self, item_id, item_state, update_time: int, committed_completion_time, order_id):
-        if item_id not in self.__item_id_to_status_list:
-            self.__item_id_to_status_list[item_id] = []
-        self.__item_id_to_status_list[item_id].append({"state": item_state,
-                                                       "update_time": update_time,
-                                                       "committed_completion_time": committed_completion_time,
-                                                       "order_id": order_id})
+        order_index = self.__order_id_to_index.get(order_id)
+        if order_index is None:
+            order_index = self.__get_index(self.__order_id_to_index, self.order_ids, order_id)
+            self.order_committed_completion_times.append(committed_completion_time)
+        self.item_indexes.append(self.__get_index(self.__item_id_to_index, self.item_ids, item_id))
+        self.item_states.append(item_state)
+        self.item_update_times.append(update_time)
+        self.item_order_indexes.append(order_index)
+
+    def get_vehicle_position_columns(self):
+        """
+        :return: 车辆历史的各列, columns of the vehicle history as np.ndarray views (no copy):
+                 vehicle indexes, factory indexes, update times
+        """
+        return (np.frombuffer(self.vehicle_indexes, dtype=np.int32),
+                np.frombuffer(self.vehicle_factory_indexes, dtype=np.int32),
+                np.frombuffer(self.vehicle_update_times, dtype=np.float64))
+
+    def get_order_item_status_columns(self):
+        """
+        :return: 订单历史的各列, columns of the order item history as np.ndarray views (no copy):
+                 item indexes, state codes, update times, order indexes
+        """
+        return (np.frombuffer(self.item_indexes, dtype=np.int32),
+                np.frombuffer(self.item_states, dtype=np.int8),
+                np.frombuffer(self.item_update_times, dtype=np.float64),
+                np.frombuffer(self.item_order_indexes, dtype=np.int32))
 
     def get_vehicle_position_history(self):
-        return self.__vehicle_id_to_node_list
+        """兼容旧接口, 按需生成, the former dict format built on demand"""
+        vehicle_id_to_node_list = {vehicle_id: [] for vehicle_id in self.vehicle_ids}
+        for vehicle_index, factory_index, update_time in zip(self.vehicle_indexes, self.vehicle_factory_indexes,
+                                                             self.vehicle_update_times):
+            vehicle_id_to_node_list[self.vehicle_ids[vehicle_index]].append(
+                {"factory_id": self.factory_ids[factory_index], "update_time": update_time})
+        return vehicle_id_to_node_list
 
     def get_order_item_status_history(self):
-        return self.__item_id_to_status_list
+        """兼容旧接口, 按需生成, the former dict format built on demand"""
+        item_id_to_status_list = {item_id: [] for item_id in self.item_ids}
+        for item_index, state, update_time, order_index in zip(self.item_indexes, self.item_states,
+                                                                self.item_update_times, self.item_order_indexes):
+            item_id_to_status_list[self.item_ids[item_index]].append(
+                {"state": state,
+                 "update_time": update_time,
+                 "committed_completion_time": self.order_committed_completion_times[order_index],
+                 "order_id": self.order_ids[order_index]})
+        return item_id_to_status_list
 
     def add_history_of_vehicles(self, id_to_vehicle: dict, to_time=0):
         if to_time == 0:
@@ -27,15 +27,19 @@ import traceback
 from src.conf.configs import Configs
 from src.simulator.simulate_environment import SimulateEnvironment
 from src.utils.input_utils import get_initial_data
+from src.utils.json_tools import get_in_process_dispatcher
 from src.utils.logging_engine import logger
 
 
-def __initialize(factory_info_file_name: str, route_info_file_name: str, instance_folder: str):
+def __initialize(factory_info_file_name: str, route_info_file_name: str, instance_folder: str, dispatcher=None,
+                 abort_score=None):
     """
     模拟器初始化, Initialize the simulator
     :param factory_info_file_name: 工厂数据文件名, name of the file containing information of factories
     :param route_info_file_name: 地图数据文件名, name of the file containing information of route map
     :param instance_folder: 测试例对应的文件夹, folder name of the instance
+    :param dispatcher: 进程内派单算法, in-process dispatcher, None means running the algorithm in a subprocess
+    :param abort_score: 提前终止的分数, see SimulateEnvironment
     :return: SimulateEnvironment
     """
     route_info_file_path = os.path.join(Configs.benchmark_folder_path, route_info_file_name)
@@ -70,7 +74,8 @@ def __initialize(factory_info_file_name: str, route_info_file_name: str, instanc
         __initial_position_of_vehicles(id_to_factory, id_to_vehicle, initial_time)
 
         # return the instance of the object SimulateEnvironment
-        return SimulateEnvironment(initial_time, time_interval, id_to_order, id_to_vehicle, id_to_factory, route_map)
+        return SimulateEnvironment(initial_time, time_interval, id_to_order, id_to_vehicle, id_to_factory, route_map,
+                                   dispatcher, abort_score)
     except Exception as exception:
         logger.error("Failed to read initial data")
         logger.error(f"Error: {exception}, {traceback.format_exc()}")
@@ -87,8 +92,16 @@ def __initial_position_of_vehicles(id_to_factory: dict, id_to_vehicle: dict, ini
         logger.info(f"Initial position of {vehicle_id} is {factory_id}")
 
 
-def simulate(factory_info_file: str, route_info_file: str, instance: str):
-    simulate_env = __initialize(factory_info_file, route_info_file, instance)
+def simulate(factory_info_file: str, route_info_file: str, instance: str, dispatcher=None, abort_score=None):
+    """
+    :param dispatcher: 进程内派单算法, callable: InputInfo -> DispatchResult.
+                       如果为None且Configs.ALGORITHM_CALLING_MODE为"in_process", 则由Configs.IN_PROCESS_ALGORITHM_MODULE创建
+    :param abort_score: 提前终止的分数, the simulation stops once the lower bound of the score exceeds it,
+                        the lower bound is returned then
+    """
+    if dispatcher is None and Configs.ALGORITHM_CALLING_MODE == 'in_process':
+        dispatcher = get_in_process_dispatcher()
+    simulate_env = __initialize(factory_info_file, route_info_file, instance, dispatcher, abort_score)
     if simulate_env is not None:
         # 模拟器仿真过程
         simulate_env.run()
@@ -22,6 +22,7 @@ import datetime
 import os
 import sys
 import time
+import traceback
 
 from src.common.dispatch_result import DispatchResult
 from src.common.input_info import InputInfo
@@ -29,10 +30,14 @@ from src.conf.configs import Configs
 from src.simulator.history import History
 from src.simulator.vehicle_simulator import VehicleSimulator
 from src.utils.checker import Checker
-from src.utils.evaluator import Evaluator
+from src.utils.evaluator import Evaluator, ScoreTracker
 from src.utils.json_tools import convert_input_info_to_json_files
-from src.utils.json_tools import get_output_of_algorithm
+from src.utils.json_tools import get_output_of_algorithm, get_output_of_in_process_algorithm
 from src.utils.json_tools import subprocess_function, get_algorithm_calling_command
+from src.utils.json_tools import start_algorithm_worker, call_algorithm_worker, stop_algorithm_worker
+from src.utils.json_tools import kill_algorithm_worker
+from src.utils.json_tools import get_output_of_algorithm_worker
+from src.utils.exchange_format import COMPACT_FORMAT_NAME, CompactStateEncoder
 from src.utils.logging_engine import logger
 from src.utils.tools import get_item_dict_from_order_dict, get_order_items_to_be_dispatched_of_cur_time
 from src.utils.tools import get_item_list_of_vehicles
@@ -40,7 +45,7 @@ from src.utils.tools import get_item_list_of_vehicles
 
 class SimulateEnvironment(object):
     def __init__(self, initial_time: int, time_interval: int, id_to_order: dict, id_to_vehicle: dict,
-                 id_to_factory: dict, route_map):
+                 id_to_factory: dict, route_map, dispatcher=None, abort_score=None):
         """
         :param initial_time: unix timestamp, unit is second
         :param time_interval: unit is second
@@ -48,6 +53,9 @@ class SimulateEnvironment(object):
         :param id_to_vehicle: 所有车辆, total vehicles
         :param id_to_factory: 工厂信息, total factories
         :param route_map: 路网信息
+        :param dispatcher: 进程内派单算法, callable: InputInfo -> DispatchResult. None表示调用算法子进程
+        :param abort_score: 提前终止的分数, the simulation stops as soon as the running score (a lower bound of the final
+                            score) exceeds it, None means never
         """
         self.initial_time = initial_time
         self.time_interval = time_interval
@@ -77,10 +85,24 @@ class SimulateEnvironment(object):
 
         # 目标函数值, objective
         self.total_score = sys.maxsize
+        # 在线评价, running score updated after each epoch, score_tracker.timeline is the score timeline
+        self.score_tracker = ScoreTracker(route_map, len(id_to_vehicle))
+        # 提前终止, early abort once the lower bound of the score exceeds abort_score
+        self.abort_score = abort_score
+        self.aborted = False
 
         # 算法调用命令
         self.algorithm_calling_command = ''
 
+        # 进程内派单算法, in-process dispatcher (None: run the algorithm in a subprocess)
+        self.dispatcher = dispatcher
+
+        # 算法常驻进程及请求序号, algorithm worker of the "worker" calling mode and the sequence number of requests
+        self.algorithm_worker = None
+        self.algorithm_worker_seq = 0
+        # 紧凑差量格式下已发送给常驻进程的状态, state sent to the worker in the compact delta format
+        self.algorithm_worker_encoder = None
+
     # 初始化历史记录
     def __ini_history(self):
         history = History()
@@ -106,6 +128,15 @@ class SimulateEnvironment(object):
             # update the status of vehicles and orders in a given interval [self.pre_time, self.cur_time]
             updated_input_info = self.update_input()
 
+            # 分数下界已超过终止分数, 不必继续模拟
+            if self.abort_score is not None and self.score_tracker.score > self.abort_score:
+                logger.info(f"Lower bound of the score {self.score_tracker.score: .3f} exceeds the abort score "
+                            f"{self.abort_score: .3f}, the simulation is aborted")
+                self.stop_algorithm_worker()
+                self.aborted = True
+                self.total_score = self.score_tracker.score
+                return
+
             # 派单环节, 设计与算法交互
             used_seconds, dispatch_result = self.dispatch(updated_input_info)
             self.time_to_dispatch_result[self.cur_time] = dispatch_result
@@ -113,6 +144,7 @@ class SimulateEnvironment(object):
             # 校验, 车辆目的地不能改变
             if not Checker.check_dispatch_result(dispatch_result, self.id_to_vehicle, self.id_to_order):
                 logger.error("Dispatch result is infeasible")
+                self.stop_algorithm_worker()
                 return
 
             # 根据派单指令更新车辆
@@ -129,6 +161,8 @@ class SimulateEnvironment(object):
                 logger.error('Simulator terminated')
                 sys.exit(-1)
 
+        self.stop_algorithm_worker()
+
         # 模拟完成车辆剩下的订单
         self.simulate_the_left_ongoing_orders_of_vehicles(self.id_to_vehicle)
 
@@ -146,6 +180,7 @@ class SimulateEnvironment(object):
         # 增加历史记录, add history
         self.history.add_history_of_vehicles(self.id_to_vehicle, self.cur_time)
         self.history.add_history_of_order_items(self.id_to_vehicle, self.cur_time)
+        self.score_tracker.update(self.history, self.cur_time)
 
         # 更新订单状态
         self.update_status_of_orders(self.vehicle_simulator.completed_item_ids, self.vehicle_simulator.ongoing_item_ids)
@@ -221,6 +256,14 @@ class SimulateEnvironment(object):
 
     # 派单环节
     def dispatch(self, input_info):
+        if self.dispatcher is not None:
+            return self.__dispatch_in_process(input_info)
+        if Configs.ALGORITHM_CALLING_MODE == 'worker':
+            return self.__dispatch_by_worker(input_info)
+        return self.__dispatch_by_subprocess(input_info)
+
+    # 子进程调用算法, 通过json文件交互
+    def __dispatch_by_subprocess(self, input_info):
         # 1. Prepare the input json of the algorithm
         convert_input_info_to_json_files(input_info)
 
@@ -246,6 +289,80 @@ class SimulateEnvironment(object):
             logger.error("Can not catch the 'SUCCESS' from the algorithm. 未寻获算法输出成功标识'SUCCESS'。")
             sys.exit(-1)
 
+    # 常驻进程调用算法, 通过管道交换请求和结果, 以请求序号代替输出文件的修改时间校验
+    def __dispatch_by_worker(self, input_info):
+        try:
+            used_seconds, response = self.__call_algorithm_worker(input_info)
+        except TimeoutError:
+            # 超时的常驻进程被终止, 由重新启动的常驻进程再派单一次, 超时的时间计入算法运行时间
+            logger.error(f"The algorithm worker did not respond within {Configs.MAX_RUNTIME_OF_ALGORITHM} seconds, "
+                         f"it is restarted.")
+            self.__kill_algorithm_worker()
+            try:
+                used_seconds, response = self.__call_algorithm_worker(input_info)
+            except TimeoutError:
+                logger.error("The restarted algorithm worker did not respond in time either.")
+                self.__kill_algorithm_worker()
+                sys.exit(-1)
+            used_seconds += Configs.MAX_RUNTIME_OF_ALGORITHM
+
+        if response is None:
+            logger.error("The algorithm worker exited unexpectedly.")
+            sys.exit(-1)
+        if response.get("seq") != self.algorithm_worker_seq:
+            logger.error(f"Sequence number of the response {response.get('seq')} does not match "
+                         f"the sequence number of the request {self.algorithm_worker_seq}.")
+            sys.exit(-1)
+        if response.get("flag") != Configs.ALGORITHM_SUCCESS_FLAG:
+            logger.error("Can not catch the 'SUCCESS' from the algorithm. 未寻获算法输出成功标识'SUCCESS'。")
+            sys.exit(-1)
+
+        vehicle_id_to_destination, vehicle_id_to_planned_route = get_output_of_algorithm_worker(response,
+                                                                                                self.id_to_order_item)
+        return used_seconds, DispatchResult(vehicle_id_to_destination, vehicle_id_to_planned_route)
+
+    # 向常驻进程发送派单请求, 必要时先启动常驻进程
+    def __call_algorithm_worker(self, input_info):
+        if self.algorithm_worker is None:
+            if not self.algorithm_calling_command:
+                self.algorithm_calling_command = get_algorithm_calling_command()
+            self.algorithm_worker = start_algorithm_worker(self.algorithm_calling_command)
+            if Configs.ALGORITHM_WORKER_EXCHANGE_FORMAT == COMPACT_FORMAT_NAME:
+                self.algorithm_worker_encoder = CompactStateEncoder()
+
+        self.algorithm_worker_seq += 1
+        return call_algorithm_worker(self.algorithm_worker, self.algorithm_worker_seq, input_info,
+                                     self.algorithm_worker_encoder)
+
+    # 终止算法常驻进程, 下一次派单时重新启动
+    def __kill_algorithm_worker(self):
+        kill_algorithm_worker(self.algorithm_worker)
+        self.algorithm_worker = None
+        self.algorithm_worker_encoder = None
+
+    # 关闭算法常驻进程
+    def stop_algorithm_worker(self):
+        if self.algorithm_worker is not None:
+            self.algorithm_worker_seq += 1
+            stop_algorithm_worker(self.algorithm_worker, self.algorithm_worker_seq)
+            self.algorithm_worker = None
+            self.algorithm_worker_encoder = None
+
+    # 进程内调用算法, 不经过文件和子进程
+    def __dispatch_in_process(self, input_info):
+        time_start_algorithm = time.time()
+        try:
+            dispatch_result = self.dispatcher(input_info)
+        except Exception as e:
+            logger.error(f"Failed to run the in-process algorithm, error: {e}, {traceback.format_exc()}")
+            sys.exit(-1)
+        used_seconds = time.time() - time_start_algorithm
+
+        # 与读取output json相同, 节点中的物料按编号关联到模拟器的物料
+        vehicle_id_to_destination, vehicle_id_to_planned_route = get_output_of_in_process_algorithm(
+            dispatch_result, self.id_to_order_item)
+        return used_seconds, DispatchResult(vehicle_id_to_destination, vehicle_id_to_planned_route)
+
     # 判断是否完成所有订单的派发
     def complete_the_dispatch_of_all_orders(self):
         for item in self.id_to_order_item.values():
@@ -262,6 +379,7 @@ class SimulateEnvironment(object):
         self.vehicle_simulator.run(id_to_vehicle, self.cur_time)
         self.history.add_history_of_vehicles(self.id_to_vehicle)
         self.history.add_history_of_order_items(self.id_to_vehicle)
+        self.score_tracker.update(self.history, self.cur_time)
 
     def deliver_control_command_to_vehicles(self, dispatch_result):
         vehicle_id_to_destination = dispatch_result.vehicle_id_to_destination
@@ -285,11 +403,10 @@ class SimulateEnvironment(object):
     # 检查当前是否有订单已经超时却依旧未分配
     def ignore_allocating_timeout_orders(self, dispatch_result):
         vehicle_id_to_item_list = get_item_list_of_vehicles(dispatch_result, self.id_to_vehicle)
-        total_item_ids_in_dispatch_result = []
+        total_item_ids_in_dispatch_result = set()
         for vehicle_id, item_list in vehicle_id_to_item_list.items():
             for item in item_list:
-                if item.id not in total_item_ids_in_dispatch_result:
-                    total_item_ids_in_dispatch_result.append(item.id)
+                total_item_ids_in_dispatch_result.add(item.id)
 
         for item_id, item in self.id_to_generated_order_item.items():
             if item_id not in total_item_ids_in_dispatch_result:
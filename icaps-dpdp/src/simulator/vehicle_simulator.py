@@ -18,17 +18,19 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE
 
+import bisect
 import datetime
 
 import simpy
 
 from src.conf.configs import Configs
+from src.simulator.event_engine import EventQueueEnvironment, DockResource
 from src.utils.logging_engine import logger
 
 
 class VehicleSimulator(object):
     def __init__(self, route_map, id_to_factory):
-        self.env = simpy.Environment()
+        self.env = None
         self.factory_id_to_dock_resource = {}
 
         self.route_map = route_map
@@ -40,30 +42,203 @@ class VehicleSimulator(object):
         self.vehicle_id_to_cur_position_info = {}
         self.vehicle_id_to_carrying_items = {}
 
+        # 上一次仿真中各车辆的输入签名和不等待货口时的时间线, 输入未变化的车辆直接复用
+        # input signature of each vehicle in the last run -> its timeline without waiting for docks
+        self.signature_to_timeline = {}
+
     def __ini_dock_resources_of_factories(self, id_to_factory: dict):
         self.factory_id_to_dock_resource = {}
         for factory_id, factory in id_to_factory.items():
-            self.factory_id_to_dock_resource[factory_id] = simpy.Resource(self.env, capacity=factory.dock_num)
+            if Configs.SIMULATION_ENGINE == 'simpy':
+                self.factory_id_to_dock_resource[factory_id] = simpy.Resource(self.env, capacity=factory.dock_num)
+            else:
+                self.factory_id_to_dock_resource[factory_id] = DockResource(self.env, capacity=factory.dock_num)
 
     def run(self, id_to_vehicle: dict, from_time: int):
         """
         :param id_to_vehicle:  total vehicles
         :param from_time: unit is second, start time of the simulator
         """
+        # sort_vehicles
+        sorted_vehicles = self.__sort_vehicles(id_to_vehicle, from_time)
+
+        if not Configs.INCREMENTAL_SIMULATION:
+            self.__simulate(sorted_vehicles, from_time)
+            return
+
+        # 增量仿真: 先取各车辆不等待货口时的时间线(输入未变化的车辆复用上一次的结果),
+        # 只有途经可能排队的货口的车辆才重新仿真, 直到其余车辆都不会与它们争用货口
+        # incremental simulation, only the vehicles passing through congested docks are simulated
+        vehicle_id_to_timeline = self.__get_free_flow_timelines(sorted_vehicles, from_time)
+
+        simulated_vehicle_ids = set()
+        vehicle_ids_to_simulate = self.__get_vehicle_ids_at_congested_docks(sorted_vehicles, vehicle_id_to_timeline,
+                                                                            simulated_vehicle_ids, from_time)
+        while len(vehicle_ids_to_simulate) > 0:
+            simulated_vehicle_ids.update(vehicle_ids_to_simulate)
+            # 保持原有的车辆顺序, 事件的先后次序才与整体仿真一致
+            self.__simulate([vehicle for vehicle in sorted_vehicles if vehicle.id in simulated_vehicle_ids], from_time)
+            vehicle_ids_to_simulate = self.__get_vehicle_ids_at_congested_docks(sorted_vehicles,
+                                                                                vehicle_id_to_timeline,
+                                                                                simulated_vehicle_ids, from_time)
+
+        for vehicle in sorted_vehicles:
+            if vehicle.id not in simulated_vehicle_ids:
+                self.__set_timeline(vehicle, vehicle_id_to_timeline.get(vehicle.id))
+
+    def __simulate(self, sorted_vehicles: list, from_time: int):
         # 初始化仿真环境, initial the simulation environment
-        self.env = simpy.rt.RealtimeEnvironment(initial_time=from_time, factor=0.000000000001, strict=False)
+        if Configs.SIMULATION_ENGINE == 'simpy':
+            self.env = simpy.rt.RealtimeEnvironment(initial_time=from_time, factor=0.000000000001, strict=False)
+        else:
+            self.env = EventQueueEnvironment(initial_time=from_time)
 
         # 初始化各工厂的货口资源, initial the port resource of each factory
         self.__ini_dock_resources_of_factories(self.id_to_factory)
 
-        # sort_vehicles
-        sorted_vehicles = self.__sort_vehicles(id_to_vehicle, from_time)
-
         # Each vehicle starts to visit its route
         for vehicle in sorted_vehicles:
             self.env.process(self.work(vehicle))
         self.env.run()
 
+    def __get_free_flow_timelines(self, sorted_vehicles: list, from_time: int):
+        """
+        车辆不等待货口时, 其时间线只取决于自身的输入, 按输入签名缓存并在相邻两次仿真间复用
+        Timelines of the vehicles without waiting for docks, cached by the input signature between two runs
+        """
+        last_signature_to_timeline = self.signature_to_timeline
+        self.signature_to_timeline = {}
+
+        vehicle_id_to_timeline = {}
+        for vehicle in sorted_vehicles:
+            signature = self.__get_simulation_signature(vehicle, from_time)
+            timeline = last_signature_to_timeline.get(signature)
+            if timeline is None:
+                timeline = self.__get_free_flow_timeline(vehicle, from_time)
+            self.signature_to_timeline[signature] = timeline
+            vehicle_id_to_timeline[vehicle.id] = timeline
+        return vehicle_id_to_timeline
+
+    def __get_free_flow_timeline(self, vehicle, from_time: int):
+        """与self.work相同的计算, 但不等待货口, same arithmetic as self.work without waiting for docks"""
+        leave_time_at_current_factory = vehicle.leave_time_at_current_factory
+        cur_factory_id = vehicle.cur_factory_id
+        if len(cur_factory_id) > 0 and leave_time_at_current_factory <= from_time:
+            leave_time_at_current_factory = from_time
+
+        if vehicle.destination is None:
+            return leave_time_at_current_factory, None, []
+
+        # 时间的计算次序与self.work中事件的时间一致, 结果的数值和类型都相同
+        # same operations as the timeouts in self.work, so that both the values and the types are identical
+        if len(cur_factory_id) > 0:
+            cur_time = from_time + (leave_time_at_current_factory - from_time)
+            cur_time += self.route_map.calculate_transport_time_between_factories(cur_factory_id,
+                                                                                  vehicle.destination.id)
+        else:
+            arr_time = vehicle.destination.arrive_time
+            cur_time = from_time + (arr_time - from_time) if arr_time >= from_time else from_time
+
+        destination_arrive_time = cur_time
+        cur_time += vehicle.destination.service_time + Configs.DOCK_APPROACHING_TIME
+        destination_times = (destination_arrive_time, cur_time)
+
+        node_times = []
+        cur_factory_id = vehicle.destination.id
+        for node in vehicle.planned_route:
+            cur_time += self.route_map.calculate_transport_time_between_factories(cur_factory_id, node.id)
+            arr_time = cur_time
+            cur_time += node.service_time + Configs.DOCK_APPROACHING_TIME
+            node_times.append((arr_time, cur_time))
+            cur_factory_id = node.id
+
+        return leave_time_at_current_factory, destination_times, node_times
+
+    def __get_vehicle_ids_at_congested_docks(self, sorted_vehicles: list, vehicle_id_to_timeline: dict,
+                                             simulated_vehicle_ids: set, from_time: int):
+        """
+        货口上有未仿真的车辆时, 要求每次请求货口时其他车辆占用该货口的时间段(含端点)个数小于货口数,
+        即没有车辆排队, 否则返回该货口上未仿真的车辆. 只有已仿真车辆的货口, 其排队过程已由仿真得到.
+        At a dock visited by vehicles using the free-flow timelines, the number of other occupying intervals (end
+        points included, so that the order of simultaneous events does not matter) has to be less than the dock number
+        at each request, otherwise these vehicles are returned to be simulated as well.
+        """
+        factory_id_to_intervals = {}
+        for vehicle in sorted_vehicles:
+            if vehicle.id in simulated_vehicle_ids:
+                timeline = self.__get_timeline(vehicle)
+            else:
+                timeline = vehicle_id_to_timeline.get(vehicle.id)
+            leave_time_at_current_factory, destination_times, node_times = timeline
+
+            intervals = []
+            if len(vehicle.cur_factory_id) > 0 and leave_time_at_current_factory > from_time:
+                intervals.append((vehicle.cur_factory_id, from_time, leave_time_at_current_factory))
+            if destination_times is not None:
+                intervals.append((vehicle.destination.id,) + destination_times)
+                intervals.extend((node.id,) + times for node, times in zip(vehicle.planned_route, node_times))
+            for factory_id, start_time, end_time in intervals:
+                factory_id_to_intervals.setdefault(factory_id, []).append((start_time, end_time, vehicle.id))
+
+        vehicle_ids_to_simulate = set()
+        for factory_id, intervals in factory_id_to_intervals.items():
+            if len(intervals) <= self.id_to_factory.get(factory_id).dock_num:
+                continue
+            free_flow_vehicle_ids = {interval[2] for interval in intervals} - simulated_vehicle_ids
+            if len(free_flow_vehicle_ids) > 0 and self.__is_congested(intervals,
+                                                                      self.id_to_factory.get(factory_id).dock_num):
+                vehicle_ids_to_simulate.update(free_flow_vehicle_ids)
+        return vehicle_ids_to_simulate
+
+    @staticmethod
+    def __is_congested(intervals: list, dock_num: int):
+        start_times = sorted(interval[0] for interval in intervals)
+        end_times = sorted(interval[1] for interval in intervals)
+        for start_time, _, _ in intervals:
+            occupied_num = bisect.bisect_right(start_times, start_time) - bisect.bisect_left(end_times, start_time)
+            # 减去自身的时间段, excluding the interval itself
+            if occupied_num - 1 >= dock_num:
+                return True
+        return False
+
+    @staticmethod
+    def __get_simulation_signature(vehicle, from_time: int):
+        """仿真过程实际用到的车辆输入, the inputs of self.work(vehicle)"""
+        if len(vehicle.cur_factory_id) > 0:
+            if vehicle.leave_time_at_current_factory > from_time:
+                position = (vehicle.cur_factory_id, vehicle.leave_time_at_current_factory)
+            else:
+                # 停车状态从仿真开始时刻出发, a parked vehicle leaves at the start time
+                position = (vehicle.cur_factory_id, from_time)
+        elif vehicle.destination is not None:
+            position = ("", max(vehicle.destination.arrive_time, from_time))
+        else:
+            position = ("", from_time)
+
+        destination = None
+        if vehicle.destination is not None:
+            destination = (vehicle.destination.id, vehicle.destination.service_time)
+
+        route = tuple((node.id, node.service_time) for node in vehicle.planned_route)
+        return vehicle.id, position, destination, route
+
+    @staticmethod
+    def __get_timeline(vehicle):
+        destination_times = None
+        if vehicle.destination is not None:
+            destination_times = (vehicle.destination.arrive_time, vehicle.destination.leave_time)
+        return (vehicle.leave_time_at_current_factory, destination_times,
+                [(node.arrive_time, node.leave_time) for node in vehicle.planned_route])
+
+    @staticmethod
+    def __set_timeline(vehicle, timeline):
+        vehicle.leave_time_at_current_factory, destination_times, node_times = timeline
+        if destination_times is not None:
+            vehicle.destination.arrive_time, vehicle.destination.leave_time = destination_times
+        for node, (arrive_time, leave_time) in zip(vehicle.planned_route, node_times):
+            node.arrive_time = arrive_time
+            node.leave_time = leave_time
+
     # Visiting process of each vehicle
     def work(self, vehicle):
         cur_factory_id = vehicle.cur_factory_id
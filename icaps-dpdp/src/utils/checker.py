@@ -18,10 +18,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE
 
-import copy
-
 from src.utils.logging_engine import logger
-from src.utils.tools import get_item_list_of_vehicles
 
 
 class Checker(object):
@@ -41,6 +38,12 @@ class Checker(object):
                          f"is not equal to vehicle number {len(id_to_vehicle)}")
             return False
 
+        # 订单到装载其货物的车辆, order id -> ids of the vehicles carrying or picking up its items
+        order_id_to_vehicle_ids = {}
+        # 同一车辆在多个节点装货的订单, orders picked up at several nodes of the same vehicle
+        split_order_ids_in_routes = []
+        capacity = 0
+
         # 逐个检查各车辆路径
         for vehicle_id, vehicle in id_to_vehicle.items():
             if vehicle_id not in vehicle_id_to_destination:
@@ -63,30 +66,18 @@ class Checker(object):
                 route.append(destination_in_result)
             route.extend(vehicle_id_to_planned_route.get(vehicle_id))
 
-            if len(route) > 0:
-                # check capacity
-                if not Checker.__meet_capacity_constraint(route, copy.deepcopy(vehicle.carrying_items),
-                                                          vehicle.board_capacity):
-                    logger.error(f"Vehicle {vehicle_id} violates the capacity constraint")
-                    return False
-
-                # check LIFO
-                if not Checker.__meet_loading_and_unloading_constraint(route, copy.deepcopy(vehicle.carrying_items)):
-                    logger.error(f"Vehicle {vehicle_id} violates the LIFO constraint")
-                    return False
-
-                # check adjacent-duplicated nodes
-                Checker.__contain_duplicated_nodes(vehicle_id, route)
-
-                # check duplicated item id
-                if Checker.__contain_duplicate_items(route, copy.deepcopy(vehicle.carrying_items)):
-                    return False
-
-                if not Checker.__do_pickup_and_delivery_items_match_the_node(route):
-                    return False
+            capacity = vehicle.board_capacity
+            if not Checker.__check_vehicle_route(vehicle_id, vehicle, route, order_id_to_vehicle_ids,
+                                                 split_order_ids_in_routes):
+                return False
 
         # check order splitting
-        if not Checker.__meet_order_splitting_constraint(dispatch_result, id_to_vehicle, id_to_order):
+        split_order_ids = [order_id for order_id, vehicle_ids in order_id_to_vehicle_ids.items()
+                           if len(vehicle_ids) > 1]
+        logger.debug(f"Find {len(split_order_ids)} split orders from vehicles, "
+                     f"{len(split_order_ids_in_routes)} split orders in vehicle routes")
+        split_order_ids.extend(split_order_ids_in_routes)
+        if not Checker.__meet_order_splitting_constraint(split_order_ids, id_to_order, capacity):
             return False
 
         return True
@@ -118,170 +109,120 @@ class Checker(object):
 
         return True
 
-    # 载重约束
     @staticmethod
-    def __meet_capacity_constraint(route: list, carrying_items, capacity):
+    def __check_vehicle_route(vehicle_id, vehicle, route: list, order_id_to_vehicle_ids: dict,
+                              split_order_ids: list):
+        """
+        单次遍历车上货物和路径, 同时检查载重约束, LIFO约束, 相邻重复节点, 重复货物, 装卸货工厂, 并记录订单拆分
+        One pass over the carrying items and the route checking the capacity, LIFO, adjacent-duplicated nodes,
+        duplicate items and the factories of the items, and collecting the orders for the order splitting check.
+        The violations are reported in the order of the checks: capacity, LIFO, duplicate items, factories.
+        :param order_id_to_vehicle_ids: 更新, the vehicle is added to the orders of its items
+        :param split_order_ids: 更新, the orders picked up at several nodes of the route (or already carried) are added
+        """
+        capacity = vehicle.board_capacity
         left_capacity = capacity
-
-        # Stack
-        while not carrying_items.is_empty():
-            item = carrying_items.pop()
+        capacity_error = None
+        # 货物栈的浅拷贝, 栈顶在末尾, shallow copy of the stack of the carrying items, the top is the last one
+        carrying_items = list(vehicle.carrying_items.bottom_up())
+        meet_lifo = True
+        duplicate_item_id = None
+        factory_error = None
+        contain_duplicated_nodes = False
+        item_ids = set()
+        order_ids = set()
+
+        def add_order(order_id):
+            if order_id not in order_ids:
+                order_ids.add(order_id)
+                order_id_to_vehicle_ids.setdefault(order_id, []).append(vehicle_id)
+
+        # 车上货物, 按卸货顺序, the carrying items in the unloading order
+        for item in reversed(carrying_items):
             left_capacity -= item.demand
-            if left_capacity < 0:
-                logger.error(f"left capacity {left_capacity} < 0")
-                return False
+            if capacity_error is None and left_capacity < 0:
+                capacity_error = f"left capacity {left_capacity} < 0"
+            if item.id in item_ids:
+                if duplicate_item_id is None:
+                    duplicate_item_id = item.id
+            else:
+                item_ids.add(item.id)
+                add_order(item.order_id)
 
+        pre_factory_id = None
         for node in route:
-            delivery_items = node.delivery_items
-            pickup_items = node.pickup_items
-            for item in delivery_items:
-                left_capacity += item.demand
-                if left_capacity > capacity:
-                    logger.error(f"left capacity {left_capacity} > capacity {capacity}")
-                    return False
+            factory_id = node.id
+            if factory_id == pre_factory_id:
+                contain_duplicated_nodes = True
+            pre_factory_id = factory_id
 
-            for item in pickup_items:
+            for item in node.delivery_items:
+                left_capacity += item.demand
+                if capacity_error is None and left_capacity > capacity:
+                    capacity_error = f"left capacity {left_capacity} > capacity {capacity}"
+                if meet_lifo and (len(carrying_items) == 0 or carrying_items.pop().id != item.id):
+                    meet_lifo = False
+                if factory_error is None and item.delivery_factory_id != factory_id:
+                    factory_error = (f"Delivery factory of item {item.id} is {item.delivery_factory_id}, "
+                                     f"however you allocate the vehicle to delivery this item in {factory_id}")
+
+            node_order_ids = {}
+            for item in node.pickup_items:
                 left_capacity -= item.demand
-                if left_capacity < 0:
-                    logger.error(f"left capacity {left_capacity} < 0")
-                    return False
-        return True
-
-    # LIFO约束
-    @staticmethod
-    def __meet_loading_and_unloading_constraint(route: list, carrying_items):
-        for node in route:
-            delivery_items = node.delivery_items
-            pickup_items = node.pickup_items
-            for item in delivery_items:
-                unload_item = carrying_items.pop()
-                if unload_item is None or unload_item.id != item.id:
-                    return False
+                if capacity_error is None and left_capacity < 0:
+                    capacity_error = f"left capacity {left_capacity} < 0"
+                carrying_items.append(item)
+                if item.id in item_ids:
+                    if duplicate_item_id is None:
+                        duplicate_item_id = item.id
+                else:
+                    item_ids.add(item.id)
+                if factory_error is None and item.pickup_factory_id != factory_id:
+                    factory_error = (f"Pickup factory of item {item.id} is {item.pickup_factory_id}, "
+                                     f"however you allocate the vehicle to pickup this item in {factory_id}")
+                node_order_ids[item.order_id] = True
+
+            for order_id in node_order_ids:
+                if order_id in order_ids:
+                    split_order_ids.append(order_id)
+                else:
+                    add_order(order_id)
 
-            for item in pickup_items:
-                carrying_items.push(item)
+        if len(route) == 0:
+            return True
 
-        return carrying_items.is_empty()
+        # 载重约束, capacity
+        if capacity_error is not None:
+            logger.error(capacity_error)
+            logger.error(f"Vehicle {vehicle_id} violates the capacity constraint")
+            return False
 
-    # 检查相邻的节点是否重复，并警告，鼓励把相邻重复节点进行合并
-    @staticmethod
-    def __contain_duplicated_nodes(vehicle_id, route):
-        for n in range(len(route) - 1):
-            if route[n].id == route[n + 1].id:
-                logger.warning(f"{vehicle_id} has adjacent-duplicated nodes which are encouraged to be combined in one.")
+        # LIFO约束
+        if not meet_lifo or len(carrying_items) > 0:
+            logger.error(f"Vehicle {vehicle_id} violates the LIFO constraint")
+            return False
 
-    @staticmethod
-    def __contain_duplicate_items(route, carrying_items):
-        item_id_list = []
-        while not carrying_items.is_empty():
-            item = carrying_items.pop()
-            if item.id not in item_id_list:
-                item_id_list.append(item.id)
-            else:
-                logger.error(f"Item {item.id}: duplicate item id")
-                return True
+        # 检查相邻的节点是否重复，并警告，鼓励把相邻重复节点进行合并
+        if contain_duplicated_nodes:
+            logger.warning(f"{vehicle_id} has adjacent-duplicated nodes which are encouraged to be combined in one.")
 
-        for node in route:
-            pickup_items = node.pickup_items
-            for item in pickup_items:
-                if item.id not in item_id_list:
-                    item_id_list.append(item.id)
-                else:
-                    logger.error(f"Item {item.id}: duplicate item id")
-                    return True
-        return False
+        # 重复货物, duplicate item id
+        if duplicate_item_id is not None:
+            logger.error(f"Item {duplicate_item_id}: duplicate item id")
+            return False
 
-    @staticmethod
-    def __do_pickup_and_delivery_items_match_the_node(route: list):
-        for node in route:
-            factory_id = node.id
-            pickup_items = node.pickup_items
-            for item in pickup_items:
-                if item.pickup_factory_id != factory_id:
-                    logger.error(f"Pickup factory of item {item.id} is {item.pickup_factory_id}, "
-                                 f"however you allocate the vehicle to pickup this item in {factory_id}")
-                    return False
-            delivery_items = node.delivery_items
-            for item in delivery_items:
-                if item.delivery_factory_id != factory_id:
-                    logger.error(f"Delivery factory of item {item.id} is {item.delivery_factory_id}, "
-                                 f"however you allocate the vehicle to delivery this item in {factory_id}")
-                    return False
+        # 装卸货工厂, the pickup and delivery factories of the items
+        if factory_error is not None:
+            logger.error(factory_error)
+            return False
         return True
 
     @staticmethod
-    def __meet_order_splitting_constraint(dispatch_result, id_to_vehicle: dict, id_to_order: dict):
-        vehicle_id_to_destination = dispatch_result.vehicle_id_to_destination
-        vehicle_id_to_planned_route = dispatch_result.vehicle_id_to_planned_route
-
-        vehicle_id_to_item_list = get_item_list_of_vehicles(dispatch_result, id_to_vehicle)
-
-        capacity = 0
-        split_order_id_list = Checker.__find_split_orders_from_vehicles(vehicle_id_to_item_list)
-
-        for vehicle_id, vehicle in id_to_vehicle.items():
-            logger.debug(f"Find split orders of vehicle {vehicle_id}")
-
-            capacity = vehicle.board_capacity
-            carrying_items = copy.deepcopy(vehicle.carrying_items)
-            route = []
-            if vehicle_id in vehicle_id_to_destination and vehicle_id_to_destination.get(vehicle_id) is not None:
-                route.append(vehicle_id_to_destination.get(vehicle_id))
-            if vehicle_id in vehicle_id_to_planned_route:
-                route.extend(vehicle_id_to_planned_route.get(vehicle_id))
-            split_order_id_list.extend(Checker.__find_split_orders_in_vehicle_routes(route, carrying_items))
-
-        for order_id in split_order_id_list:
+    def __meet_order_splitting_constraint(split_order_ids: list, id_to_order: dict, capacity):
+        for order_id in split_order_ids:
             if order_id in id_to_order:
                 order = id_to_order.get(order_id)
                 if order.demand <= capacity:
                     logger.error(f"order {order.id} demand: {order.demand} <= {capacity}, we can not split this order.")
                     return False
         return True
-
-    @staticmethod
-    def __find_split_orders_from_vehicles(vehicle_id_to_item_list: dict):
-        order_id_to_vehicle_ids = {}
-        for vehicle_id, item_list in vehicle_id_to_item_list.items():
-            order_id_list = []
-            for item in item_list:
-                order_id = item.order_id
-                if order_id not in order_id_list:
-                    order_id_list.append(order_id)
-            logger.debug(f"Vehicle {vehicle_id} contains {len(order_id_list)} orders, {len(item_list)} order items")
-
-            for order_id in order_id_list:
-                if order_id not in order_id_to_vehicle_ids:
-                    order_id_to_vehicle_ids[order_id] = []
-                order_id_to_vehicle_ids[order_id].append(vehicle_id)
-
-        split_order_ids = []
-        for order_id, vehicle_ids in order_id_to_vehicle_ids.items():
-            if len(vehicle_ids) > 1:
-                split_order_ids.append(order_id)
-        logger.debug(f"Find {len(split_order_ids)} split orders from vehicles")
-        return split_order_ids
-
-    @staticmethod
-    def __find_split_orders_in_vehicle_routes(route, carrying_items):
-        order_id_list = []
-        split_order_ids = []
-        while not carrying_items.is_empty():
-            item = carrying_items.pop()
-            order_id = item.order_id
-            if order_id not in order_id_list:
-                order_id_list.append(order_id)
-
-        for node in route:
-            tmp_order_id_list = []
-            pickup_items = node.pickup_items
-            for item in pickup_items:
-                if item.order_id not in tmp_order_id_list:
-                    tmp_order_id_list.append(item.order_id)
-            for order_id in tmp_order_id_list:
-                if order_id not in order_id_list:
-                    order_id_list.append(order_id)
-                else:
-                    split_order_ids.append(order_id)
-        logger.debug(f"find {len(split_order_ids)} split orders")
-        return split_order_ids
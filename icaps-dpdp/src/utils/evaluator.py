@@ -20,6 +20,8 @@
 
 import sys
 
+import numpy as np
+
 from src.utils.logging_engine import logger
 from src.conf.configs import Configs
 
@@ -29,83 +31,199 @@ class Evaluator(object):
     # 多目标处理方式：距离增加量与超时量加权求和
     @staticmethod
     def calculate_total_score(history, route_map, vehicle_num: int):
-        total_distance = Evaluator.calculate_total_distance(history.get_vehicle_position_history(), route_map)
+        total_distance = Evaluator.calculate_total_distance(history, route_map)
         logger.info(f"Total distance: {total_distance: .3f}")
-        total_over_time = Evaluator.calculate_total_over_time(history.get_order_item_status_history())
+        total_over_time = Evaluator.calculate_total_over_time(history)
         logger.info(f"Sum over time: {total_over_time: .3f}")
         total_score = total_distance / vehicle_num + total_over_time * Configs.LAMDA / 3600
         logger.info(f"Total score: {total_score: .3f}")
         return total_score
 
     @staticmethod
-    def calculate_total_distance(vehicle_id_to_node_list: dict, route_map):
+    def calculate_total_distance(history, route_map):
         total_distance = 0
-        if not vehicle_id_to_node_list:
+        if len(history.vehicle_ids) == 0:
             return total_distance
 
-        for vehicle_id, nodes in vehicle_id_to_node_list.items():
-            travel_factory_list = []
-            for node in nodes:
-                travel_factory_list.append(node['factory_id'])
-            distance = calculate_traveling_distance_of_routes(travel_factory_list, route_map)
+        vehicle_indexes, factory_indexes, _ = history.get_vehicle_position_columns()
+        # 按车辆分组(保持每辆车的记录顺序), group the visited factories by vehicle keeping their order
+        order = np.argsort(vehicle_indexes, kind="stable")
+        vehicle_indexes = vehicle_indexes[order]
+        factory_indexes = route_map.get_factory_indexes(history.factory_ids)[factory_indexes[order]]
+
+        # 同一辆车相邻两次访问之间的距离, distances of the hops between consecutive visits of the same vehicle
+        same_vehicle_hops = np.nonzero(vehicle_indexes[:-1] == vehicle_indexes[1:])[0]
+        hop_distances = np.zeros(max(len(factory_indexes) - 1, 0), dtype=float)
+        hop_distances[same_vehicle_hops] = route_map.calculate_distances_between(factory_indexes[same_vehicle_hops],
+                                                                                 factory_indexes[same_vehicle_hops + 1])
+        vehicle_num = len(history.vehicle_ids)
+        distances = np.bincount(vehicle_indexes[1:], weights=hop_distances, minlength=vehicle_num)
+        visit_nums = np.bincount(vehicle_indexes, minlength=vehicle_num)
+
+        for vehicle_id, distance, visit_num in zip(history.vehicle_ids, distances.tolist(), visit_nums.tolist()):
             total_distance += distance
             logger.info(f"Traveling Distance of Vehicle {vehicle_id} is {distance: .3f}, "
-                        f"visited node list: {len(travel_factory_list)}")
+                        f"visited node list: {visit_num}")
         return total_distance
 
     @staticmethod
-    def calculate_total_over_time(item_id_to_status_list: dict):
-        total_over_time = 0
-
-        order_id_to_item_id_list = {}
-        item_id_to_complete_time = {}
-        order_id_to_committed_completion_time = {}
-        failure_flag = False
-        for item_id, status_info_list in item_id_to_status_list.items():
-            selected_status_info_list = [status_info for status_info in status_info_list
-                                         if status_info["state"] == Configs.ORDER_STATUS_TO_CODE.get("COMPLETED")]
-
-            if len(selected_status_info_list) == 0:
-                logger.error(f"Item {item_id} has no history of completion status")
-                failure_flag = True
-                continue
-
-            selected_status_info_list.sort(key=lambda x: x["update_time"])
-            item_id_to_complete_time[item_id] = selected_status_info_list[0].get("update_time")
-
-            order_id = selected_status_info_list[0].get("order_id")
-            if order_id not in order_id_to_item_id_list:
-                order_id_to_item_id_list[order_id] = []
-            order_id_to_item_id_list[order_id].append(item_id)
-            if order_id not in order_id_to_committed_completion_time:
-                order_id_to_committed_completion_time[order_id] = selected_status_info_list[0].get(
-                    "committed_completion_time")
-
-        if failure_flag:
+    def calculate_total_over_time(history):
+        item_indexes, states, update_times, order_indexes = history.get_order_item_status_columns()
+        item_num = len(history.item_ids)
+        order_num = len(history.order_ids)
+
+        # 每个货物的最早完成时间, earliest completion time of each item
+        completed = states == Configs.ORDER_STATUS_TO_CODE.get("COMPLETED")
+        item_complete_times = np.full(item_num, np.inf)
+        np.minimum.at(item_complete_times, item_indexes[completed], update_times[completed])
+
+        missing_items = np.nonzero(np.isinf(item_complete_times))[0]
+        for item_index in missing_items.tolist():
+            logger.error(f"Item {history.item_ids[item_index]} has no history of completion status")
+        if len(missing_items) > 0:
             return sys.maxsize
 
-        for order_id, item_id_list in order_id_to_item_id_list.items():
-            latest_arr_time = -1
-            for item_id in item_id_list:
-                if item_id in item_id_to_complete_time:
-                    completion_time = item_id_to_complete_time.get(item_id)
-                    if completion_time > latest_arr_time:
-                        latest_arr_time = completion_time
-
-            committed_completion_time = order_id_to_committed_completion_time.get(order_id)
-            over_time = latest_arr_time - committed_completion_time
-            if over_time > 0:
-                total_over_time += over_time
+        # 每个订单最晚完成的货物, latest completion time of the items of each order
+        item_order_indexes = np.zeros(item_num, dtype=np.int64)
+        item_order_indexes[item_indexes] = order_indexes
+        order_complete_times = np.full(order_num, -1.0)
+        np.maximum.at(order_complete_times, item_order_indexes, item_complete_times)
 
+        over_times = order_complete_times - np.frombuffer(history.order_committed_completion_times, dtype=np.float64)
+        # 按订单顺序累加, accumulated order by order as before
+        total_over_time = sum(over_times[over_times > 0].tolist(), 0)
         return total_over_time
 
 
+# 在线评价器, 每个时间片根据新增的历史记录更新行驶距离和超时量
+class ScoreTracker(object):
+    """
+    Streaming evaluator: after each epoch the events added to the History since the previous update are consumed to
+    update the running distance and over time, and a point of the score timeline is recorded.
+    The running score is a lower bound of the final score: the distance only grows, the over time of the completed
+    orders is final, and the orders still open after their committed completion time are at least late until now.
+    At the end of the simulation it equals the score of Evaluator.calculate_total_score (up to the summation order).
+    """
+
+    def __init__(self, route_map, vehicle_num: int):
+        self.route_map = route_map
+        self.vehicle_num = vehicle_num
+
+        # 行驶距离, distance traveled so far
+        self.total_distance = 0
+        # 已完成订单的超时量, over time of the completed orders
+        self.total_over_time = 0
+        # 未完成订单至今的超时量, over time until now of the open orders after their committed completion time
+        self.pending_over_time = 0
+        # 每个时间片的分数, score timeline: one dict per update
+        self.timeline = []
+
+        # 已处理的记录数, number of the events of the history already consumed
+        self.__vehicle_event_num = 0
+        self.__item_event_num = 0
+        # 历史记录中的工厂下标到地图下标, factory indexes of the history to the factory indexes of the route map
+        self.__factory_indexes = np.empty(0, dtype=np.int64)
+        # 车辆最后所在工厂(地图下标), last factory of the vehicles (index of the route map), -1 if none
+        self.__last_factory_indexes = np.empty(0, dtype=np.int64)
+        # 货物所属订单及最早完成时间, order index and earliest completion time of the items
+        self.__item_order_indexes = np.empty(0, dtype=np.int64)
+        self.__item_complete_times = np.empty(0, dtype=float)
+
+    @property
+    def score(self):
+        return self.timeline[-1]["score"] if self.timeline else 0
+
+    def update(self, history, cur_time):
+        """
+        :param history: 历史记录, History of the simulator
+        :param cur_time: 当前时间, unix timestamp of the end of the epoch
+        :return: 当前分数, the running score
+        """
+        self.__update_distance(history)
+        self.__update_over_time(history, cur_time)
+        score = (self.total_distance / self.vehicle_num
+                 + (self.total_over_time + self.pending_over_time) * Configs.LAMDA / 3600)
+        self.timeline.append({"time": cur_time,
+                              "total_distance": self.total_distance,
+                              "total_over_time": self.total_over_time,
+                              "pending_over_time": self.pending_over_time,
+                              "score": score})
+        logger.info(f"Running score: {score: .3f}, distance: {self.total_distance: .3f}, "
+                    f"over time: {self.total_over_time: .3f}, pending over time: {self.pending_over_time: .3f}")
+        return score
+
+    @staticmethod
+    def __grow(values, size: int, fill_value):
+        if len(values) >= size:
+            return values
+        return np.concatenate((values, np.full(size - len(values), fill_value, dtype=values.dtype)))
+
+    def __update_distance(self, history):
+        vehicle_indexes, factory_indexes, _ = history.get_vehicle_position_columns()
+        vehicle_indexes = vehicle_indexes[self.__vehicle_event_num:]
+        factory_indexes = factory_indexes[self.__vehicle_event_num:]
+        self.__vehicle_event_num += len(vehicle_indexes)
+
+        if len(self.__factory_indexes) < len(history.factory_ids):
+            self.__factory_indexes = np.concatenate((self.__factory_indexes, self.route_map.get_factory_indexes(
+                history.factory_ids[len(self.__factory_indexes):])))
+        self.__last_factory_indexes = self.__grow(self.__last_factory_indexes, len(history.vehicle_ids), -1)
+        if len(vehicle_indexes) == 0:
+            return
+
+        # 按车辆分组, 每组第一个记录接在该车辆上次所在的工厂之后
+        # group the new events by vehicle, the first event of a group follows the last factory of the vehicle
+        order = np.argsort(vehicle_indexes, kind="stable")
+        vehicle_indexes = vehicle_indexes[order]
+        factory_indexes = self.__factory_indexes[factory_indexes[order]]
+        group_starts = np.concatenate(([True], vehicle_indexes[1:] != vehicle_indexes[:-1]))
+        group_ends = np.concatenate((vehicle_indexes[1:] != vehicle_indexes[:-1], [True]))
+        pre_factory_indexes = np.where(group_starts, self.__last_factory_indexes[vehicle_indexes],
+                                       np.concatenate(([-1], factory_indexes[:-1])))
+
+        hops = pre_factory_indexes >= 0
+        if np.any(hops):
+            self.total_distance += self.route_map.calculate_distances_between(pre_factory_indexes[hops],
+                                                                              factory_indexes[hops]).sum().item()
+        self.__last_factory_indexes[vehicle_indexes[group_ends]] = factory_indexes[group_ends]
+
+    def __update_over_time(self, history, cur_time):
+        item_indexes, states, update_times, order_indexes = history.get_order_item_status_columns()
+        item_indexes = item_indexes[self.__item_event_num:]
+        states = states[self.__item_event_num:]
+        update_times = update_times[self.__item_event_num:]
+        order_indexes = order_indexes[self.__item_event_num:]
+        self.__item_event_num += len(item_indexes)
+
+        self.__item_order_indexes = self.__grow(self.__item_order_indexes, len(history.item_ids), -1)
+        self.__item_complete_times = self.__grow(self.__item_complete_times, len(history.item_ids), np.inf)
+        self.__item_order_indexes[item_indexes] = order_indexes
+        completed = states == Configs.ORDER_STATUS_TO_CODE.get("COMPLETED")
+        np.minimum.at(self.__item_complete_times, item_indexes[completed], update_times[completed])
+
+        # 订单的货物数, 已完成货物数及最晚完成时间, items, completed items and latest completion time of the orders
+        order_num = len(history.order_ids)
+        known_items = self.__item_order_indexes >= 0
+        done_items = np.isfinite(self.__item_complete_times)
+        item_nums = np.bincount(self.__item_order_indexes[known_items], minlength=order_num)
+        completed_item_nums = np.bincount(self.__item_order_indexes[done_items], minlength=order_num)
+        order_complete_times = np.full(order_num, -1.0)
+        np.maximum.at(order_complete_times, self.__item_order_indexes[done_items], self.__item_complete_times[done_items])
+
+        committed_completion_times = np.frombuffer(history.order_committed_completion_times, dtype=np.float64)
+        complete_orders = completed_item_nums == item_nums
+        over_times = order_complete_times - committed_completion_times
+        self.total_over_time = over_times[complete_orders & (over_times > 0)].sum().item()
+        pending_over_times = np.maximum(order_complete_times, cur_time) - committed_completion_times
+        self.pending_over_time = pending_over_times[~complete_orders & (pending_over_times > 0)].sum().item()
+
+
 def calculate_traveling_distance_of_routes(factory_id_list, route_map):
     travel_distance = 0
     if len(factory_id_list) <= 1:
         return travel_distance
 
-    for index in range(len(factory_id_list) - 1):
-        travel_distance += route_map.calculate_distance_between_factories(factory_id_list[index],
-                                                                          factory_id_list[index + 1])
+    distances = route_map.calculate_distances_of_route(route_map.get_factory_indexes(factory_id_list))
+    # 按顺序累加, 与逐段相加的结果一致, accumulated in order as the hop-by-hop sum
+    travel_distance += np.cumsum(distances)[-1].item()
     return travel_distance
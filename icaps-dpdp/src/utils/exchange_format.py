@@ -0,0 +1,257 @@
+# Copyright (C) 2021. Huawei Technologies Co., Ltd. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE
+
+""" Compact delta-encoded exchange format of the algorithm worker (calling mode "worker")
+
+Every dispatch request only carries what changed since the previous request, the worker applies it to its cached
+state and gets the same vehicle_infos, unallocated_order_items and ongoing_order_items as the json files:
+    header:
+        "format": "compact", "version": 1,
+        "base_seq": seq of the request the delta applies to, None for a full state
+    body:
+        "string_base": size of the string table before this request,
+        "strings": strings appended to the string table, ids are sent as their index in the table,
+        "item_schema": [[field name, is symbol], ...] of the order item records, only sent when changed,
+        "items": [[field values by the schema], ...] of the new or changed order items,
+        "released_items": ids of the order items which are neither unallocated nor ongoing any more,
+        "unallocated_order_items" / "ongoing_order_items": {"removed": [ids], "added": [ids]} or a full list of ids,
+        "vehicle_order": ids of all vehicles, only sent when changed,
+        "vehicles": [[field values by VEHICLE_FIELDS], ...] of the vehicles changed since the previous request
+    the destination of a vehicle is None or [factory id, [delivery item ids], [pickup item ids], arrive_time, leave_time]
+"""
+
+COMPACT_FORMAT_NAME = "compact"
+COMPACT_FORMAT_VERSION = 1
+
+# 物料记录中以字符串表下标传输的字段, fields of the order items sent as indexes of the string table
+ITEM_SYMBOL_FIELDS = {"id", "type", "order_id", "pickup_factory_id", "delivery_factory_id"}
+
+# 车辆记录的字段, fields of the vehicle records, same as the vehicle json
+VEHICLE_FIELDS = ["id", "operation_time", "capacity", "gps_id", "update_time", "cur_factory_id",
+                  "arrive_time_at_current_factory", "leave_time_at_current_factory", "carrying_items", "destination"]
+VEHICLE_SYMBOL_FIELDS = {"id", "gps_id", "cur_factory_id"}
+
+
+class CompactStateEncoder(object):
+    """模拟器侧, 记录已发送给算法的状态, simulator side, keeps the state already sent to the worker"""
+
+    def __init__(self):
+        self.strings = []
+        self.string_to_index = {}
+        self.last_seq = None
+        self.item_schema = None
+        self.item_id_to_record = {}
+        self.list_name_to_item_ids = {}
+        self.vehicle_order = []
+        self.vehicle_id_to_record = {}
+
+    def encode(self, seq: int, vehicle_info_list: list, unallocated_order_items: list, ongoing_order_items: list):
+        """
+        :return: dict of the header and the body, the caller adds "seq" and "type"
+        """
+        string_base = len(self.strings)
+        message = {"format": COMPACT_FORMAT_NAME,
+                   "version": COMPACT_FORMAT_VERSION,
+                   "base_seq": self.last_seq}
+
+        # order items
+        all_items = unallocated_order_items + ongoing_order_items
+        if len(all_items) > 0:
+            schema = [[key, key in ITEM_SYMBOL_FIELDS] for key in all_items[0]]
+            if schema != self.item_schema:
+                self.item_schema = schema
+                self.item_id_to_record = {}
+                message["item_schema"] = schema
+
+        changed_items = []
+        cur_item_ids = set()
+        for item in all_items:
+            record = [self.__encode_string(item.get(key)) if is_symbol else item.get(key)
+                      for key, is_symbol in self.item_schema]
+            item_id = self.__encode_string(item.get("id"))
+            cur_item_ids.add(item_id)
+            if self.item_id_to_record.get(item_id) != record:
+                self.item_id_to_record[item_id] = record
+                changed_items.append(record)
+        message["items"] = changed_items
+
+        released_item_ids = [item_id for item_id in self.item_id_to_record if item_id not in cur_item_ids]
+        for item_id in released_item_ids:
+            self.item_id_to_record.pop(item_id)
+        message["released_items"] = released_item_ids
+
+        for list_name, items in [("unallocated_order_items", unallocated_order_items),
+                                 ("ongoing_order_items", ongoing_order_items)]:
+            item_ids = [self.__encode_string(item.get("id")) for item in items]
+            message[list_name] = self.__get_list_delta(self.list_name_to_item_ids.get(list_name), item_ids)
+            self.list_name_to_item_ids[list_name] = item_ids
+
+        # vehicles
+        vehicle_order = []
+        changed_vehicles = []
+        for vehicle_info in vehicle_info_list:
+            record = self.__encode_vehicle(vehicle_info)
+            vehicle_order.append(record[0])
+            if self.vehicle_id_to_record.get(record[0]) != record:
+                self.vehicle_id_to_record[record[0]] = record
+                changed_vehicles.append(record)
+        if vehicle_order != self.vehicle_order:
+            self.vehicle_order = vehicle_order
+            message["vehicle_order"] = vehicle_order
+        message["vehicles"] = changed_vehicles
+
+        message["string_base"] = string_base
+        message["strings"] = self.strings[string_base:]
+
+        self.last_seq = seq
+        return message
+
+    def __encode_string(self, value):
+        index = self.string_to_index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.string_to_index[value] = index
+            self.strings.append(value)
+        return index
+
+    def __encode_vehicle(self, vehicle_info: dict):
+        record = []
+        for key in VEHICLE_FIELDS:
+            value = vehicle_info.get(key)
+            if key in VEHICLE_SYMBOL_FIELDS:
+                value = self.__encode_string(value)
+            elif key == "carrying_items":
+                value = [self.__encode_string(item_id) for item_id in value]
+            elif key == "destination" and value is not None:
+                value = [self.__encode_string(value.get("factory_id")),
+                         [self.__encode_string(item_id) for item_id in value.get("delivery_item_list")],
+                         [self.__encode_string(item_id) for item_id in value.get("pickup_item_list")],
+                         value.get("arrive_time"),
+                         value.get("leave_time")]
+            record.append(value)
+        return record
+
+    @staticmethod
+    def __get_list_delta(last_ids, cur_ids):
+        """只有删除和末尾追加时发送差量, 否则发送完整列表, a delta keeps the order of the list or the full list is sent"""
+        if last_ids is None:
+            return cur_ids
+        cur_id_set = set(cur_ids)
+        last_id_set = set(last_ids)
+        kept_ids = [item_id for item_id in last_ids if item_id in cur_id_set]
+        added_ids = [item_id for item_id in cur_ids if item_id not in last_id_set]
+        if kept_ids + added_ids != cur_ids:
+            return cur_ids
+        return {"removed": [item_id for item_id in last_ids if item_id not in cur_id_set], "added": added_ids}
+
+
+class CompactStateDecoder(object):
+    """算法侧, 把差量应用到缓存的状态上, algorithm side, applies the deltas to the cached state"""
+
+    def __init__(self):
+        self.__reset()
+
+    def __reset(self):
+        self.strings = []
+        self.last_seq = None
+        self.item_schema = None
+        self.item_id_to_dict = {}
+        self.list_name_to_item_ids = {}
+        self.vehicle_order = []
+        self.vehicle_id_to_dict = {}
+
+    def decode(self, message: dict):
+        """
+        :return: vehicle_infos, unallocated_order_items, ongoing_order_items (same content as the input json files)
+        """
+        if message.get("format") != COMPACT_FORMAT_NAME or message.get("version") != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported exchange format {message.get('format')}, version {message.get('version')}")
+
+        base_seq = message.get("base_seq")
+        if base_seq is None:
+            self.__reset()
+        elif base_seq != self.last_seq:
+            raise ValueError(f"The delta is based on request {base_seq}, but the last request is {self.last_seq}")
+        if message.get("string_base") != len(self.strings):
+            raise ValueError(f"The string table has {len(self.strings)} strings, "
+                             f"but the request expects {message.get('string_base')}")
+        self.strings.extend(message.get("strings"))
+
+        # order items
+        if "item_schema" in message:
+            self.item_schema = message.get("item_schema")
+            self.item_id_to_dict = {}
+        strings = self.strings
+        id_index = [key for key, _ in self.item_schema].index("id") if self.item_schema else 0
+        for record in message.get("items"):
+            item = {key: strings[value] if is_symbol else value
+                    for (key, is_symbol), value in zip(self.item_schema, record)}
+            self.item_id_to_dict[record[id_index]] = item
+        for item_id in message.get("released_items"):
+            self.item_id_to_dict.pop(item_id, None)
+
+        item_lists = []
+        for list_name in ["unallocated_order_items", "ongoing_order_items"]:
+            delta = message.get(list_name)
+            if isinstance(delta, dict):
+                removed_ids = set(delta.get("removed"))
+                item_ids = [item_id for item_id in self.list_name_to_item_ids.get(list_name)
+                            if item_id not in removed_ids] + delta.get("added")
+            else:
+                item_ids = delta
+            self.list_name_to_item_ids[list_name] = item_ids
+            # 算法可能修改字典内容, 返回副本, copies, since the algorithm may modify the dicts
+            item_lists.append([dict(self.item_id_to_dict.get(item_id)) for item_id in item_ids])
+
+        # vehicles
+        if "vehicle_order" in message:
+            self.vehicle_order = message.get("vehicle_order")
+        for record in message.get("vehicles"):
+            self.vehicle_id_to_dict[record[0]] = self.__decode_vehicle(record)
+        vehicle_infos = []
+        for vehicle_id in self.vehicle_order:
+            vehicle_info = dict(self.vehicle_id_to_dict.get(vehicle_id))
+            vehicle_info["carrying_items"] = list(vehicle_info.get("carrying_items"))
+            if vehicle_info.get("destination") is not None:
+                destination = dict(vehicle_info.get("destination"))
+                destination["delivery_item_list"] = list(destination.get("delivery_item_list"))
+                destination["pickup_item_list"] = list(destination.get("pickup_item_list"))
+                vehicle_info["destination"] = destination
+            vehicle_infos.append(vehicle_info)
+
+        self.last_seq = message.get("seq")
+        return vehicle_infos, item_lists[0], item_lists[1]
+
+    def __decode_vehicle(self, record: list):
+        strings = self.strings
+        vehicle_info = {}
+        for key, value in zip(VEHICLE_FIELDS, record):
+            if key in VEHICLE_SYMBOL_FIELDS:
+                value = strings[value]
+            elif key == "carrying_items":
+                value = [strings[item_id] for item_id in value]
+            elif key == "destination" and value is not None:
+                value = {"factory_id": strings[value[0]],
+                         "delivery_item_list": [strings[item_id] for item_id in value[1]],
+                         "pickup_item_list": [strings[item_id] for item_id in value[2]],
+                         "arrive_time": value[3],
+                         "leave_time": value[4]}
+            vehicle_info[key] = value
+        return vehicle_info
@@ -19,9 +19,12 @@
 # THE SOFTWARE
 
 import datetime
+import hashlib
+import os
 import time
 
 import json
+import numpy as np
 import pandas as pd
 
 from src.common.factory import Factory
@@ -67,41 +70,55 @@ def get_initial_data(data_file_path: str, vehicle_info_file_path: str, route_inf
 def get_order_info(file_path: str, ini_time: int):
     order_df = pd.read_csv(file_path, dtype={'order_id': object})
 
+    # 按列取值, 时间字符串只对不重复的取值解析一次
+    # build the orders from the columns, each distinct time string is parsed only once
+    ini_date = datetime.datetime.fromtimestamp(ini_time).date()
+    creation_times = __convert_time_strings_to_timestamps(order_df['creation_time'], ini_date)
+    committed_completion_times = __convert_time_strings_to_timestamps(order_df['committed_completion_time'], ini_date)
+    committed_completion_times = np.where(committed_completion_times < creation_times,
+                                          committed_completion_times + Configs.A_DAY_TIME_SECONDS,
+                                          committed_completion_times)
+
     id_to_order = {}
-    for index, row in order_df.iterrows():
-        order_id = str(row['order_id'])
-        q_standard = int(row['q_standard'])
-        q_small = int(row['q_small'])
-        q_box = int(row['q_box'])
+    for (order_id, q_standard, q_small, q_box, demand, load_time, unload_time, pickup_id, delivery_id,
+         creation_time, committed_completion_time) in zip(
+            order_df['order_id'].astype(str).tolist(),
+            order_df['q_standard'].astype(int).tolist(),
+            order_df['q_small'].astype(int).tolist(),
+            order_df['q_box'].astype(int).tolist(),
+            order_df['demand'].astype(float).tolist(),
+            order_df['load_time'].astype(int).tolist(),
+            order_df['unload_time'].astype(int).tolist(),
+            order_df['pickup_id'].astype(str).tolist(),
+            order_df['delivery_id'].astype(str).tolist(),
+            creation_times.astype(int).tolist(),
+            committed_completion_times.astype(int).tolist()):
+        if order_id in id_to_order:
+            continue
+
         components = {Configs.STANDARD_PALLET_LABEL: q_standard,
                       Configs.SMALL_PALLET_LABEL: q_small,
                       Configs.BOX_LABEL: q_box}
-        demand = float(row['demand'])
-        load_time = int(row['load_time'])
-        unload_time = int(row['unload_time'])
-        pickup_id = str(row['pickup_id'])
-        delivery_id = str(row['delivery_id'])
-
-        ini_datetime = datetime.datetime.fromtimestamp(ini_time)
-        creation_datetime = datetime.datetime.combine(
-            ini_datetime.date(), datetime.datetime.strptime(row['creation_time'], '%H:%M:%S').time())
-        creation_time = time.mktime(creation_datetime.timetuple())
-        committed_completion_datetime = datetime.datetime.combine(
-            ini_datetime.date(), datetime.datetime.strptime(row['committed_completion_time'], '%H:%M:%S').time())
-        committed_completion_time = time.mktime(committed_completion_datetime.timetuple())
-        if committed_completion_time < creation_time:
-            committed_completion_time += Configs.A_DAY_TIME_SECONDS
-
-        order = Order(order_id, components, demand, int(creation_time), int(committed_completion_time),
+        order = Order(order_id, components, demand, creation_time, committed_completion_time,
                       load_time, unload_time, delivery_id, pickup_id)
-        item_list = get_item_list(order)
-        order.item_list = item_list
-
-        if order_id not in id_to_order:
-            id_to_order[order_id] = order
+        order.item_list = get_item_list(order)
+        id_to_order[order_id] = order
     return id_to_order
 
 
+def __convert_time_strings_to_timestamps(time_strings: pd.Series, date: datetime.date):
+    """
+    将"%H:%M:%S"格式的时间与日期合并为本地时间戳, convert the "%H:%M:%S" strings of the date to local timestamps
+    :return: np.ndarray of float
+    """
+    codes, unique_time_strings = pd.factorize(time_strings)
+    unique_timestamps = np.zeros(len(unique_time_strings), dtype=float)
+    for index, time_str in enumerate(unique_time_strings):
+        combined_datetime = datetime.datetime.combine(date, datetime.datetime.strptime(time_str, '%H:%M:%S').time())
+        unique_timestamps[index] = time.mktime(combined_datetime.timetuple())
+    return unique_timestamps[codes]
+
+
 def get_item_list(order):
     """
     get the items of order
@@ -129,28 +146,26 @@ def get_item_list(order):
 def get_factory_info(file_path: str):
     df = pd.read_csv(file_path)
     id_to_factory = {}
-    for index, row in df.iterrows():
-        factory_id = str(row['factory_id'])
-        lng = float(row['longitude'])
-        lat = float(row['latitude'])
-        dock_num = int(row['port_num'])
-        factory = Factory(factory_id, lng, lat, dock_num)
+    for factory_id, lng, lat, dock_num in zip(df['factory_id'].astype(str).tolist(),
+                                              df['longitude'].astype(float).tolist(),
+                                              df['latitude'].astype(float).tolist(),
+                                              df['port_num'].astype(int).tolist()):
         if factory_id not in id_to_factory:
-            id_to_factory[factory_id] = factory
+            id_to_factory[factory_id] = Factory(factory_id, lng, lat, dock_num)
     return id_to_factory
 
 def get_route_map(file_path: str):
     route_df = pd.read_csv(file_path)
     code_to_route = {}
-    for index, row in route_df.iterrows():
-        route_code = str(row['route_code'])
-        start_factory_id = str(row['start_factory_id'])
-        end_factory_id = str(row['end_factory_id'])
-        distance = float(row['distance'])
-        transport_time = int(row['time'])
-        route = RouteInfo(route_code, start_factory_id, end_factory_id, distance, transport_time)
+    for route_code, start_factory_id, end_factory_id, distance, transport_time in zip(
+            route_df['route_code'].astype(str).tolist(),
+            route_df['start_factory_id'].astype(str).tolist(),
+            route_df['end_factory_id'].astype(str).tolist(),
+            route_df['distance'].astype(float).tolist(),
+            route_df['time'].astype(int).tolist()):
         if route_code not in code_to_route:
-            code_to_route[route_code] = route
+            code_to_route[route_code] = RouteInfo(route_code, start_factory_id, end_factory_id, distance,
+                                                  transport_time)
     return code_to_route
 
 def read_json(file_path: str):
@@ -158,15 +173,117 @@ def read_json(file_path: str):
         json_data = json.load(f)
     return json_data
 
+
+def get_route_matrices():
+    """
+    读取距离和时间矩阵(与distance_mtx.json/time_mtx.json相同), 从.npy缓存内存映射加载.
+    缓存记录了route_info.csv和factory_info.csv的哈希值, 文件内容变化或缓存不存在时重新生成;
+    文件的大小和修改时间未变时不再计算哈希值.
+    Get the distance and time matrices (same as distance_mtx.json and time_mtx.json) from the memory-mapped .npy
+    cache. The cache is rebuilt when it is missing or the content hash of the csv files has changed, the hash is
+    only computed when the size or the modification time of the files has changed.
+    :return: {'distance': list of lists, 'time': list of lists}
+    """
+    stat_key = __get_stat_key_of_route_files()
+    source_hash = None
+    try:
+        with open(Configs.route_mtx_hash_file_path, 'r') as f:
+            cached_hash, cached_stat_key = (f.read().split() + ["", ""])[:2]
+        if cached_stat_key != stat_key:
+            source_hash = get_hash_of_route_files()
+        if cached_stat_key == stat_key or cached_hash == source_hash:
+            distance_mtx = np.load(Configs.distance_mtx_cache_file_path, mmap_mode='r')
+            time_mtx = np.load(Configs.time_mtx_cache_file_path, mmap_mode='r')
+            if cached_stat_key != stat_key:
+                __save_route_matrix_hash(cached_hash)
+            return {'distance': distance_mtx.tolist(), 'time': time_mtx.tolist()}
+        logger.info("Route files have changed, rebuild the cache of the route matrices")
+    except (OSError, ValueError):
+        logger.info("Build the cache of the route matrices")
+
+    distance_mtx, time_mtx = create_route_matrices(Configs.route_info_file_path, Configs.factory_info_file_path)
+    save_route_matrix_cache(distance_mtx, time_mtx, source_hash or get_hash_of_route_files())
+    return {'distance': distance_mtx.tolist(), 'time': time_mtx.tolist()}
+
+
+def get_factory_indexes_of_route_matrices(factory_info_file_path: str):
+    """
+    工厂按编号的字母序编号, factories are indexed in the alphabetical order of their ids
+    :return: dict, factory id -> index in the route matrices
+    """
+    factory_list = sorted(pd.read_csv(factory_info_file_path)['factory_id'])
+    return {factory_id: index for index, factory_id in enumerate(factory_list)}
+
+
+def create_route_matrices(route_info_file_path: str, factory_info_file_path: str):
+    """
+    矩阵下标见get_factory_indexes_of_route_matrices, see get_factory_indexes_of_route_matrices for the indexes
+    :return: distance_mtx: np.ndarray, time_mtx: np.ndarray
+    """
+    factory_to_int = get_factory_indexes_of_route_matrices(factory_info_file_path)
+
+    route_info_df = pd.read_csv(route_info_file_path)
+    matrices = []
+    for value_name in ['distance', 'time']:
+        route_df = route_info_df.pivot_table(index='start_factory_id', columns='end_factory_id', values=value_name,
+                                             fill_value=0)
+        route_df = route_df.rename(index=factory_to_int, columns=factory_to_int)
+        n = len(route_df.index)
+        # mtx[i][j] = route_df[i][j], i.e. column i and row j of the pivot table
+        matrices.append(route_df.loc[range(n), range(n)].to_numpy(dtype=float).T.copy())
+    return matrices[0], matrices[1]
+
+
+def save_route_matrix_cache(distance_mtx, time_mtx, source_hash: str):
+    # 先写完所有临时文件, 删除哈希文件使旧缓存失效, 再替换矩阵文件, 最后写哈希文件;
+    # 中途崩溃时哈希文件不存在, 下次重新生成, 并行运行的多个进程也不会读到写了一半的缓存
+    # write all the temporary files first, then invalidate the cache by removing the hash file, replace the matrix
+    # files and write the hash file last: after a crash midway no hash matches the matrices and the cache is rebuilt,
+    # the processes running in parallel never read a partial cache
+    file_path_to_tmp_file_path = {}
+    for file_path, matrix in [(Configs.distance_mtx_cache_file_path, distance_mtx),
+                              (Configs.time_mtx_cache_file_path, time_mtx)]:
+        tmp_file_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_file_path, 'wb') as f:
+            np.save(f, matrix)
+        file_path_to_tmp_file_path[file_path] = tmp_file_path
+
+    try:
+        os.remove(Configs.route_mtx_hash_file_path)
+    except FileNotFoundError:
+        pass
+    for file_path, tmp_file_path in file_path_to_tmp_file_path.items():
+        os.replace(tmp_file_path, file_path)
+
+    __save_route_matrix_hash(source_hash)
+
+
+def __save_route_matrix_hash(source_hash: str):
+    tmp_file_path = f"{Configs.route_mtx_hash_file_path}.{os.getpid()}.tmp"
+    with open(tmp_file_path, 'w') as f:
+        f.write(f"{source_hash}\n{__get_stat_key_of_route_files()}\n")
+    os.replace(tmp_file_path, Configs.route_mtx_hash_file_path)
+
+
+def __get_stat_key_of_route_files():
+    stats = [os.stat(file_path) for file_path in [Configs.route_info_file_path, Configs.factory_info_file_path]]
+    return ";".join(f"{stat.st_size}:{stat.st_mtime_ns}" for stat in stats)
+
+
+def get_hash_of_route_files():
+    sha256 = hashlib.sha256()
+    for file_path in [Configs.route_info_file_path, Configs.factory_info_file_path]:
+        with open(file_path, 'rb') as f:
+            sha256.update(f.read())
+    return sha256.hexdigest()
+
 def get_vehicle_info(file_path: str):
     vehicle_df = pd.read_csv(file_path)
     id_to_vehicle = {}
-    for index, row in vehicle_df.iterrows():
-        car_num = str(row['car_num'])
-        capacity = int(row['capacity'])
-        operation_time = int(row['operation_time'])
-        gps_id = str(row['gps_id'])
-        vehicle = Vehicle(car_num, capacity, gps_id, operation_time)
+    for car_num, capacity, operation_time, gps_id in zip(vehicle_df['car_num'].astype(str).tolist(),
+                                                         vehicle_df['capacity'].astype(int).tolist(),
+                                                         vehicle_df['operation_time'].astype(int).tolist(),
+                                                         vehicle_df['gps_id'].astype(str).tolist()):
         if car_num not in id_to_vehicle:
-            id_to_vehicle[car_num] = vehicle
+            id_to_vehicle[car_num] = Vehicle(car_num, capacity, gps_id, operation_time)
     return id_to_vehicle
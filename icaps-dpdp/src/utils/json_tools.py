@@ -21,14 +21,18 @@
 import json
 import os
 import platform
+import signal
 import subprocess
 import sys
+import threading
 import time
+import traceback
 from importlib import import_module
 
 from src.common.node import Node
 from src.common.vehicle import Vehicle
 from src.conf.configs import Configs
+from src.utils.exchange_format import CompactStateDecoder
 from src.utils.logging_engine import logger
 
 COMMON_CLASS = {'Vehicle': 'src.common.vehicle',
@@ -72,6 +76,16 @@ def get_algorithm_calling_command():
     sys.exit(-1)
 
 
+# 进程内调用模式: 创建算法的派单对象, create the dispatcher of the in-process calling mode
+def get_in_process_dispatcher():
+    """
+    The module Configs.IN_PROCESS_ALGORITHM_MODULE has to provide create_dispatcher(), which returns a callable.
+    The callable receives an InputInfo object and returns a DispatchResult object.
+    """
+    module = import_module(Configs.IN_PROCESS_ALGORITHM_MODULE)
+    return module.create_dispatcher()
+
+
 # *** ORIGINAL***
 # 
 # # 开启进程，调用算法
@@ -99,6 +113,133 @@ def subprocess_function(cmd):
     return end_time - start_time, "SUCCESS"
 
 
+""" Long-lived algorithm worker (calling mode "worker")
+
+The simulator starts the algorithm once per instance with the argument Configs.ALGORITHM_WORKER_ARG and exchanges
+one json message per line through the stdin/stdout pipes of the worker:
+    request:  {"seq": 1, "type": "dispatch", "vehicle_infos": [...],
+               "unallocated_order_items": [...], "ongoing_order_items": [...]}
+    response: {"seq": 1, "flag": "SUCCESS", "destination": {...}, "planned_route": {...}}
+    request:  {"seq": 2, "type": "stop"}
+The content of the fields is the same as the content of the json files in the subprocess mode.
+A worker which does not respond within Configs.MAX_RUNTIME_OF_ALGORITHM seconds is killed by the simulator.
+With Configs.ALGORITHM_WORKER_EXCHANGE_FORMAT = "compact", the dispatch requests carry the compact delta-encoded
+state instead of the three fields (see src/utils/exchange_format.py).
+"""
+
+
+# 启动算法常驻进程, start the algorithm worker
+def start_algorithm_worker(cmd):
+    # 在新的进程组中启动, 以便超时时连同shell启动的算法进程一起终止
+    # the worker gets its own process group on POSIX, so that a timeout kills the algorithm started by the shell too
+    return subprocess.Popen(f"{cmd} {Configs.ALGORITHM_WORKER_ARG}", stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            shell=True, cwd=Configs.root_folder_path, universal_newlines=True,
+                            start_new_session=(os.name == 'posix'))
+
+
+# 向常驻进程发送派单请求, 返回算法运行时间和响应
+def call_algorithm_worker(worker, seq: int, input_info, encoder=None):
+    """
+    :param encoder: CompactStateEncoder of the worker, None to send the full state as in the json files
+    :raise TimeoutError: the worker did not respond within Configs.MAX_RUNTIME_OF_ALGORITHM seconds
+    """
+    vehicle_info_list, unallocated_order_items, ongoing_order_items = convert_input_info_to_json_data(input_info)
+    request = {"seq": seq, "type": "dispatch"}
+    if encoder is not None:
+        request.update(encoder.encode(seq, vehicle_info_list, unallocated_order_items, ongoing_order_items))
+    else:
+        request["vehicle_infos"] = vehicle_info_list
+        request["unallocated_order_items"] = unallocated_order_items
+        request["ongoing_order_items"] = ongoing_order_items
+    start_time = time.time()
+    __send_message(worker.stdin, request)
+    response = __receive_message(worker.stdout, Configs.MAX_RUNTIME_OF_ALGORITHM)
+    end_time = time.time()
+    return end_time - start_time, response
+
+
+# 终止常驻进程, kill the algorithm worker, e.g. after a timeout
+def kill_algorithm_worker(worker):
+    if worker.poll() is None:
+        if os.name == 'posix':
+            os.killpg(worker.pid, signal.SIGKILL)
+        else:
+            worker.kill()
+    worker.wait()
+
+
+# 关闭常驻进程, stop the algorithm worker
+def stop_algorithm_worker(worker, seq: int):
+    if worker.poll() is None:
+        try:
+            __send_message(worker.stdin, {"seq": seq, "type": "stop"})
+            worker.stdin.close()
+        except OSError as e:
+            logger.warning(f"Failed to stop the algorithm worker: {e}")
+    try:
+        worker.wait(Configs.MAX_RUNTIME_OF_ALGORITHM)
+    except subprocess.TimeoutExpired:
+        logger.warning("The algorithm worker did not stop in time, it is killed.")
+        kill_algorithm_worker(worker)
+
+
+# 算法侧的常驻进程主循环, main loop of the worker (algorithm side)
+def run_algorithm_worker(dispatcher):
+    """
+    :param dispatcher: provides dispatch_from_json_data(vehicle_infos, unallocated_order_items, ongoing_order_items),
+                       which returns vehicle_id_to_destination and vehicle_id_to_planned_route (Node objects)
+    """
+    # stdout is kept for the messages, everything else printed by the algorithm goes to stderr
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    decoder = CompactStateDecoder()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if request.get("type") == "stop":
+            break
+
+        response = {"seq": request.get("seq")}
+        try:
+            if "format" in request:
+                vehicle_infos, unallocated_order_items, ongoing_order_items = decoder.decode(request)
+            else:
+                vehicle_infos = request.get("vehicle_infos")
+                unallocated_order_items = request.get("unallocated_order_items")
+                ongoing_order_items = request.get("ongoing_order_items")
+            vehicle_id_to_destination, vehicle_id_to_planned_route = dispatcher.dispatch_from_json_data(
+                vehicle_infos, unallocated_order_items, ongoing_order_items)
+            response["flag"] = Configs.ALGORITHM_SUCCESS_FLAG
+            response["destination"] = convert_nodes_to_json(vehicle_id_to_destination)
+            response["planned_route"] = convert_nodes_to_json(vehicle_id_to_planned_route)
+        except Exception as e:
+            logger.error(f"Failed to run algorithm, error: {e}, {traceback.format_exc()}")
+            response["flag"] = "FAIL"
+        __send_message(channel, response)
+    channel.close()
+
+
+def __send_message(pipe, message: dict):
+    pipe.write(json.dumps(message, separators=(',', ':')) + "\n")
+    pipe.flush()
+
+
+def __receive_message(pipe, timeout=None):
+    # the line is read by a thread, since a blocking read of a pipe can not time out on all platforms
+    lines = []
+    reader = threading.Thread(target=lambda: lines.append(pipe.readline()), daemon=True)
+    reader.start()
+    reader.join(timeout)
+    if reader.is_alive():
+        raise TimeoutError(f"No message within {timeout} seconds")
+    if not lines or not lines[0]:
+        return None
+    return json.loads(lines[0])
+
+
 """ IO"""
 
 
@@ -110,7 +251,7 @@ def read_json_from_file(file_name):
 
 def write_json_to_file(file_name, data):
     with open(file_name, 'w') as fd:
-        fd.write(json.dumps(data, indent=4))
+        fd.write(json.dumps(data, indent=Configs.EXCHANGE_JSON_INDENT))
 
 
 """ create the input of the algorithm (output json of simulation)"""
@@ -118,14 +259,22 @@ def write_json_to_file(file_name, data):
 
 # 输出input_info数据到input.json
 def convert_input_info_to_json_files(input_info):
-    vehicle_info_list = __get_vehicle_info_list(input_info.id_to_vehicle)
+    vehicle_info_list, unallocated_order_items, ongoing_order_items = convert_input_info_to_json_data(input_info)
     write_json_to_file(Configs.algorithm_vehicle_input_info_path, vehicle_info_list)
-
-    unallocated_order_items = convert_dict_to_list(input_info.id_to_unallocated_order_item)
     write_json_to_file(Configs.algorithm_unallocated_order_items_input_path, unallocated_order_items)
+    write_json_to_file(Configs.algorithm_ongoing_order_items_input_path, ongoing_order_items)
+
 
+# input_info转为json数据(不写文件), convert input_info to the json-compatible data of the algorithm input
+def convert_input_info_to_json_data(input_info):
+    """
+    :param input_info: InputInfo object
+    :return: vehicle_info_list, unallocated_order_items, ongoing_order_items (same content as the input json files)
+    """
+    vehicle_info_list = __get_vehicle_info_list(input_info.id_to_vehicle)
+    unallocated_order_items = convert_dict_to_list(input_info.id_to_unallocated_order_item)
     ongoing_order_items = convert_dict_to_list(input_info.id_to_ongoing_order_item)
-    write_json_to_file(Configs.algorithm_ongoing_order_items_input_path, ongoing_order_items)
+    return vehicle_info_list, unallocated_order_items, ongoing_order_items
 
 
 def __get_vehicle_info_list(id_to_vehicle: dict):
@@ -136,7 +285,7 @@ def __get_vehicle_info_list(id_to_vehicle: dict):
 
 
 def __convert_vehicle_to_dict(vehicle):
-    carrying_items = vehicle.get_loading_sequence()
+    carrying_items = vehicle.carrying_items.bottom_up()
 
     vehicle_property = {
         "id": vehicle.id,
@@ -170,7 +319,10 @@ def __convert_destination_to_dict(destination):
 def convert_dict_to_list(_dict):
     _list = []
     for key, value in _dict.items():
-        if hasattr(value, '__dict__'):
+        # 使用__slots__的类(如OrderItem)提供to_dict, classes with __slots__ (e.g. OrderItem) provide to_dict
+        if hasattr(value, 'to_dict'):
+            _list.append(value.to_dict())
+        elif hasattr(value, '__dict__'):
             d = value.__dict__
             _list.append({key: d[key] for key in d if "__" not in key})
     return _list
@@ -235,10 +387,14 @@ def get_order_item_dict(_item_list, class_name):
 def convert_dicts_list_to_instances_list(_dicts_list, class_name):
     instances_list = []
     # 通过类名取导入类
+    common_class = import_common_class(class_name)
     for _dict in _dicts_list:
-        common_class = import_common_class(class_name)
-        instance = common_class.__new__(common_class)
-        instance.__dict__ = _dict
+        # 使用__slots__的类没有__dict__, 通过from_dict创建, classes with __slots__ have no __dict__
+        if hasattr(common_class, 'from_dict'):
+            instance = common_class.from_dict(_dict)
+        else:
+            instance = common_class.__new__(common_class)
+            instance.__dict__ = _dict
         instances_list.append(instance)
     return instances_list
 
@@ -254,14 +410,12 @@ def convert_nodes_to_json(vehicle_id_to_nodes):
             result_dict[key] = None
             continue
 
-        # 字典的情况
-        if hasattr(value, '__dict__'):
-            result_dict[key] = convert_node_to_json(value)
         # 列表的情况
-        elif not value:
-            result_dict[key] = []
-        elif value and isinstance(value, list) and hasattr(value[0], '__dict__'):
+        if isinstance(value, list):
             result_dict[key] = [convert_node_to_json(node) for node in value]
+        # 节点的情况 (Node使用__slots__, 没有__dict__), a single node
+        else:
+            result_dict[key] = convert_node_to_json(value)
     return result_dict
 
 
@@ -287,6 +441,22 @@ def get_output_of_algorithm(id_to_order_item: dict):
     return vehicle_id_to_destination, vehicle_id_to_planned_route
 
 
+# 获取常驻进程的输出, 与output.json相同的转换方式
+def get_output_of_algorithm_worker(response: dict, id_to_order_item: dict):
+    vehicle_id_to_destination = __convert_json_to_nodes(response.get("destination"), id_to_order_item)
+    vehicle_id_to_planned_route = __convert_json_to_nodes(response.get("planned_route"), id_to_order_item)
+    return vehicle_id_to_destination, vehicle_id_to_planned_route
+
+
+# 获取进程内算法的输出, 与output.json相同的转换方式, 物料重新关联到模拟器的物料实例
+def get_output_of_in_process_algorithm(dispatch_result, id_to_order_item: dict):
+    vehicle_id_to_destination = __convert_json_to_nodes(
+        convert_nodes_to_json(dispatch_result.vehicle_id_to_destination), id_to_order_item)
+    vehicle_id_to_planned_route = __convert_json_to_nodes(
+        convert_nodes_to_json(dispatch_result.vehicle_id_to_planned_route), id_to_order_item)
+    return vehicle_id_to_destination, vehicle_id_to_planned_route
+
+
 def __convert_json_to_nodes(vehicle_id_to_nodes_from_json: dict, id_to_order_item: dict):
     result_dict = {}
 
@@ -58,7 +58,11 @@ def delete_files(file_folder, max_num):
                 total_files.append(item)
         total_files.sort()
         for i in range(delete_num):
-            os.remove(os.path.join(file_folder, total_files[i]))
+            # the file may have been deleted by another process running instances in parallel
+            try:
+                os.remove(os.path.join(file_folder, total_files[i]))
+            except FileNotFoundError:
+                pass
 
 
 # 计算目标文件夹下的文件数量, 不递归文件夹
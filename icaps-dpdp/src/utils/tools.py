@@ -18,8 +18,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE
 
-import copy
-
 from src.conf.configs import Configs
 
 
@@ -80,12 +78,11 @@ def get_item_list_of_vehicles(dispatch_result, id_to_vehicle: dict):
 
     for vehicle_id, vehicle in id_to_vehicle.items():
         item_list = []
-        item_id_list = []
-        carrying_items = copy.deepcopy(vehicle.carrying_items)
-        while not carrying_items.is_empty():
-            item = carrying_items.pop()
-            if item.id not in item_id_list:
-                item_id_list.append(item.id)
+        item_ids = set()
+        # 按卸货顺序, the carrying items in the unloading order
+        for item in vehicle.carrying_items.top_down():
+            if item.id not in item_ids:
+                item_ids.add(item.id)
                 item_list.append(item)
 
         if vehicle_id in vehicle_id_to_destination:
@@ -93,16 +90,16 @@ def get_item_list_of_vehicles(dispatch_result, id_to_vehicle: dict):
             if destination is not None:
                 pickup_items = destination.pickup_items
                 for item in pickup_items:
-                    if item.id not in item_id_list:
-                        item_id_list.append(item.id)
+                    if item.id not in item_ids:
+                        item_ids.add(item.id)
                         item_list.append(item)
 
         if vehicle_id in vehicle_id_to_planned_route:
             for node in vehicle_id_to_planned_route.get(vehicle_id):
                 pickup_items = node.pickup_items
                 for item in pickup_items:
-                    if item.id not in item_id_list:
-                        item_id_list.append(item.id)
+                    if item.id not in item_ids:
+                        item_ids.add(item.id)
                         item_list.append(item)
 
         vehicle_id_to_item_list[vehicle_id] = item_list